@@ -1,29 +1,158 @@
-import ccxt
+import asyncio
 import time
 from config_loader import load_config
+from exchange_registry import EXCHANGE_IDS, create_exchange, get_exchange, load_markets_async
+from metrics import metrics
+from logger import setup_logger
+
+log = setup_logger('aggregator')
+
+def to_quote(name, symbol, ticker):
+    # Normalize a ccxt ticker into a quote stamped with our local receive time
+    return {
+        'exchange': name,
+        'symbol': symbol,
+        'bid': ticker.get('bid'),
+        'ask': ticker.get('ask'),
+        'bid_size': ticker.get('bidVolume'),
+        'ask_size': ticker.get('askVolume'),
+        'last': ticker.get('last'),
+        'exchange_ts': ticker.get('timestamp'),
+        'recv_ts': time.time()
+    }
+
 
 class PriceAggregator:
-    def __init__(self, config_path="config/settings.yaml"):
+    def __init__(self, config_path="config/settings.yaml", exchanges=None, async_exchanges=None):
         self.config = load_config(config_path)
         self.poll_interval = self.config["poll_interval"]
-        self.exchanges= {}
-
-        if self.config['exchanges']['coinbase']['enabled']:
-            self.exchanges['coinbase'] = ccxt.coinbase()
-        
-        if self.config['exchanges']['binance']['enabled']:
-            self.exchanges['binance']=ccxt.binanceus()
-    
-    def fetch_prices(self,symbol='BTC/USD'):
+        self.symbols = self.config.get('symbols', ['BTC/USD'])
+
+        agg_config = self.config.get('aggregator', {})
+        self.mode = agg_config.get('mode', 'sync')
+        self.fetch_timeout = agg_config.get('fetch_timeout', 2.0)
+
+        # Per-exchange timeouts override the global one
+        self.timeouts = {
+            name: ex_config.get('timeout', self.fetch_timeout)
+            for name, ex_config in self.config['exchanges'].items()
+        }
+
+        # Exchanges can be injected (e.g. mock exchanges for benchmarks);
+        # otherwise they are built on first use for the mode that needs them
+        self.exchanges = exchanges
+        self.async_exchanges = async_exchanges
+        self._loop = None
+        self._markets_ready = async_exchanges is not None
+        self.recorder = None  # optional TickRecorder: every received quote is logged
+
+    def _get_exchanges(self):
+        if self.exchanges is None:
+            # Shared clients from the registry, market metadata from its disk cache
+            self.exchanges = {
+                name: get_exchange(name) for name in EXCHANGE_IDS
+                if self.config['exchanges'].get(name, {}).get('enabled')
+            }
+        return self.exchanges
+
+    def fetch_prices(self, symbol='BTC/USD'):
+        if self.mode == 'async':
+            quotes = self.fetch_quotes_concurrent([symbol])
+            return {q['exchange']: q['last'] for q in quotes}
+
         prices={}
-        for name, exchange in self.exchanges.items():
+        for name, exchange in self._get_exchanges().items():
             try:
-                ticker = exchange.fetch_ticker(symbol)
+                with metrics.span('fetch', name):
+                    ticker = exchange.fetch_ticker(symbol)
                 prices[name]=ticker['last']
+                if self.recorder is not None:
+                    self.recorder.record(to_quote(name, symbol, ticker))
             except Exception as e:
-                print(f"Error fetching price from {name}:{e}")
+                metrics.inc('fetch_errors', name)
+                log.warning("Error fetching price from %s: %s", name, e)
         return prices
 
+    def fetch_quotes(self, symbols=None, extra=None):
+        # Sequential fetch: one round-trip after another. extra: (exchange, symbol) pairs
+        # fetched from that exchange only, e.g. a USDT/USD rate
+        symbols = symbols or self.symbols
+        quotes = []
+        pairs = [(name, exchange, symbol) for name, exchange in self._get_exchanges().items() for symbol in symbols]
+        pairs += [(name, self.exchanges[name], symbol) for name, symbol in extra or () if name in self.exchanges]
+        for name, exchange, symbol in pairs:
+            try:
+                with metrics.span('fetch', name):
+                    ticker = exchange.fetch_ticker(symbol)
+                quote = to_quote(name, symbol, ticker)
+                quotes.append(quote)
+                if self.recorder is not None:
+                    self.recorder.record(quote)
+            except Exception as e:
+                metrics.inc('fetch_errors', name)
+                log.warning("Error fetching %s from %s: %s", symbol, name, e)
+        return quotes
+
+    # ---- Async mode ----
+
+    def _get_async_exchanges(self):
+        if self.async_exchanges is None:
+            self.async_exchanges = {}
+            for name in EXCHANGE_IDS:
+                if self.config['exchanges'].get(name, {}).get('enabled'):
+                    self.async_exchanges[name] = create_exchange(name, async_mode=True)
+        return self.async_exchanges
+
+    def _get_loop(self):
+        # ccxt async clients hold an aiohttp session bound to one loop, so keep it alive
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+
+    async def _fetch_quote_async(self, name, exchange, symbol):
+        timeout = self.timeouts.get(name, self.fetch_timeout)
+        try:
+            with metrics.span('fetch', name):
+                ticker = await asyncio.wait_for(exchange.fetch_ticker(symbol), timeout)
+        except asyncio.TimeoutError:
+            metrics.inc('fetch_timeouts', name)
+            log.warning("Timed out fetching %s from %s after %ss", symbol, name, timeout)
+            return None
+        except Exception as e:
+            metrics.inc('fetch_errors', name)
+            log.warning("Error fetching %s from %s: %s", symbol, name, e)
+            return None
+        quote = to_quote(name, symbol, ticker)
+        if self.recorder is not None:
+            self.recorder.record(quote)
+        return quote
+
+    async def fetch_quotes_async(self, symbols=None, extra=None):
+        # Fan out every exchange x symbol (plus the extra pairs) at once; a slow venue only loses its own quotes
+        symbols = symbols or self.symbols
+        if not self._markets_ready:
+            # Market metadata once, from the cache when fresh, before the first fan-out
+            await asyncio.gather(*(load_markets_async(ex) for ex in self._get_async_exchanges().values()))
+            self._markets_ready = True
+        tasks = [
+            self._fetch_quote_async(name, exchange, symbol)
+            for name, exchange in self._get_async_exchanges().items()
+            for symbol in symbols
+        ]
+        tasks += [self._fetch_quote_async(name, self.async_exchanges[name], symbol)
+                  for name, symbol in extra or () if name in self.async_exchanges]
+        results = await asyncio.gather(*tasks)
+        return [quote for quote in results if quote]
+
+    def fetch_quotes_concurrent(self, symbols=None, extra=None):
+        return self._get_loop().run_until_complete(self.fetch_quotes_async(symbols, extra))
+
+    def close(self):
+        if self.async_exchanges and self._loop and not self._loop.is_closed():
+            for exchange in self.async_exchanges.values():
+                self._loop.run_until_complete(exchange.close())
+            self._loop.close()
+
 # For standalone testing
 
 if __name__ == "__main__":
@@ -32,4 +161,4 @@ if __name__ == "__main__":
         prices = aggregator.fetch_prices()
         print(f"Prices:{prices}")
         time.sleep(aggregator.poll_interval)
-        
\ No newline at end of file
+
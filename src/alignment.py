@@ -0,0 +1,329 @@
+import bisect
+import time
+import numpy as np
+import pandas as pd
+
+# Time alignment of price series from different exchanges. Instead of an
+# inner join on identical timestamps (which silently drops every gap), each
+# series is joined as-of: at every timestamp in the merged grid it contributes
+# its latest value, provided that value is at most max_staleness old. Quotes in
+# stablecoins are converted to USD with an as-of rate series. Sorted NumPy
+# arrays are merged window by window, so tick data never becomes one big frame.
+
+CASH_QUOTES = ('USD', 'USDT', 'USDC')
+
+
+def asof(ts, values, grid, max_staleness):
+    # Latest value at or before each grid time; NaN where none is fresh enough.
+    # Returns (values, age, fresh mask).
+    pos = np.searchsorted(ts, grid, side='right') - 1
+    safe = np.maximum(pos, 0)
+    age = grid - ts[safe] if len(ts) else np.full(len(grid), np.inf)
+    fresh = (pos >= 0) & (age <= max_staleness)
+    if not len(ts):
+        return np.full(len(grid), np.nan), age, fresh
+    return np.where(fresh, values[safe], np.nan), age, fresh
+
+
+def _windows(series, chunk_size):
+    # Time boundaries splitting the longest series into chunks of ~chunk_size / k events
+    longest = max((ts for ts, _ in series.values()), key=len)
+    step = max(1, chunk_size // max(1, len(series)))
+    bounds = [longest[i] for i in range(step, len(longest), step)]
+    return [None] + bounds + [None]
+
+
+def merge_window(series, lo, hi):
+    # Merge of every series' events in [lo, hi): the distinct timestamps (grid) and,
+    # per series, the index of its latest event at or before each of them (-1 if none).
+    # The runs are already sorted, so the stable sort is a linear merge.
+    starts, slices = [], []
+    for ts, _ in series.values():
+        a = 0 if lo is None else int(np.searchsorted(ts, lo, side='left'))
+        b = len(ts) if hi is None else int(np.searchsorted(ts, hi, side='left'))
+        starts.append(a)
+        slices.append(ts[a:b])
+    merged = np.concatenate(slices)
+    order = np.argsort(merged, kind='stable')
+    merged = merged[order]
+    labels = np.repeat(np.arange(len(slices), dtype=np.int32), [len(s) for s in slices])[order]
+    # Several events on one timestamp collapse into one row holding all of them
+    last = np.ones(len(merged), dtype=bool)
+    last[:-1] = merged[1:] != merged[:-1]
+    grid = merged[last]
+    positions = [(a - 1 + np.cumsum(labels == i))[last] for i, a in enumerate(starts)]
+    return grid, positions
+
+
+def iter_align(series, max_staleness, rates=None, rate_staleness=None, chunk_size=1_000_000):
+    # series: {name: (ts, values)} sorted by ts (int64, any unit; max_staleness in the same unit).
+    # rates: {name: (ts, rate)} multiplied into that series, e.g. USDT->USD.
+    # Streams over time windows; yields (times, {name: values}, {name: age}, {name: fresh}).
+    rates = rates or {}
+    if not series:
+        return
+    bounds = _windows(series, chunk_size)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        times, positions = merge_window(series, lo, hi)
+        if not len(times):
+            continue
+        values, ages, fresh = {}, {}, {}
+        for (name, (ts, vals)), pos in zip(series.items(), positions):
+            safe = np.maximum(pos, 0)
+            age = times - ts[safe] if len(ts) else np.full(len(times), np.inf)
+            ok = (pos >= 0) & (age <= max_staleness)
+            values[name] = np.where(ok, vals[safe], np.nan) if len(ts) else np.full(len(times), np.nan)
+            ages[name], fresh[name] = age, ok
+            if name in rates:
+                rate_ts, rate = rates[name]
+                limit = max_staleness if rate_staleness is None else rate_staleness
+                rate_values, _, rate_fresh = asof(rate_ts, rate, times, limit)
+                values[name] = values[name] * rate_values
+                fresh[name] = fresh[name] & rate_fresh
+        yield times, values, ages, fresh
+
+
+def _mapped_slice(ts, values, lo, hi):
+    # Events in [lo, hi) plus the one before (the as-of value at lo), copied into memory.
+    # bisect reads single elements, so a memory-mapped column is never loaded whole.
+    a = 0 if lo is None else bisect.bisect_left(ts, lo)
+    b = len(ts) if hi is None else bisect.bisect_left(ts, hi)
+    a = max(a - 1, 0)
+    return np.array(ts[a:b], dtype=np.int64), np.array(values[a:b], dtype=float)
+
+
+def iter_align_mapped(series, max_staleness, rates=None, rate_staleness=None, chunk_size=1_000_000,
+                      start=None, end=None):
+    # iter_align() for series larger than memory (e.g. np.memmap columns of the OHLCV cache):
+    # each window reads only its own slice of every series. Same output, limited to [start, end).
+    rates = rates or {}
+    if not series:
+        return
+    longest = max((ts for ts, _ in series.values()), key=len)
+    step = max(1, chunk_size // max(1, len(series)))
+    first = 0 if start is None else bisect.bisect_left(longest, start)
+    last = len(longest) if end is None else bisect.bisect_left(longest, end)
+    bounds = [start] + [int(longest[i]) for i in range(first + step, last, step)] + [end]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        window = {name: _mapped_slice(ts, values, lo, hi) for name, (ts, values) in series.items()}
+        window_rates = {name: _mapped_slice(ts, rate, lo, hi) for name, (ts, rate) in rates.items()}
+        for times, values, ages, fresh in iter_align(window, max_staleness, window_rates, rate_staleness, chunk_size):
+            if lo is not None:
+                # Drop the grid rows of the carried-over events before the window
+                keep = times >= lo
+                times = times[keep]
+                values = {name: v[keep] for name, v in values.items()}
+                ages = {name: a[keep] for name, a in ages.items()}
+                fresh = {name: f[keep] for name, f in fresh.items()}
+            if len(times):
+                yield times, values, ages, fresh
+
+
+def iter_close_chunks(series, max_staleness, rates=None, rate_staleness=None, chunk_size=1_000_000,
+                      start=None, end=None, unit='ms', column='close'):
+    # Merged DataFrames like align_closes() returns, one window at a time (rows where every series is fresh)
+    for times, values, _, fresh in iter_align_mapped(series, max_staleness, rates, rate_staleness, chunk_size,
+                                                     start, end):
+        keep = np.logical_and.reduce(list(fresh.values()))
+        if not keep.any():
+            continue
+        index = pd.DatetimeIndex(pd.to_datetime(times[keep], unit=unit), name='timestamp')
+        yield pd.DataFrame({f"{column}_{name}": values[name][keep] for name in series}, index=index)
+
+
+class FillStats:
+    # How each series was filled across the grid: exact hits, as-of fills, stale gaps
+    def __init__(self, names, max_staleness):
+        self.max_staleness = max_staleness
+        self.rows = 0
+        self.kept = 0
+        self.counts = {name: {'exact': 0, 'filled': 0, 'stale': 0} for name in names}
+        self._ages = {name: [] for name in names}
+
+    def add(self, ages, fresh, keep):
+        self.rows += len(keep)
+        self.kept += int(keep.sum())
+        for name, mask in fresh.items():
+            age = ages[name]
+            exact = mask & (age == 0)
+            self.counts[name]['exact'] += int(exact.sum())
+            self.counts[name]['filled'] += int((mask & ~exact).sum())
+            self.counts[name]['stale'] += int((~mask).sum())
+            self._ages[name].append(age[mask & ~exact])
+
+    def summary(self):
+        result = {'rows': self.rows, 'kept': self.kept, 'dropped': self.rows - self.kept, 'series': {}}
+        for name, counts in self.counts.items():
+            ages = np.concatenate(self._ages[name]) if self._ages[name] else np.empty(0)
+            result['series'][name] = dict(counts, **(
+                {'fill_age_p50': float(np.percentile(ages, 50)), 'fill_age_max': float(ages.max())}
+                if len(ages) else {'fill_age_p50': 0.0, 'fill_age_max': 0.0}))
+        return result
+
+
+def align(series, max_staleness, rates=None, rate_staleness=None, chunk_size=1_000_000):
+    # Rows where every series is fresh: (times, {name: values}, FillStats summary)
+    stats = FillStats(series, max_staleness)
+    out_times, out_values = [], {name: [] for name in series}
+    for times, values, ages, fresh in iter_align(series, max_staleness, rates, rate_staleness, chunk_size):
+        keep = np.logical_and.reduce(list(fresh.values())) if fresh else np.zeros(len(times), dtype=bool)
+        stats.add(ages, fresh, keep)
+        out_times.append(times[keep])
+        for name in series:
+            out_values[name].append(values[name][keep])
+    times = np.concatenate(out_times) if out_times else np.empty(0, dtype=np.int64)
+    values = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in out_values.items()}
+    return times, values, stats.summary()
+
+
+def _ns(index):
+    return pd.DatetimeIndex(index).as_unit('ns').asi8
+
+
+def align_closes(frames, max_staleness_s=300, rates=None, rate_staleness_s=86400, column='close'):
+    # frames: {exchange: OHLCV DataFrame indexed by timestamp}; rates: {exchange: rate Series}
+    # Returns (merged DataFrame with close_<exchange> columns, fill stats in seconds)
+    series = {name: (_ns(df.index), df[column].to_numpy(dtype=float)) for name, df in frames.items()}
+    rate_arrays = {name: (_ns(rate.index), rate.to_numpy(dtype=float)) for name, rate in (rates or {}).items()}
+    times, values, stats = align(series, int(max_staleness_s * 1e9), rate_arrays, int(rate_staleness_s * 1e9))
+    for info in stats['series'].values():
+        info['fill_age_p50'] /= 1e9
+        info['fill_age_max'] /= 1e9
+    index = pd.DatetimeIndex(times.astype('datetime64[ns]'), name='timestamp')
+    first = next(iter(frames.values()), None)
+    if first is not None and getattr(first.index, 'tz', None) is not None:
+        index = index.tz_localize('UTC').tz_convert(first.index.tz)
+    merged = pd.DataFrame({f"{column}_{name}": values[name] for name in frames}, index=index)
+    return merged, stats
+
+
+def quote_currency(symbol):
+    return symbol.split('/')[1] if symbol and '/' in symbol else 'USD'
+
+
+def quote_time(quote):
+    # Exchange timestamp (ms) when the venue sends one, else our receive time
+    return quote['exchange_ts'] / 1000 if quote.get('exchange_ts') else quote.get('recv_ts', time.time())
+
+
+class QuoteAligner:
+    # Live counterpart: keeps the latest quote per exchange and only hands out
+    # prices that are within max_staleness of the freshest one, in USD. Stablecoins
+    # with a rate source are converted at its latest quote, under the same staleness rule.
+    def __init__(self, max_staleness=2.0, rates=None, rate_sources=None):
+        self.max_staleness = max_staleness
+        self.rates = dict(rates or {})                # quote currency -> fixed USD rate (USD itself is 1)
+        self.rate_sources = dict(rate_sources or {})  # (exchange, symbol) -> quote currency it prices
+        self.live_rates = {}                          # quote currency -> (ts, rate)
+        self.latest = {}                              # exchange -> (ts, price, quote currency)
+        self.used = {}
+        self.stale = {}
+
+    def set_rate(self, currency, rate):
+        self.rates[currency] = rate
+
+    def update(self, quote, price_key='last'):
+        price = quote.get(price_key)
+        if price is None:
+            return
+        ts = quote_time(quote)
+        current = self.latest.get(quote['exchange'])
+        if current is None or ts >= current[0]:
+            self.latest[quote['exchange']] = (ts, price, quote_currency(quote.get('symbol')))
+
+    def update_rate(self, quote, price_key='last'):
+        # Quote of a rate source (e.g. coinbase USDT/USD); others are ignored
+        currency = self.rate_sources.get((quote['exchange'], quote.get('symbol')))
+        price = quote.get(price_key)
+        if currency is None or price is None:
+            return
+        ts = quote_time(quote)
+        current = self.live_rates.get(currency)
+        if current is None or ts >= current[0]:
+            self.live_rates[currency] = (ts, price)
+
+    def _rate(self, currency, newest):
+        if currency == 'USD':
+            return 1.0
+        if currency in self.rate_sources.values():
+            # No conversion until the source has quoted, nor once it is stale
+            ts, rate = self.live_rates.get(currency, (None, None))
+            return rate if ts is not None and newest - ts <= self.max_staleness else None
+        return self.rates.get(currency)
+
+    def prices(self):
+        # {exchange: USD price} for quotes no older than max_staleness relative to the newest
+        if not self.latest:
+            return {}
+        newest = max(ts for ts, _, _ in self.latest.values())
+        prices = {}
+        for exchange, (ts, price, currency) in self.latest.items():
+            rate = self._rate(currency, newest)
+            if newest - ts > self.max_staleness or rate is None:
+                self.stale[exchange] = self.stale.get(exchange, 0) + 1
+                continue
+            self.used[exchange] = self.used.get(exchange, 0) + 1
+            prices[exchange] = price * rate
+        return prices
+
+    def skew(self):
+        # Seconds between the oldest and newest quote held
+        if not self.latest:
+            return 0.0
+        times = [ts for ts, _, _ in self.latest.values()]
+        return max(times) - min(times)
+
+    def stats(self):
+        return {exchange: {'used': self.used.get(exchange, 0), 'stale': self.stale.get(exchange, 0)}
+                for exchange in self.latest}
+
+
+def rate_sources(config, exchanges=None):
+    # {(exchange, symbol): currency} of the configured rate series, limited to the polled exchanges
+    sources = {}
+    for currency, rate_config in config.get('alignment', {}).get('rates', {}).items():
+        if rate_config and (exchanges is None or rate_config['exchange'] in exchanges):
+            sources[(rate_config['exchange'], rate_config['symbol'])] = currency
+    return sources
+
+
+def from_config(config, exchanges=None):
+    # Live aligner from the alignment section: stablecoins are converted at the latest quote of
+    # their rate symbol when one of the polled exchanges lists it, else at the configured fallback
+    align_config = config.get('alignment', {})
+    fallback = align_config.get('fallback_rate', 1.0)
+    rates = {currency: fallback for currency in CASH_QUOTES if currency != 'USD'}
+    return QuoteAligner(align_config.get('live_max_staleness_s', 2.0), rates, rate_sources(config, exchanges))
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    minute = 60 * 10**9
+    cb_ts = np.arange(0, 10) * 5 * minute
+    bn_ts = np.delete(cb_ts, [3, 4, 5]) + minute  # binance candles 1 min late, with a 15 min gap
+    series = {'coinbase': (cb_ts, np.linspace(100, 109, 10)), 'binance': (bn_ts, np.linspace(200, 206, 7))}
+    rates = {'binance': (np.array([0]), np.array([0.999]))}
+    times, values, stats = align(series, 5 * minute, rates, rate_staleness=np.iinfo(np.int64).max)
+    print(f"inner join would keep {len(np.intersect1d(cb_ts, bn_ts))} rows; as-of keeps {len(times)}")
+    print(stats)
+
+    aligner = QuoteAligner(max_staleness=2.0, rates={'USDT': 0.999})
+    now = time.time()
+    aligner.update({'exchange': 'coinbase', 'symbol': 'BTC/USD', 'last': 64000.0, 'recv_ts': now})
+    aligner.update({'exchange': 'binance', 'symbol': 'BTC/USDT', 'last': 64100.0, 'recv_ts': now - 5})
+    print(aligner.prices(), aligner.stats())
+
+    # Live USDT rate: no binance price until the rate is quoted, none once it is stale
+    aligner = QuoteAligner(max_staleness=2.0, rates={'USDT': 1.0}, rate_sources={('coinbase', 'USDT/USD'): 'USDT'})
+    aligner.update({'exchange': 'coinbase', 'symbol': 'BTC/USD', 'last': 64000.0, 'recv_ts': now})
+    aligner.update({'exchange': 'binance', 'symbol': 'BTC/USDT', 'last': 64100.0, 'recv_ts': now})
+    assert 'binance' not in aligner.prices()
+    aligner.update_rate({'exchange': 'coinbase', 'symbol': 'USDT/USD', 'last': 0.998, 'recv_ts': now - 1})
+    assert abs(aligner.prices()['binance'] - 64100.0 * 0.998) < 1e-9
+    aligner.update_rate({'exchange': 'coinbase', 'symbol': 'USDT/USD', 'last': 0.997, 'recv_ts': now - 3})
+    assert abs(aligner.prices()['binance'] - 64100.0 * 0.998) < 1e-9  # out-of-order rate ignored
+    aligner.update({'exchange': 'coinbase', 'symbol': 'BTC/USD', 'last': 64010.0, 'recv_ts': now + 2})
+    aligner.update({'exchange': 'binance', 'symbol': 'BTC/USDT', 'last': 64110.0, 'recv_ts': now + 2})
+    assert 'binance' not in aligner.prices()  # rate 3 s older than the newest quote
+    print("live USDT rate: waits for the first quote, then follows it, stale -> skipped -> OK")
@@ -0,0 +1,356 @@
+import csv
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from config_loader import load_config
+from trade_store import EPOCH_ORDINAL, FIELDS, FILL_COLUMNS, FLOAT_COLUMNS, PRICE_COLUMNS, to_epoch_us
+
+# Embedded analytics store for trade history, opportunity open/close events and
+# sampled quotes (SQLite, a file of its own next to the engine channel). The
+# engine buffers rows and writes them in batches; hourly and daily P&L per
+# route are kept as rollup rows updated in the same transaction. Dashboard
+# date filters, P&L by route and CSV exports are then index range scans
+# instead of passes over the whole history in Python.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    symbol TEXT,
+    buy_from TEXT NOT NULL,
+    sell_to TEXT NOT NULL,
+    buy_price REAL,
+    sell_price REAL,
+    amount_usd REAL,
+    profit_usd REAL NOT NULL,
+    balance_usd REAL,
+    fees_paid_usd REAL NOT NULL,
+    fill_ratio REAL,
+    slippage_usd REAL
+);
+CREATE INDEX IF NOT EXISTS trades_ts ON trades (source, ts);
+CREATE INDEX IF NOT EXISTS trades_route ON trades (source, buy_from, sell_to, ts);
+CREATE TABLE IF NOT EXISTS opportunities (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    symbol TEXT,
+    buy_from TEXT NOT NULL,
+    sell_to TEXT NOT NULL,
+    spread_pct REAL,
+    peak_spread_pct REAL,
+    duration_s REAL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS opportunities_ts ON opportunities (ts);
+CREATE INDEX IF NOT EXISTS opportunities_route ON opportunities (buy_from, sell_to, ts);
+CREATE TABLE IF NOT EXISTS quotes (
+    ts REAL NOT NULL,
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_ts ON quotes (symbol, ts);
+CREATE TABLE IF NOT EXISTS trade_rollups (
+    period TEXT NOT NULL,
+    source TEXT NOT NULL,
+    start REAL NOT NULL,
+    buy_from TEXT NOT NULL,
+    sell_to TEXT NOT NULL,
+    trades INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    pnl REAL NOT NULL,
+    fees REAL NOT NULL,
+    volume REAL NOT NULL,
+    PRIMARY KEY (period, source, start, buy_from, sell_to)
+) WITHOUT ROWID;
+"""
+
+TRADE_COLUMNS = ['ts', 'source', 'symbol', 'buy_from', 'sell_to'] + FLOAT_COLUMNS
+PERIODS = {'hour': 3600, 'day': 86400}
+ROUTE_COLUMNS = ['buy_from', 'sell_to', 'trades', 'wins', 'pnl', 'fees', 'volume']
+
+
+def day_bounds(start_date=None, end_date=None):
+    # [start_date 00:00, end_date + 1 day) in UTC epoch seconds; None leaves that side open
+    lo = -float('inf') if start_date is None else (start_date.toordinal() - EPOCH_ORDINAL) * 86400.0
+    hi = float('inf') if end_date is None else (end_date.toordinal() - EPOCH_ORDINAL + 1) * 86400.0
+    return lo, hi
+
+
+class AnalyticsStore:
+    def __init__(self, path="state/analytics.db", readonly=False, batch_size=500, flush_interval_s=5.0,
+                 quote_sample_s=10.0):
+        self.path = path
+        self.readonly = readonly
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.quote_sample_s = quote_sample_s  # at most one stored quote per exchange/symbol in this window
+        self._conn = None
+        self._trades = []
+        self._opportunities = []
+        self._quotes = []
+        self._last_quote = {}
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config_path="config/settings.yaml", readonly=False):
+        analytics_config = load_config(config_path).get('analytics', {})
+        return cls(
+            path=analytics_config.get('path', 'state/analytics.db'),
+            readonly=readonly,
+            batch_size=analytics_config.get('batch_size', 500),
+            flush_interval_s=analytics_config.get('flush_interval_s', 5.0),
+            quote_sample_s=analytics_config.get('quote_sample_s', 10.0)
+        )
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        if self.readonly:
+            if not os.path.exists(self.path):
+                return None
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            # Databases created before the fill columns existed
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(trades)")}
+            for name in FILL_COLUMNS:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE trades ADD COLUMN {name} REAL")
+        return self._conn
+
+    # ---- Writer (engine, backtester) ----
+
+    def add_trade(self, trade, source='live', symbol=None):
+        self._trades.append((to_epoch_us(trade['timestamp']) / 1e6, source, trade.get('symbol') or symbol,
+                             trade['buy_from'], trade['sell_to']) + tuple(trade[name] for name in PRICE_COLUMNS)
+                            + tuple(trade.get(name) for name in FILL_COLUMNS))
+        self._flush_if_full()
+
+    def add_opportunity(self, event):
+        # Lifecycle event from OpportunityTracker.update()
+        self._opportunities.append((event['ts'], event['event'], event.get('symbol'), event['buy_from'],
+                                    event['sell_to'], event['spread_pct'], event.get('peak_spread_pct'),
+                                    event.get('duration_s'), event.get('reason')))
+        self._flush_if_full()
+
+    def add_quote(self, ts, exchange, symbol, price):
+        # Sampled: quotes arriving within quote_sample_s of the last stored one are dropped
+        key = (exchange, symbol)
+        last = self._last_quote.get(key)
+        if price is None or (last is not None and ts - last < self.quote_sample_s):
+            return
+        self._last_quote[key] = ts
+        self._quotes.append((ts, exchange, symbol, price))
+        self._flush_if_full()
+
+    def pending(self):
+        return len(self._trades) + len(self._opportunities) + len(self._quotes)
+
+    def _flush_if_full(self):
+        if self.pending() >= self.batch_size:
+            self.flush()
+
+    def maybe_flush(self):
+        # Called once per engine tick: write when the batch is full or has waited flush_interval_s
+        if self.pending() and time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self):
+        # One transaction: buffered rows plus the rollup rows they change
+        self._last_flush = time.monotonic()
+        if not self.pending():
+            return 0
+        conn = self._connect()
+        written = self.pending()
+        with conn:
+            if self._trades:
+                conn.executemany(f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' * len(TRADE_COLUMNS))})", self._trades)
+                conn.executemany(
+                    "INSERT INTO trade_rollups (period, source, start, buy_from, sell_to, trades, wins, pnl, fees, volume) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(period, source, start, buy_from, sell_to) DO UPDATE SET "
+                    "trades = trades + excluded.trades, wins = wins + excluded.wins, pnl = pnl + excluded.pnl, "
+                    "fees = fees + excluded.fees, volume = volume + excluded.volume",
+                    self._rollup_rows(self._trades))
+            if self._opportunities:
+                conn.executemany(
+                    "INSERT INTO opportunities (ts, event, symbol, buy_from, sell_to, spread_pct, peak_spread_pct, "
+                    "duration_s, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self._opportunities)
+            if self._quotes:
+                conn.executemany("INSERT INTO quotes (ts, exchange, symbol, price) VALUES (?, ?, ?, ?)", self._quotes)
+        self._trades, self._opportunities, self._quotes = [], [], []
+        return written
+
+    @staticmethod
+    def _rollup_rows(trades):
+        # Batch pre-aggregated per (period, source, bucket, route) before it touches the table
+        buckets = {}
+        for ts, source, _, buy_from, sell_to, _, _, amount, profit, _, fees, *_ in trades:
+            for period, seconds in PERIODS.items():
+                key = (period, source, ts - ts % seconds, buy_from, sell_to)
+                row = buckets.get(key)
+                if row is None:
+                    row = buckets[key] = [0, 0, 0.0, 0.0, 0.0]
+                row[0] += 1
+                row[1] += profit > 0
+                row[2] += profit
+                row[3] += fees
+                row[4] += amount
+        return [key + tuple(row) for key, row in buckets.items()]
+
+    def load_trades(self, trades, source='backtest', symbol=None, replace=True):
+        # Bulk load a trade DataFrame (the backtester's output or its CSV); by default
+        # replaces what an earlier run stored under the same source
+        conn = self._connect()
+        if replace:
+            with conn:
+                conn.execute("DELETE FROM trades WHERE source = ?", (source,))
+                conn.execute("DELETE FROM trade_rollups WHERE source = ?", (source,))
+        times = pd.to_datetime(trades['timestamp'], utc=True, format='ISO8601')
+        ts = pd.DatetimeIndex(times).as_unit('ns').asi8 / 1e9
+        symbols = trades['symbol'] if 'symbol' in trades else [symbol] * len(trades)
+        columns = [trades[name].to_numpy(dtype=float).tolist() if name in trades else [None] * len(trades)
+                   for name in FLOAT_COLUMNS]
+        self._trades.extend(zip(ts.tolist(), [source] * len(trades), symbols, trades['buy_from'],
+                                trades['sell_to'], *columns))
+        self.flush()
+        return len(trades)
+
+    # ---- Queries (dashboard) ----
+
+    def _query(self, sql, params=(), columns=None):
+        conn = self._connect()
+        if conn is None:
+            return pd.DataFrame(columns=columns)
+        return pd.read_sql_query(sql, conn, params=params)
+
+    def trade_count(self, start_date=None, end_date=None, source='live'):
+        conn = self._connect()
+        if conn is None:
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM trades WHERE source = ? AND ts >= ? AND ts < ?",
+                            (source,) + day_bounds(start_date, end_date)).fetchone()[0]
+
+    def trades(self, start_date=None, end_date=None, source='live', route=None, limit=None, newest_first=False):
+        # Trades in [start_date, end_date] (UTC dates) as a DataFrame with the TradeStore columns
+        sql = f"SELECT ts, {', '.join(FIELDS[1:])} FROM trades WHERE source = ? AND ts >= ? AND ts < ?"
+        params = (source,) + day_bounds(start_date, end_date)
+        if route is not None:
+            sql += " AND buy_from = ? AND sell_to = ?"
+            params += tuple(route)
+        sql += " ORDER BY ts DESC" if newest_first else " ORDER BY ts"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        df = self._query(sql, params, ['ts'] + FIELDS[1:])
+        us = (df.pop('ts').astype(float) * 1e6).round().astype('int64')
+        df.insert(0, 'timestamp', pd.to_datetime(us, unit='us', utc=True))
+        return df
+
+    def export_csv(self, start_date=None, end_date=None, source='live', out=None, chunk_size=10_000):
+        # Streams the range to a CSV file object (a string is returned when out is None)
+        buffer = io.StringIO() if out is None else out
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        conn = self._connect()
+        if conn is not None:
+            cursor = conn.execute(f"SELECT ts, {', '.join(FIELDS[1:])} FROM trades "
+                                  f"WHERE source = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                                  (source,) + day_bounds(start_date, end_date))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                writer.writerows((datetime.fromtimestamp(row[0], tz=timezone.utc).isoformat(),) + row[1:]
+                                 for row in rows)
+        return buffer.getvalue() if out is None else None
+
+    def day_pnl(self, day, source='live'):
+        conn = self._connect()
+        if conn is None:
+            return 0.0
+        start = (day.toordinal() - EPOCH_ORDINAL) * 86400.0
+        row = conn.execute("SELECT SUM(pnl) FROM trade_rollups WHERE period = 'day' AND source = ? AND start = ?",
+                           (source, start)).fetchone()
+        return row[0] or 0.0
+
+    def pnl_by_route(self, start_date=None, end_date=None, source='live'):
+        # Totals per route from the daily rollups
+        return self._query(
+            "SELECT buy_from, sell_to, SUM(trades) AS trades, SUM(wins) AS wins, SUM(pnl) AS pnl, "
+            "SUM(fees) AS fees, SUM(volume) AS volume FROM trade_rollups "
+            "WHERE period = 'day' AND source = ? AND start >= ? AND start < ? "
+            "GROUP BY buy_from, sell_to ORDER BY pnl DESC",
+            (source,) + day_bounds(start_date, end_date), ROUTE_COLUMNS)
+
+    def rollups(self, start_date=None, end_date=None, period='day', source='live'):
+        # P&L series per hour or day, all routes together
+        df = self._query(
+            "SELECT start, SUM(trades) AS trades, SUM(wins) AS wins, SUM(pnl) AS pnl, SUM(fees) AS fees, "
+            "SUM(volume) AS volume FROM trade_rollups WHERE period = ? AND source = ? AND start >= ? AND start < ? "
+            "GROUP BY start ORDER BY start",
+            (period, source) + day_bounds(start_date, end_date), ['start'] + ROUTE_COLUMNS[2:])
+        df.insert(0, 'timestamp', pd.to_datetime(df.pop('start').astype(float), unit='s', utc=True))
+        return df
+
+    def opportunities(self, start_date=None, end_date=None, event=None):
+        sql = "SELECT * FROM opportunities WHERE ts >= ? AND ts < ?"
+        params = day_bounds(start_date, end_date)
+        if event is not None:
+            sql += " AND event = ?"
+            params += (event,)
+        return self._query(sql + " ORDER BY ts", params)
+
+    def quotes(self, symbol, start_date=None, end_date=None):
+        return self._query("SELECT ts, exchange, price FROM quotes WHERE symbol = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                           (symbol,) + day_bounds(start_date, end_date))
+
+    def close(self):
+        if self._conn is None and not self.pending():
+            return
+        if not self.readonly:
+            self.flush()
+        self._conn.close()
+        self._conn = None
+
+
+# For standalone testing: python analytics_store.py [backtest_trade_history.csv]
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        store = AnalyticsStore.from_config()
+        print(f"Loaded {store.load_trades(pd.read_csv(sys.argv[1]), symbol='BTC/USD')} backtest trades into {store.path}")
+        print(store.pnl_by_route(source='backtest'))
+        store.close()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = AnalyticsStore(os.path.join(tmp, "analytics.db"), batch_size=100)
+            start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+            for i in range(1000):
+                route = ('coinbase', 'binance') if i % 3 else ('binance', 'coinbase')
+                store.add_trade({'timestamp': (start + timedelta(minutes=15 * i)).isoformat(),
+                                 'buy_from': route[0], 'sell_to': route[1], 'buy_price': 64000.0,
+                                 'sell_price': 64300.0, 'amount_usd': 10000.0, 'profit_usd': 10.0 - i % 7,
+                                 'balance_usd': 10000.0, 'fees_paid_usd': 20.0}, symbol='BTC/USD')
+            store.flush()
+            first_day = start.date()
+            print(f"{store.trade_count()} trades, {store.trade_count(first_day, first_day)} on {first_day}, "
+                  f"P&L that day ${store.day_pnl(first_day):.2f}")
+            print(store.pnl_by_route())
+            print(store.rollups(first_day, first_day, period='hour').head())
+            print(store.export_csv(first_day, first_day).splitlines()[:3])
+            store.close()
@@ -1,34 +1,30 @@
-import ccxt
+import os
+import sys
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, timezone
-import time
-from detector import ArbitrageDetector
-from executor import TradeExecutor
+from alignment import align_closes, iter_close_chunks, quote_currency
+from analytics_store import AnalyticsStore
+from backtest_engine import run_backtest, run_backtest_chunked
+from ohlcv_cache import OHLCVCache, fetch_ohlcv_range, to_dataframe
 from config_loader import load_config
+from cost_model import CostModel
+from inventory import Inventory
+from exchange_registry import exchange_id, get_exchange
 
+CHUNKED_TRADES_PATH = "data/backtests/chunked_trade_history.csv"
 
-def fetch_historical_prices(exchange, symbol, timeframe='5m', since_minutes=43200):  # 30 days
+
+def fetch_historical_prices(exchange, symbol, timeframe='5m', since_minutes=43200, cache=None, offline=False):  # 30 days
     end_time = int(datetime.now().timestamp() * 1000)
     since = int((datetime.now() - timedelta(minutes=since_minutes)).timestamp() * 1000)
-    all_data = []
-
-    print(f"Fetching historical candles for {symbol} from {exchange.id}...")
-
-    while since < end_time:
-        try:
-            batch = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=1000)
-            if not batch:
-                break
 
-            all_data += batch
-            since = batch[-1][0] + 1  # move past the last timestamp
+    if cache is not None:
+        # Only missing candles are downloaded; the rest is memory-mapped from disk
+        return to_dataframe(cache.get(exchange, symbol, timeframe, since, end_time, offline=offline))
 
-            # Be nice to the API
-            time.sleep(exchange.rateLimit / 1000)
-
-        except Exception as e:
-            print(f"Error fetching batch: {e}")
-            break
+    print(f"Fetching historical candles for {symbol} from {exchange.id}...")
+    all_data = fetch_ohlcv_range(exchange, symbol, timeframe, since, end_time)
 
     df = pd.DataFrame(all_data, columns=["timestamp", "open", "high", "low", "close", "volume"])
     df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
@@ -36,87 +32,209 @@ def fetch_historical_prices(exchange, symbol, timeframe='5m', since_minutes=4320
     return df
 
 
+def merge_exchanges(frames, symbols, config, since_minutes, cache=None, offline=False):
+    # frames: {exchange: OHLCV DataFrame}, symbols: {exchange: symbol}.
+    # As-of join within max staleness, stablecoin quotes converted to USD.
+    align_config = config.get('alignment', {})
+    fallback = align_config.get('fallback_rate', 1.0)
+    frames, rates = dict(frames), {}
+    for name, symbol in symbols.items():
+        currency = quote_currency(symbol)
+        rate_config = align_config.get('rates', {}).get(currency)
+        if currency == 'USD' or not rate_config:
+            continue
+        df_rate = fetch_historical_prices(get_exchange(rate_config['exchange']), rate_config['symbol'],
+                                          since_minutes=since_minutes, cache=cache, offline=offline)
+        if df_rate.empty:
+            print(f"No {rate_config['symbol']} rate data, using a fixed {fallback} for {currency}")
+            frames[name] = frames[name].assign(close=frames[name]['close'] * fallback)
+            continue
+        rates[name] = df_rate['close']
+    return align_closes(
+        frames,
+        max_staleness_s=align_config.get('max_staleness_s', 300),
+        rates=rates,
+        rate_staleness_s=align_config.get('rate_staleness_s', 86400)
+    )
+
+
+def mapped_closes(cache, name, symbol, timeframe='5m', offline=False, since=None, end_time=None):
+    # (timestamps, closes) as views of the memory-mapped cache file, nothing read yet.
+    # Online, missing candles in [since, end_time) are downloaded into the cache first.
+    if not offline:
+        cache.get(get_exchange(name), symbol, timeframe, since, end_time)
+    data = cache.load(exchange_id(name), symbol, timeframe)
+    return data['timestamp'], data['close']
+
+
+def chunked_trades_path(config):
+    return config.get('backtest', {}).get('trades_path', CHUNKED_TRADES_PATH)
+
+
+def stream_backtest(symbols, config, since_minutes, cache, offline=False, trades_path=None, costs=None):
+    # Out-of-core backtest straight from the OHLCV cache: aligned in windows of chunk_rows
+    # candles, trades appended to trades_path (backtest.trades_path by default, under the
+    # git-ignored data/ tree); memory use does not depend on the date range
+    trades_path = trades_path or chunked_trades_path(config)
+    dirname = os.path.dirname(trades_path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    align_config = config.get('alignment', {})
+    fallback = align_config.get('fallback_rate', 1.0)
+    rate_staleness = align_config.get('rate_staleness_s', 86400) * 1000
+    end_time = int(datetime.now().timestamp() * 1000)
+    since = int((datetime.now() - timedelta(minutes=since_minutes)).timestamp() * 1000)
+
+    series, rates = {}, {}
+    for name, symbol in symbols.items():
+        series[name] = mapped_closes(cache, name, symbol, offline=offline, since=since, end_time=end_time)
+        currency = quote_currency(symbol)
+        rate_config = align_config.get('rates', {}).get(currency)
+        if currency == 'USD' or not rate_config:
+            continue
+        rate_ts, rate = mapped_closes(cache, rate_config['exchange'], rate_config['symbol'],
+                                      offline=offline, since=since, end_time=end_time)
+        if not len(rate_ts):
+            print(f"No {rate_config['symbol']} rate data, using a fixed {fallback} for {currency}")
+            # A constant rate that never goes stale over the backtest range
+            rate_ts = np.arange(since - rate_staleness, end_time + rate_staleness, rate_staleness, dtype=np.int64)
+            rate = np.full(len(rate_ts), float(fallback))
+        rates[name] = (rate_ts, rate)
+
+    (exchange_a, exchange_b) = list(symbols)
+    chunks = iter_close_chunks(series, align_config.get('max_staleness_s', 300) * 1000, rates, rate_staleness,
+                               chunk_size=config.get('backtest', {}).get('chunk_rows', 1_000_000),
+                               start=since, end=end_time)
+    return run_backtest_chunked(
+        chunks,
+        min_spread_pct=config['arbitrage']['min_spread_percentage'],
+        fee_pct=config['trade']['fee_percentage'],
+        trade_amount_usd=config['trade']['amount_usd'],
+        initial_usd=config['trade'].get('initial_usd', 10000),
+        exchange_a=exchange_a,
+        exchange_b=exchange_b,
+        costs=costs,
+        trades_path=trades_path
+    )
+
+
+def print_summary(summary):
+    print("Backtest complete")
+    print(f"Total Trades: {summary['trades']}")
+    print(f"Winning Trades: {summary['wins']}")
+    print(f"Losing Trades: {summary['losses']}")
+    print(f"Final Virtual Balance: ${summary['final_balance']}")
+    print(f"\U0001f4b0 Total Profit Earned: ${summary['total_profit']}")
+    print(f"Total Fees Paid: ${summary['total_fees']}")
+
+
+def print_fill_stats(stats):
+    print(f"Aligned {stats['kept']} of {stats['rows']} timestamps ({stats['dropped']} dropped as stale)")
+    for name, info in stats['series'].items():
+        print(f"  {name}: {info['exact']} exact, {info['filled']} filled (median age {info['fill_age_p50']:.0f}s, "
+              f"max {info['fill_age_max']:.0f}s), {info['stale']} stale")
+
+
 if __name__ == "__main__":
-    coinbase = ccxt.coinbase()
-    binanceus = ccxt.binanceus()
+    coinbase = get_exchange('coinbase')
+    binanceus = get_exchange('binance')
 
     config = load_config()
     trade_amount = config['trade']['amount_usd']
     initial_balance = config['trade'].get('initial_usd', 10000)
 
-    print("Fetching Coinbase data...")
-    df_cb = fetch_historical_prices(coinbase, "BTC/USD", since_minutes=129600)  # 30 days
-
-    print("Fetching BinanceUS data...")
-    df_bn = fetch_historical_prices(binanceus, "BTC/USDT", since_minutes=129600)  # 30 days
-
-    if not df_cb.empty and not df_bn.empty:
-        cb_close = df_cb[['close']].rename(columns={"close": "close_coinbase"})
-        bn_close = df_bn[['close']].rename(columns={"close": "close_binance"})
-        merged = pd.merge(cb_close, bn_close, left_index=True, right_index=True)
-        print(merged.head())
-
-        # Init detector + executor
-        detector = ArbitrageDetector()
-        executor = TradeExecutor(trade_amount_usd=trade_amount)
-
-        # Stats
-        trade_count = 0
-        wins = 0
-        losses = 0
-        print("Running backtest...")
-
-        for timestamp, row in merged.iterrows():
-            prices = {
-                'coinbase': row['close_coinbase'],
-                'binance': row['close_binance']
-            }
-
-            opportunities = detector.find_opportunity(prices)
-            if opportunities:
-                trade = executor.execute(opportunities)
-                print(f"Trade object: {trade}")
-                if trade and all(k in trade for k in ['buy_from', 'sell_to', 'profit_usd']):
-                    trade['timestamp'] = timestamp.isoformat()
-                    print(f"[{timestamp}] Trade executed: Profit = ${trade['profit_usd']}")
-                    trade_count += 1
-
-                    if trade['profit_usd'] > 0:
-                        wins += 1
-                    else:
-                        losses += 1
-                else:
-                    print(f"[{timestamp}] Trade execution returned an incomplete object: {trade}")
-
-        # Summary
-        print("Backtest complete")
-        print(f"Total Trades: {trade_count}")
-        print(f"Winning Trades: {wins}")
-        print(f"Losing Trades: {losses}")
-        print(f"Final Virtual Balance: ${executor.get_balance()}")
-
-        # Total Profit Earned
-        total_profit = executor.get_balance() - initial_balance
-        print(f"\U0001f4b0 Total Profit Earned: ${round(total_profit, 2)}")
-
-        # Total Fees Paid
-        print(f"Total Fees Paid: ${executor.get_total_fees()}")
-
-        # Save history
-        history = executor.get_history()
-        if history:
-            # Average profit margin per trade
-            profit_margins = [
-                (trade['profit_usd'] / trade['amount_usd']) * 100
-                for trade in history if trade['amount_usd'] > 0
-            ]
-            avg_profit_margin = sum(profit_margins) / len(profit_margins)
-            print(f"\U0001f4ca Average Profit Margin per Trade: {round(avg_profit_margin, 4)}%")
-
-            pd.DataFrame(history).to_csv("backtest_trade_history.csv", index=False)
-            print("Trade history saved to backtest_trade_history.csv")
+    bt_config = config.get('backtest', {})
+    cache = OHLCVCache(bt_config['cache_dir']) if bt_config.get('cache_dir') else None
+    offline = bt_config.get('offline', False)
+
+    if bt_config.get('chunked') and cache is None:
+        # Chunked mode streams candles from the on-disk cache; it has nothing to read without one
+        print("backtest.chunked requires backtest.cache_dir to be set", file=sys.stderr)
+        sys.exit(1)
+
+    if bt_config.get('chunked'):
+        print("Running chunked backtest from the OHLCV cache...")
+        cost_model = CostModel.from_config()
+        trades_path = chunked_trades_path(config)
+        _, summary = stream_backtest({'coinbase': "BTC/USD", 'binance': "BTC/USDT"}, config, 129600, cache,
+                                     offline=offline, trades_path=trades_path,
+                                     costs=(cost_model.venue('coinbase', 'BTC/USD'),
+                                            cost_model.venue('binance', 'BTC/USDT')))
+        print(f"Aligned {summary['candles']} timestamps")
+        print_summary(summary)
+        if summary['trades']:
+            print(f"\U0001f4ca Average Profit Margin per Trade: {summary['avg_profit_margin_pct']}%")
+            print(f"Trade history saved to {trades_path}")
+            if config.get('analytics', {}).get('enabled'):
+                store = AnalyticsStore.from_config()
+                for i, chunk in enumerate(pd.read_csv(trades_path, chunksize=100_000)):
+                    store.load_trades(chunk, source='backtest', symbol='BTC/USD', replace=i == 0)
+                store.close()
+                print(f"Trade history loaded into {store.path}")
         else:
             print("No trades were executed. History not saved.")
-
     else:
-        print("Could not fetch both data sources.")
+        print("Fetching Coinbase data...")
+        df_cb = fetch_historical_prices(coinbase, "BTC/USD", since_minutes=129600, cache=cache, offline=offline)  # 30 days
+
+        print("Fetching BinanceUS data...")
+        df_bn = fetch_historical_prices(binanceus, "BTC/USDT", since_minutes=129600, cache=cache, offline=offline)  # 30 days
+
+        if not df_cb.empty and not df_bn.empty:
+            merged, fill_stats = merge_exchanges({'coinbase': df_cb, 'binance': df_bn},
+                                                 {'coinbase': "BTC/USD", 'binance': "BTC/USDT"},
+                                                 config, 129600, cache=cache, offline=offline)
+            print_fill_stats(fill_stats)
+            print(merged.head())
+
+            print("Running backtest...")
+            cost_model = CostModel.from_config()
+            trades, summary = run_backtest(
+                merged,
+                min_spread_pct=config['arbitrage']['min_spread_percentage'],
+                fee_pct=config['trade']['fee_percentage'],
+                trade_amount_usd=trade_amount,
+                initial_usd=initial_balance,
+                costs=(cost_model.venue('coinbase', 'BTC/USD'), cost_model.venue('binance', 'BTC/USDT'))
+            )
+
+            # Summary
+            print_summary(summary)
+
+            if config.get('inventory', {}).get('enabled'):
+                # Same run limited by per-venue holdings, transfer latency/fees and rebalancing
+                _, inv_summary = run_backtest(
+                    merged,
+                    min_spread_pct=config['arbitrage']['min_spread_percentage'],
+                    fee_pct=config['trade']['fee_percentage'],
+                    trade_amount_usd=trade_amount,
+                    initial_usd=initial_balance,
+                    costs=(cost_model.venue('coinbase', 'BTC/USD'), cost_model.venue('binance', 'BTC/USDT')),
+                    inventory=Inventory.from_config()
+                )
+                report = inv_summary['inventory']
+                print("With per-venue inventory:")
+                print(f"Trades: {report['executed']} of {report['opportunities']} opportunities "
+                      f"({report['resized']} resized), missed for lack of inventory: {report['missed_no_inventory']} "
+                      f"(~${report['missed_profit_usd']} profit)")
+                print(f"Capital utilization: {report['capital_utilization_pct']}%  turnover: {report['turnover']}x  "
+                      f"in transit: {report['avg_in_transit_pct']}%")
+                print(f"Transfers: {report['transfers']} (fees {report['transfer_fees']}), "
+                      f"holdings ${report['start_value_usd']} -> ${report['end_value_usd']}")
+
+            # Save history
+            if not trades.empty:
+                print(f"\U0001f4ca Average Profit Margin per Trade: {summary['avg_profit_margin_pct']}%")
+                trades.to_csv("backtest_trade_history.csv", index=False)
+                print("Trade history saved to backtest_trade_history.csv")
+                if config.get('analytics', {}).get('enabled'):
+                    # Queryable next to live trades (source 'backtest'), replacing the previous run
+                    store = AnalyticsStore.from_config()
+                    store.load_trades(trades, source='backtest', symbol='BTC/USD')
+                    store.close()
+                    print(f"Trade history loaded into {store.path}")
+            else:
+                print("No trades were executed. History not saved.")
+
+        else:
+            print("Could not fetch both data sources.")
@@ -0,0 +1,956 @@
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import platform
+import queue
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from aggregator import PriceAggregator
+from alignment import align, align_closes, iter_close_chunks
+from analytics_store import AnalyticsStore
+from backtest_engine import run_backtest, run_backtest_chunked
+from cost_model import CostModel
+from cycles import CycleDetector
+import config_loader
+import exchange_registry
+from detector import ArbitrageDetector
+from executor import TradeExecutor
+from feed import OrderBook
+from slippage import optimal_size, simulate_fill
+from spread_history import SpreadHistory
+from metrics import Metrics
+import logger as log_pipeline
+from mock_exchange import MockTelegramServer, make_mock_exchanges
+from notifier import Notifier
+from ohlcv_cache import OHLCV_DTYPE, OHLCVCache, to_dataframe
+from scanner import OpportunityScanner
+from scheduler import PollScheduler, TokenBucket
+from sweep import run_sweep
+from trade_journal import TradeJournal
+from trade_store import TradeStore
+from tick_log import TickRecorder, TickReplayer
+
+
+def bench_aggregator(rounds=20, symbols=('BTC/USD', 'ETH/USD'), slow_venue_latency=5.0):
+    # Two normal venues plus one that hangs, to show the timeout keeps the snapshot moving
+    latencies = {'coinbase': 0.08, 'binance': 0.05, 'kraken': 0.12}
+
+    sync_agg = PriceAggregator(exchanges=make_mock_exchanges(latencies))
+    async_agg = PriceAggregator(async_exchanges=make_mock_exchanges(latencies, async_mode=True))
+
+    seq_times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        sync_agg.fetch_quotes(list(symbols))
+        seq_times.append(time.perf_counter() - start)
+
+    conc_times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        async_agg.fetch_quotes_concurrent(list(symbols))
+        conc_times.append(time.perf_counter() - start)
+
+    # Slow venue: the snapshot should come back at the timeout, not the venue's latency
+    slow = dict(latencies, slowex=slow_venue_latency)
+    slow_agg = PriceAggregator(async_exchanges=make_mock_exchanges(slow, async_mode=True))
+    slow_agg.fetch_timeout = 0.5
+    start = time.perf_counter()
+    quotes = slow_agg.fetch_quotes_concurrent(list(symbols))
+    slow_elapsed = time.perf_counter() - start
+
+    async_agg.close()
+    slow_agg.close()
+
+    seq_ms = statistics.mean(seq_times) * 1000
+    conc_ms = statistics.mean(conc_times) * 1000
+    print(f"Aggregator fan-out ({len(latencies)} exchanges x {len(symbols)} symbols, {rounds} rounds)")
+    print(f"  sequential: {seq_ms:.1f} ms/tick")
+    print(f"  concurrent: {conc_ms:.1f} ms/tick  ({seq_ms / conc_ms:.1f}x faster)")
+    print(f"  with {slow_venue_latency}s venue + 0.5s timeout: {slow_elapsed * 1000:.1f} ms, "
+          f"{len(quotes)} quotes kept")
+    return {'sequential_ms': seq_ms, 'concurrent_ms': conc_ms, 'slow_venue_ms': slow_elapsed * 1000}
+
+
+def _synthetic_book_matrix(n_symbols, n_exchanges, seed=0):
+    rng = np.random.default_rng(seed)
+    mid = rng.uniform(1, 70000, size=(n_symbols, 1)) * (1 + rng.normal(0, 0.0008, size=(n_symbols, n_exchanges)))
+    half_spread = mid * 0.0001
+    return mid - half_spread, mid + half_spread
+
+
+def bench_scanner(scales=((1, 2), (10, 5), (100, 10), (500, 20)), repeats=50):
+    # Vectorized scan vs calling the per-symbol detector loop for every symbol
+    detector = ArbitrageDetector()
+    results = {}
+    print("Opportunity scanner (symbols x exchanges)")
+    for n_symbols, n_exchanges in scales:
+        symbols = [f"SYM{i}/USD" for i in range(n_symbols)]
+        exchanges = [f"ex{i}" for i in range(n_exchanges)]
+        scanner = OpportunityScanner(symbols, exchanges)
+        bids, asks = _synthetic_book_matrix(n_symbols, n_exchanges)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            opps = scanner.scan(bids, asks)
+        scan_us = (time.perf_counter() - start) / repeats * 1e6
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for s in range(n_symbols):
+                detector.find_book_opportunity(
+                    {exchanges[e]: (bids[s, e], asks[s, e]) for e in range(n_exchanges)}
+                )
+        loop_us = (time.perf_counter() - start) / repeats * 1e6
+
+        found = len(opps) if opps else 0
+        print(f"  {n_symbols:>4} x {n_exchanges:<3} scan: {scan_us:9.1f} us   "
+              f"python loop: {loop_us:9.1f} us   ({loop_us / scan_us:5.1f}x)  {found} opportunities")
+        results[f"{n_symbols}x{n_exchanges}"] = {'scan_us': scan_us, 'loop_us': loop_us}
+    return results
+
+
+def synthetic_merged(n_candles, seed=0):
+    # Two correlated 5m close series with occasional dislocations
+    rng = np.random.default_rng(seed)
+    base = 65000 * np.exp(np.cumsum(rng.normal(0, 0.001, n_candles)))
+    other = base * (1 + rng.normal(0, 0.0015, n_candles))
+    index = pd.date_range("2025-01-01", periods=n_candles, freq="5min")
+    return pd.DataFrame({'close_coinbase': base, 'close_binance': other}, index=index)
+
+
+def bench_backtest(scales=(10_000, 100_000, 1_000_000)):
+    print("Vectorized backtest engine")
+    results = {}
+    for n in scales:
+        merged = synthetic_merged(n)
+        start = time.perf_counter()
+        trades, _ = run_backtest(merged, min_spread_pct=0.3, fee_pct=0.1, trade_amount_usd=10000)
+        elapsed = time.perf_counter() - start
+        print(f"  {n:>9} candles: {elapsed * 1000:8.1f} ms  ({n / elapsed:,.0f} candles/s, {len(trades)} trades)")
+        results[str(n)] = {'ms': elapsed * 1000, 'candles_per_sec': n / elapsed}
+    return results
+
+
+def _sample_trade(i):
+    return {
+        'timestamp': '2025-01-13T00:40:00+00:00', 'buy_from': 'coinbase', 'sell_to': 'binance',
+        'buy_price': 95545.37, 'sell_price': 95835.07, 'amount_usd': 10000,
+        'profit_usd': 10.27, 'balance_usd': 10000 + i, 'fees_paid_usd': 20.0203
+    }
+
+
+def bench_persistence(total=1_000_000, window=10_000, legacy_sizes=(1_000, 5_000, 20_000)):
+    # Per-trade persistence cost: journal append vs the old full-state rewrite
+    print("Trade persistence (per-trade cost)")
+    results = {'journal_us': {}, 'legacy_rewrite_us': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = TradeJournal(os.path.join(tmp, "trade_state.json"))
+        checkpoints = {window, total // 10, total // 2, total}
+        start = time.perf_counter()
+        for i in range(1, total + 1):
+            journal.append(_sample_trade(i), 10000.0 + i, 20.0 * i)
+            if i % window == 0:
+                elapsed = time.perf_counter() - start
+                if i in checkpoints:
+                    us = elapsed / window * 1e6
+                    results['journal_us'][i] = us
+                    print(f"  journal at {i:>9,} records: {us:6.1f} us/trade")
+                start = time.perf_counter()
+        journal.close()
+
+        # Old behaviour: dump the whole history with indent=2 after every trade
+        state_file = os.path.join(tmp, "legacy.json")
+        for n in legacy_sizes:
+            history = [_sample_trade(i) for i in range(n)]
+            start = time.perf_counter()
+            for _ in range(5):
+                with open(state_file, 'w') as f:
+                    json.dump({'usd_balance': 0, 'total_fees': 0, 'trade_history': history}, f, indent=2)
+            us = (time.perf_counter() - start) / 5 * 1e6
+            results['legacy_rewrite_us'][n] = us
+            print(f"  full rewrite at {n:>9,} records: {us:9.1f} us/trade")
+    return results
+
+
+def bench_trade_store(n=200_000, days=60):
+    # Today's P&L and a date-range filter: list-of-dicts scan vs TradeStore
+    start_ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    step = timedelta(days=days) / n
+    records = []
+    for i in range(n):
+        trade = _sample_trade(i)
+        trade['timestamp'] = (start_ts + step * i).isoformat()
+        records.append(trade)
+    today = (start_ts + step * (n - 1)).date()
+    range_start, range_end = today - timedelta(days=7), today
+
+    tracemalloc.start()
+    as_dicts = [dict(r) for r in records]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    store = TradeStore.from_records(records)
+
+    start = time.perf_counter()
+    scan_pnl = sum(t['profit_usd'] for t in as_dicts if datetime.fromisoformat(t['timestamp']).date() == today)
+    scan_filtered = [t for t in as_dicts if range_start <= datetime.fromisoformat(t['timestamp']).date() <= range_end]
+    scan_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    store_pnl = store.day_pnl(today)
+    store_filtered = store.range_indices(range_start, range_end)
+    store_ms = (time.perf_counter() - start) * 1000
+
+    assert abs(scan_pnl - store_pnl) < 1e-6 and len(scan_filtered) == len(store_filtered)
+    print(f"Trade history queries ({n:,} trades)")
+    print(f"  list of dicts: {scan_ms:8.2f} ms   ~{dict_bytes / 1e6:.0f} MB")
+    print(f"  TradeStore:    {store_ms:8.3f} ms   {store.nbytes() / 1e6:.0f} MB")
+    return {'scan_ms': scan_ms, 'store_ms': store_ms, 'dict_mb': dict_bytes / 1e6, 'store_mb': store.nbytes() / 1e6}
+
+
+def bench_analytics(n=200_000, days=60, single_rows=2_000):
+    # Dashboard filter, P&L by route and export for one week: in-memory TradeStore vs the SQLite store
+    start_ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    step = timedelta(days=days) / n
+    records = []
+    for i in range(n):
+        trade = _sample_trade(i)
+        trade['timestamp'] = (start_ts + step * i).isoformat()
+        if i % 3 == 0:
+            trade['buy_from'], trade['sell_to'] = 'binance', 'coinbase'
+        records.append(trade)
+    range_end = (start_ts + step * (n - 1)).date()
+    range_start = range_end - timedelta(days=7)
+    print(f"Analytics store ({n:,} trades, 7-day range)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalyticsStore(os.path.join(tmp, "analytics.db"))
+        start = time.perf_counter()
+        for record in records:
+            store.add_trade(record, symbol='BTC/USD')
+        store.flush()
+        batched_us = (time.perf_counter() - start) / n * 1e6
+
+        # Row-at-a-time commits, as an unbatched writer would do
+        single = AnalyticsStore(os.path.join(tmp, "single.db"), batch_size=1)
+        start = time.perf_counter()
+        for record in records[:single_rows]:
+            single.add_trade(record, symbol='BTC/USD')
+        single_us = (time.perf_counter() - start) / single_rows * 1e6
+        single.close()
+
+        memory = TradeStore.from_records(records)
+        start = time.perf_counter()
+        df = memory.to_dataframe(memory.range_indices(range_start, range_end))
+        memory_routes = df.groupby(['buy_from', 'sell_to'])['profit_usd'].sum()
+        memory_csv = df.to_csv(index=False)
+        memory_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        shown = store.trades(range_start, range_end, limit=1000, newest_first=True)
+        routes = store.pnl_by_route(range_start, range_end)
+        query_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        store_csv = store.export_csv(range_start, range_end)
+        export_ms = (time.perf_counter() - start) * 1000
+        size_mb = os.path.getsize(store.path) / 1e6
+        store.close()
+
+    assert len(shown) == 1000 and abs(routes['pnl'].sum() - memory_routes.sum()) < 1e-6
+    assert store_csv.count('\n') == memory_csv.count('\n')
+    print(f"  insert: {batched_us:.2f} us/trade batched, {single_us:.1f} us/trade committed one by one")
+    print(f"  TradeStore filter + route P&L + CSV: {memory_ms:8.1f} ms")
+    print(f"  SQLite latest rows + route P&L:      {query_ms:8.1f} ms   CSV export {export_ms:.1f} ms   "
+          f"file {size_mb:.0f} MB")
+    return {'batched_us': batched_us, 'single_us': single_us, 'memory_ms': memory_ms, 'query_ms': query_ms,
+            'export_ms': export_ms, 'file_mb': size_mb}
+
+
+def bench_notifier(burst=50, api_latency=0.2):
+    # Hot-path cost of a notification and how a burst is coalesced, against a local Telegram stand-in
+    server = MockTelegramServer(latency=api_latency, throttle_first=1, retry_after=0.2)
+    url = server.start()
+    notifier = Notifier(start=False)
+    notifier.enabled, notifier.bot_token, notifier.chat_id = True, "TEST", "1"
+    notifier.api_url = url
+    notifier.start()
+
+    start = time.perf_counter()
+    for i in range(burst):
+        notifier.send_telegram(f"Opportunity {i}: buy coinbase, sell binance")
+    enqueue_us = (time.perf_counter() - start) / burst * 1e6
+
+    notifier.flush(timeout=30)
+    notifier.close()
+    server.stop()
+
+    blocking_ms = burst * api_latency * 1000
+    print(f"Notifier ({burst} messages, {api_latency * 1000:.0f} ms API latency, first request throttled)")
+    print(f"  enqueue: {enqueue_us:.1f} us/message on the hot path (blocking post: ~{blocking_ms:.0f} ms total)")
+    print(f"  delivered as {len(server.messages)} message(s) over {server.requests} request(s), "
+          f"{notifier.dropped} dropped, {notifier.failed} failed")
+    return {'enqueue_us': enqueue_us, 'messages_posted': len(server.messages), 'requests': server.requests}
+
+
+def _synthetic_book(exchange, mid, levels, rng):
+    book = OrderBook(exchange, 'BTC/USD')
+    ticks = np.arange(1, levels + 1)
+    book.apply_snapshot(
+        [[mid - t * 5, s] for t, s in zip(ticks, rng.uniform(0.01, 2, levels))],
+        [[mid + t * 5, s] for t, s in zip(ticks, rng.uniform(0.01, 2, levels))]
+    )
+    return book
+
+
+def bench_depth(levels=(10, 100, 1000), updates=2000, seed=0):
+    # Per-update cost: apply a level change, size the trade by depth, simulate the fill
+    rng = np.random.default_rng(seed)
+    print("Depth-aware sizing and fill simulation (per book update)")
+    results = {}
+    for n in levels:
+        buy_book = _synthetic_book('coinbase', 65000, n, rng)
+        sell_book = _synthetic_book('binance', 65400, n, rng)
+        prices = 65400 - rng.integers(1, n, updates) * 5
+        sizes = rng.choice([0.0, 0.5, 1.0], updates)
+
+        start = time.perf_counter()
+        for price, size in zip(prices, sizes):
+            sell_book.apply('bid', price, size)
+        apply_us = (time.perf_counter() - start) / updates * 1e6
+
+        start = time.perf_counter()
+        for _ in range(updates):
+            asks, bids = buy_book.depth('ask'), sell_book.depth('bid')
+            amount, _ = optimal_size(asks, bids, 0.1, 175000)
+            simulate_fill(asks, bids, amount, 0.1)
+        sim_us = (time.perf_counter() - start) / updates * 1e6
+        print(f"  {n:>5} levels: book update {apply_us:6.2f} us, size + fill {sim_us:7.1f} us")
+        results[str(n)] = {'apply_us': apply_us, 'size_fill_us': sim_us}
+    return results
+
+
+def bench_sweep(n_markets=4, n_candles=100_000, workers=None):
+    print("Parameter sweep (shared-memory process pool)")
+    markets = {f"M{i}": synthetic_merged(n_candles, seed=i) for i in range(n_markets)}
+    grid = dict(min_spreads=[0.15, 0.2, 0.25, 0.3, 0.35, 0.4], fees=[0.05, 0.1], amounts=[1000, 10000, 50000])
+    combos = n_markets * 6 * 2 * 3
+    results = {}
+    for label, n_workers in (('1 worker', 1), (f"{workers or os.cpu_count()} workers", workers)):
+        start = time.perf_counter()
+        run_sweep(markets, workers=n_workers, **grid)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:>10}: {combos} backtests x {n_candles:,} candles in {elapsed:6.2f} s "
+              f"({combos / elapsed:6.1f} backtests/s)")
+        results[label] = {'sec': elapsed, 'backtests_per_sec': combos / elapsed}
+    return results
+
+
+def bench_metrics(n=1_000_000):
+    print("Instrumentation overhead per span")
+    results = {}
+    for label, enabled in (('disabled', False), ('enabled', True)):
+        registry = Metrics(enabled=enabled)
+        start = time.perf_counter()
+        for _ in range(n):
+            with registry.span('detect', 'coinbase'):
+                pass
+        span_ns = (time.perf_counter() - start) / n * 1e9
+        print(f"  {label:>8}: {span_ns:6.0f} ns/span")
+        results[label] = {'ns_per_span': span_ns}
+    return results
+
+
+def write_synthetic_ticks(path, n_events, seed=0, exchanges=('coinbase', 'binance'), symbol='BTC/USD'):
+    # Alternating venues quoting a shared random walk, 50 ms apart, with rare dislocations
+    rng = np.random.default_rng(seed)
+    mid = 65000 * np.exp(np.cumsum(rng.normal(0, 0.0001, n_events)))
+    mid *= 1 + np.where(rng.random(n_events) < 0.002, 0.005, 0.0) * rng.choice([-1, 1], n_events)
+    recorder = TickRecorder(path, flush_every=10_000)
+    start = time.time()
+    for i in range(n_events):
+        half = mid[i] * 0.00005
+        recorder.record_top(exchanges[i % len(exchanges)], symbol, mid[i] - half, mid[i] + half,
+                            1.0, 1.0, start + i * 0.05)
+    recorder.close()
+    return path
+
+
+def bench_replay(n_events=200_000, seed=0):
+    print("Tick log record / max-speed replay")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.ticks")
+        start = time.perf_counter()
+        write_synthetic_ticks(path, n_events, seed)
+        record_us = (time.perf_counter() - start) / n_events * 1e6
+        size = os.path.getsize(path)
+
+        reports = []
+        with log_pipeline.quiet('executor'):
+            for _ in range(2):
+                replayer = TickReplayer(path)
+                reports.append(replayer.replay())
+                replayer.close()
+    report = reports[0]
+    deterministic = all(r['trades'] == report['trades'] and r['total_profit'] == report['total_profit'] for r in reports)
+    print(f"  record: {record_us:5.2f} us/quote, {size / n_events:.0f} bytes/quote")
+    print(f"  replay: {report['events_per_sec']:,.0f} events/s ({n_events:,} events, "
+          f"{report['trades']} trades, profit ${report['total_profit']:,}, deterministic: {deterministic})")
+    return {'record_us': record_us, 'events_per_sec': report['events_per_sec'], 'deterministic': deterministic}
+
+
+def bench_spread_history(uptimes_days=(1, 7, 28), poll_interval=5, pairs=3):
+    # Per-refresh chart prep and memory: old list-of-dicts -> DataFrame vs ring buffers
+    print("Dashboard spread history per refresh")
+    results = {}
+    for days in uptimes_days:
+        n = int(days * 86400 / poll_interval)
+        ts = 1_700_000_000 + np.arange(n, dtype=float) * poll_interval
+        values = np.random.default_rng(0).normal(0, 0.1, n)
+
+        legacy = [{'timestamp': datetime.fromtimestamp(t), 'spread_pct': v} for t, v in zip(ts.tolist(), values.tolist())]
+        tracemalloc.start()
+        legacy_copy = [dict(row) for row in legacy]
+        legacy_mb = tracemalloc.get_traced_memory()[0] / 1e6 * pairs
+        tracemalloc.stop()
+        del legacy_copy
+        start = time.perf_counter()
+        df = pd.DataFrame(legacy)
+        df.set_index("timestamp", inplace=True)
+        legacy_ms = (time.perf_counter() - start) * 1000 * pairs
+
+        history = SpreadHistory()
+        for p in range(pairs):
+            for t, v in zip(ts.tolist(), values.tolist()):
+                history.append(f"pair{p}", t, v)
+        start = time.perf_counter()
+        history.frame('raw')
+        ring_ms = (time.perf_counter() - start) * 1000
+        ring_mb = history.nbytes() / 1e6
+
+        print(f"  {days:>3}d uptime x {pairs} pairs: list + DataFrame {legacy_ms:8.1f} ms / {legacy_mb:7.1f} MB   "
+              f"ring buffers {ring_ms:6.2f} ms / {ring_mb:5.2f} MB")
+        results[f"{days}d"] = {'legacy_ms': legacy_ms, 'legacy_mb': legacy_mb, 'ring_ms': ring_ms, 'ring_mb': ring_mb}
+
+    history = SpreadHistory()
+    start = time.perf_counter()
+    for i in range(100_000):
+        history.append('pair0', 1_700_000_000 + i * 5.0, 0.1)
+    append_us = (time.perf_counter() - start) / 100_000 * 1e6
+    print(f"  append: {append_us:.2f} us/point (raw + 1m + 1h)")
+    results['append_us'] = append_us
+    return results
+
+
+def bench_cycles(n_exchanges=3, n_coins=(10, 40, 100), updates=20_000, seed=0):
+    # Per-update latency of the incremental cycle search on a synthetic market universe
+    print("Multi-leg cycle detection per price update")
+    results = {}
+    for coins in n_coins:
+        rng = np.random.default_rng(seed)
+        prices = {'USD': 1.0, 'BTC': 65000.0}
+        prices.update({f"C{i}": float(rng.uniform(0.1, 5000)) for i in range(coins)})
+        markets = []
+        for e in range(n_exchanges):
+            for asset in prices:
+                if asset != 'USD':
+                    markets.append((f"ex{e}", f"{asset}/USD"))
+                if asset not in ('USD', 'BTC'):
+                    markets.append((f"ex{e}", f"{asset}/BTC"))
+
+        detector = CycleDetector(fee_pct=0.1)
+        for exchange, symbol in markets:
+            base, quote = symbol.split('/')
+            mid = prices[base] / prices[quote]
+            detector.update(exchange, symbol, mid * 0.9999, mid * 1.0001)
+
+        picks = rng.integers(0, len(markets), updates)
+        noise = rng.normal(0, 0.0003, updates)
+        # Occasional dislocation big enough to beat three legs of fees
+        noise[rng.random(updates) < 0.001] = 0.01
+        timings = []
+        found = 0
+        for k in range(updates):
+            exchange, symbol = markets[picks[k]]
+            base, quote = symbol.split('/')
+            mid = prices[base] / prices[quote] * (1 + noise[k])
+            start = time.perf_counter()
+            cycles = detector.update(exchange, symbol, mid * 0.9999, mid * 1.0001)
+            timings.append(time.perf_counter() - start)
+            found += bool(cycles)
+        timings_us = np.array(timings) * 1e6
+        p50, p99 = np.percentile(timings_us, [50, 99])
+        print(f"  {len(markets):>4} markets, {len(detector.nodes):>4} nodes: p50 {p50:6.1f} us  "
+              f"p99 {p99:7.1f} us  max {timings_us.max():8.1f} us  ({found} updates with cycles)")
+        results[str(len(markets))] = {'p50_us': p50, 'p99_us': p99, 'max_us': float(timings_us.max())}
+    return results
+
+
+def _synthetic_markets(n_markets):
+    markets = {}
+    for i in range(n_markets):
+        symbol = f"C{i}/USD"
+        markets[symbol] = {
+            'id': f"C{i}-USD", 'symbol': symbol, 'base': f"C{i}", 'quote': 'USD', 'baseId': f"C{i}",
+            'quoteId': 'USD', 'active': True, 'type': 'spot', 'spot': True, 'taker': 0.006, 'maker': 0.004,
+            'precision': {'amount': 1e-08, 'price': 0.01},
+            'limits': {'amount': {'min': 1e-08, 'max': 1e6}, 'cost': {'min': 1.0, 'max': None}}
+        }
+    return markets
+
+
+def bench_startup(components=6, n_markets=800, download_latency=1.5):
+    # Repeated setup as each component / Streamlit rerun used to do it, vs the shared registry
+    print("Cold start: config parsing and exchange metadata")
+    results = {}
+    abs_path = os.path.abspath(os.path.join(os.path.dirname(config_loader.__file__), "..", "config/settings.yaml"))
+    start = time.perf_counter()
+    for _ in range(components):
+        config_loader._parse(abs_path)
+    parse_ms = (time.perf_counter() - start) * 1000
+    config_loader.load_config()
+    start = time.perf_counter()
+    for _ in range(components):
+        config_loader.load_config()
+    cached_ms = (time.perf_counter() - start) * 1000
+    print(f"  config x{components}: parse every time {parse_ms:6.1f} ms   cached {cached_ms:6.2f} ms")
+    results['config'] = {'parse_ms': parse_ms, 'cached_ms': cached_ms}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = exchange_registry.MarketCache(tmp)
+        markets = _synthetic_markets(n_markets)
+        cache.save('coinbase', markets, {})
+        saved_cache = exchange_registry._market_cache
+        exchange_registry._market_cache = cache
+        try:
+            start = time.perf_counter()
+            exchange = exchange_registry.create_exchange('coinbase')
+            warm_ms = (time.perf_counter() - start) * 1000
+        finally:
+            exchange_registry._market_cache = saved_cache
+    ctor_start = time.perf_counter()
+    import ccxt
+    ccxt.coinbase()
+    ctor_ms = (time.perf_counter() - ctor_start) * 1000
+    cold_ms = ctor_ms + download_latency * 1000
+    print(f"  exchange + {n_markets} markets: construct + download ~{cold_ms:7.1f} ms "
+          f"(assuming {download_latency}s exchange-info call)   from cache {warm_ms:6.1f} ms "
+          f"({len(exchange.markets)} markets)")
+    results['markets'] = {'cold_ms': cold_ms, 'warm_ms': warm_ms}
+    return results
+
+
+def bench_costs(n=200_000, seed=0):
+    # Candidate trades that clear a flat 0.1% fee, re-priced with tiers, lot sizes and transfer costs
+    print("Cost model: flat fee vs fee tiers + precision + transfer cost")
+    rng = np.random.default_rng(seed)
+    buy = 64000 + rng.normal(0, 50, n)
+    sell = buy * (1 + rng.uniform(0.0, 0.006, n))
+    amount = rng.choice([50.0, 500.0, 5000.0], n)
+    flat = CostModel.flat(0.1)
+    realistic = CostModel(
+        fee_pct=0.1,
+        default={'amount_step': 0.00001, 'price_tick': 0.01, 'min_notional_usd': 10.0},
+        exchanges={'coinbase': {'volume_30d_usd': 50_000, 'tiers': [[0, 0.4, 0.6], [10_000, 0.25, 0.4]],
+                                'withdrawal_fee': {'BTC': 0.0001}},
+                   'binance': {'tiers': [[0, 0.1, 0.1]], 'withdrawal_fee': {'BTC': 0.0002}}},
+        rebalance_every=20
+    )
+    flat_profit, _, _, flat_viable = flat.evaluate('coinbase', 'binance', buy, sell, amount, 'BTC/USD')
+    start = time.perf_counter()
+    profit, _, _, viable = realistic.evaluate('coinbase', 'binance', buy, sell, amount, 'BTC/USD')
+    vector_ns = (time.perf_counter() - start) / n * 1e9
+    flat_hits = flat_viable & (flat_profit > 0)
+    rejected = int((flat_hits & ~(viable & (profit > 0))).sum())
+    m = 20_000
+    start = time.perf_counter()
+    for i in range(m):
+        realistic.evaluate('coinbase', 'binance', float(buy[i]), float(sell[i]), float(amount[i]), 'BTC/USD')
+    scalar_us = (time.perf_counter() - start) / m * 1e6
+    print(f"  {int(flat_hits.sum()):,} of {n:,} candidates profitable at a flat fee; "
+          f"{rejected:,} ({rejected / max(int(flat_hits.sum()), 1):.0%}) rejected by the full cost model")
+    print(f"  evaluate: {scalar_us:.2f} us/trade scalar, {vector_ns:.0f} ns/trade vectorized")
+    return {'flat_profitable': int(flat_hits.sum()), 'rejected': rejected,
+            'scalar_us': scalar_us, 'vector_ns': vector_ns}
+
+
+def bench_alignment(n_ticks=(100_000, 1_000_000, 4_000_000), max_staleness_ms=2000, seed=0):
+    # Two tick streams at independent random times: pandas outer join + ffill vs the chunked as-of merge
+    print("As-of alignment of two tick streams")
+    rng = np.random.default_rng(seed)
+    results = {}
+    for n in n_ticks:
+        series = {}
+        for name in ('coinbase', 'binance'):
+            ts = np.sort(rng.integers(0, n * 100, n)).astype(np.int64)  # ~100 ms apart, in ms
+            series[name] = (ts, 64000 + rng.normal(0, 5, n).cumsum())
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        frames = [pd.Series(v, index=ts, name=name).groupby(level=0).last() for name, (ts, v) in series.items()]
+        joined = pd.concat(frames, axis=1).ffill().dropna()
+        pandas_s = time.perf_counter() - start
+        pandas_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        del frames, joined
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        times, _, stats = align(series, max_staleness_ms, chunk_size=250_000)
+        align_s = time.perf_counter() - start
+        align_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        print(f"  {n:>9,} ticks/stream: outer join + ffill {pandas_s * 1000:7.1f} ms / {pandas_mb:6.1f} MB   "
+              f"as-of {align_s * 1000:7.1f} ms / {align_mb:6.1f} MB ({stats['kept']:,} rows, "
+              f"{stats['dropped']:,} stale)")
+        results[str(n)] = {'pandas_ms': pandas_s * 1000, 'pandas_mb': pandas_mb,
+                           'align_ms': align_s * 1000, 'align_mb': align_mb}
+    return results
+
+
+def _write_candles(cache, exchange_id, symbol, closes, start_ms, step_ms, keep):
+    records = np.zeros(int(keep.sum()), dtype=OHLCV_DTYPE)
+    records['timestamp'] = start_ms + np.flatnonzero(keep) * step_ms
+    for column in ('open', 'high', 'low', 'close'):
+        records[column] = closes[keep]
+    path = cache.path(exchange_id, symbol, '1m')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    records.tofile(path)
+
+
+def bench_chunked(scales=(250_000, 1_000_000), chunk_rows=100_000, seed=0):
+    # Years of 1m candles from the on-disk cache: load + align + backtest + trade CSV, in memory vs chunked
+    print(f"Out-of-core backtest over the OHLCV cache ({chunk_rows:,} rows per chunk)")
+    rng = np.random.default_rng(seed)
+    step_ms, start_ms = 60_000, 1_600_000_000_000
+    results = {}
+    for n in scales:
+        base = 30000 * np.exp(rng.normal(0, 2e-4, n).cumsum())
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = OHLCVCache(tmp)
+            # Independent ~1% gaps per venue, so the as-of merge has fills and stale rows to do
+            _write_candles(cache, 'coinbase', 'BTC/USD', base, start_ms, step_ms, rng.random(n) > 0.01)
+            _write_candles(cache, 'binanceus', 'BTC/USD', base * (1 + rng.normal(0, 0.0015, n)), start_ms, step_ms,
+                           rng.random(n) > 0.01)
+            args = dict(min_spread_pct=0.3, fee_pct=0.1, trade_amount_usd=10000, initial_usd=10000)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            frames = {'coinbase': to_dataframe(cache.load('coinbase', 'BTC/USD', '1m')),
+                      'binance': to_dataframe(cache.load('binanceus', 'BTC/USD', '1m'))}
+            merged, _ = align_closes(frames, max_staleness_s=300)
+            trades, summary = run_backtest(merged, **args)
+            trades.to_csv(os.path.join(tmp, "memory.csv"), index=False)
+            memory_s = time.perf_counter() - start
+            memory_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            del frames, merged
+
+            csv_path = os.path.join(tmp, "trades.csv")
+            tracemalloc.start()
+            start = time.perf_counter()
+            series = {'coinbase': cache.load('coinbase', 'BTC/USD', '1m'),
+                      'binance': cache.load('binanceus', 'BTC/USD', '1m')}
+            chunks = iter_close_chunks({name: (data['timestamp'], data['close']) for name, data in series.items()},
+                                       300_000, chunk_size=chunk_rows)
+            _, chunked_summary = run_backtest_chunked(chunks, **args, trades_path=csv_path)
+            chunked_s = time.perf_counter() - start
+            chunked_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            del series
+
+            saved = pd.read_csv(csv_path)
+            assert chunked_summary.pop('candles') > 0 and chunked_summary == summary
+            assert len(saved) == len(trades) and np.array_equal(saved['balance_usd'], trades['balance_usd'])
+        print(f"  {n:>9,} candles ({len(trades):,} trades): in memory {memory_s * 1000:7.1f} ms / {memory_mb:6.1f} MB"
+              f"   chunked {chunked_s * 1000:7.1f} ms / {chunked_mb:6.1f} MB")
+        results[str(n)] = {'memory_ms': memory_s * 1000, 'memory_mb': memory_mb,
+                           'chunked_ms': chunked_s * 1000, 'chunked_mb': chunked_mb}
+    return results
+
+
+def bench_polling(n_symbols=20, hours=2, rate=2.0, threshold=0.3, dt=0.1, seed=0):
+    # Simulated spreads for many symbols under one request budget: fixed round-robin vs adaptive scheduler
+    print(f"Polling {n_symbols} symbols at {rate} requests/s per exchange ({hours}h simulated)")
+    rng = np.random.default_rng(seed)
+    steps = int(hours * 3600 / dt)
+    # Mean-reverting spreads: a fifth of the symbols trade near the threshold, the rest are quiet
+    active = np.arange(n_symbols) < n_symbols // 5
+    mean, vol = np.where(active, 0.2, 0.05), np.where(active, 0.02, 0.005)
+    spreads = np.empty((steps, n_symbols))
+    spread = mean.copy()
+    for i in range(steps):
+        spread = spread + 0.01 * (mean - spread) * dt + vol * np.sqrt(dt) * rng.standard_normal(n_symbols)
+        spreads[i] = spread
+    above = spreads >= threshold
+    # Opportunity episodes: runs of consecutive steps at or above the threshold
+    episodes = []
+    for j in range(n_symbols):
+        edges = np.diff(np.concatenate([[0], above[:, j].astype(np.int8), [0]]))
+        episodes += [(j, a, b) for a, b in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))]
+
+    symbols = [f"S{j}" for j in range(n_symbols)]
+    round_robin = n_symbols / rate
+    results = {}
+    for label in ('fixed', 'adaptive'):
+        budgets = {'coinbase': TokenBucket(rate, 5), 'binance': TokenBucket(rate, 5)}
+        if label == 'fixed':
+            scheduler = PollScheduler(symbols, threshold, budgets, min_interval=round_robin, max_interval=round_robin)
+        else:
+            scheduler = PollScheduler(symbols, threshold, budgets, min_interval=0.5, max_interval=60,
+                                      initial_interval=round_robin)
+        polled = np.zeros((steps, n_symbols), dtype=bool)
+        start = time.perf_counter()
+        for i in range(steps):
+            for symbol in scheduler.due(i * dt):
+                j = int(symbol[1:])
+                polled[i, j] = True
+                scheduler.observe(symbol, {'coinbase': 100.0, 'binance': 100.0 * (1 + spreads[i, j] / 100)}, i * dt)
+        per_step_us = (time.perf_counter() - start) / steps * 1e6
+        latencies = []
+        for j, a, b in episodes:
+            hits = np.flatnonzero(polled[a:b, j])
+            if len(hits):
+                latencies.append(hits[0] * dt)
+        results[label] = {
+            'requests': int(polled.sum()) * len(budgets),
+            'episodes_seen': len(latencies),
+            'polls_in_opportunity': int((polled & above).sum()),
+            'median_delay_s': float(np.median(latencies)) if latencies else None,
+            'scheduler_us': per_step_us
+        }
+        print(f"  {label:8s}: {len(latencies):4d} of {len(episodes)} opportunity episodes seen, "
+              f"{results[label]['polls_in_opportunity']:5d} quotes during them, "
+              f"{results[label]['requests']:,} requests, scheduler {per_step_us:.1f} us/step")
+    return results
+
+
+class _SlowFileHandler(logging.FileHandler):
+    # A file on a slow disk / a blocked terminal: every write stalls
+    def __init__(self, path, delay_s):
+        super().__init__(path)
+        self.delay_s = delay_s
+
+    def emit(self, record):
+        time.sleep(self.delay_s)
+        super().emit(record)
+
+
+def bench_logging(n=5_000, io_delay_ms=0.2, errors=10_000):
+    # Caller-side cost of logging a trade when the write is slow: synchronous handler vs queue + writer thread
+    print(f"Logging {n:,} trades with {io_delay_ms} ms per write")
+    trade = _sample_trade(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ('sync', 'queued'):
+            slow = _SlowFileHandler(os.path.join(tmp, f"{label}.log"), io_delay_ms / 1000)
+            slow.setFormatter(log_pipeline.JsonFormatter())
+            bench_logger = logging.getLogger(f"bench.logging.{label}")
+            bench_logger.propagate = False
+            bench_logger.setLevel(logging.INFO)
+            listener = None
+            if label == 'sync':
+                bench_logger.addHandler(slow)
+            else:
+                handler = log_pipeline.NonBlockingQueueHandler(queue.Queue(n))
+                handler.addFilter(log_pipeline.RateLimitFilter())
+                bench_logger.addHandler(handler)
+                listener = logging.handlers.QueueListener(handler.queue, slow)
+                listener.start()
+            latencies = []
+            for i in range(n):
+                start = time.perf_counter()
+                bench_logger.info("[TRADE EXECUTED]", extra={'fields': trade})
+                latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            if listener is not None:
+                listener.stop()
+            drain_ms = (time.perf_counter() - start) * 1000
+            slow.close()
+            bench_logger.handlers.clear()
+            latencies.sort()
+            results[label] = {'p50_us': latencies[n // 2] * 1e6, 'p99_us': latencies[int(n * 0.99)] * 1e6,
+                              'drain_ms': drain_ms}
+            print(f"  {label:6s}: p50 {results[label]['p50_us']:8.1f} us   p99 {results[label]['p99_us']:8.1f} us"
+                  + (f"   (writer caught up {drain_ms:.0f} ms later)" if listener is not None else ""))
+
+    # A venue failing on every poll: identical errors are let through in bursts, the rest counted
+    limiter = log_pipeline.RateLimitFilter(window_s=60, burst=5)
+    record = logging.LogRecord('arb.aggregator', logging.WARNING, __file__, 0, "Error fetching %s from %s: %s",
+                               ('BTC/USD', 'binance', 'timeout'), None)
+    passed = sum(limiter.filter(record) for _ in range(errors))
+    results['repeated_errors'] = {'logged': passed, 'suppressed': limiter.suppressed}
+    print(f"  {errors:,} identical errors in one window: {passed} written, {limiter.suppressed:,} suppressed")
+    return results
+
+
+# ---- Regression suite: same metrics for every hot path, saved as JSON ----
+
+def measure(fn, n, warmup=10, memory_calls=None):
+    # Per-call latency over n calls, then peak traced memory over a separate
+    # (shorter) pass, so tracemalloc does not distort the timings
+    for _ in range(warmup):
+        fn()
+    latencies = np.empty(n)
+    clock = time.perf_counter_ns
+    for i in range(n):
+        start = clock()
+        fn()
+        latencies[i] = clock() - start
+    tracemalloc.start()
+    for _ in range(memory_calls or min(n, 100)):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    total_s = latencies.sum() / 1e9
+    return {
+        'ops_per_sec': n / total_s if total_s else 0.0,
+        'p50_us': float(np.percentile(latencies, 50)) / 1000,
+        'p99_us': float(np.percentile(latencies, 99)) / 1000,
+        'peak_mb': peak / 1e6
+    }
+
+
+def _suite_detector(n_exchanges, calls=20_000, seed=0):
+    detector = ArbitrageDetector()
+    rng = np.random.default_rng(seed)
+    names = [f"ex{i}" for i in range(n_exchanges)]
+    ticks = itertools.cycle([dict(zip(names, (65000 * (1 + rng.normal(0, 0.002, n_exchanges))).tolist()))
+                             for _ in range(1000)])
+    return lambda: detector.find_opportunity(next(ticks)), calls
+
+
+def _suite_executor(tmp, history, calls=2000):
+    executor = TradeExecutor(initial_usd=1e12, trade_amount_usd=1000, state_file=os.path.join(tmp, f"exec{history}.json"))
+    opportunity = [{'buy_from': 'coinbase', 'sell_to': 'binance', 'buy_price': 64000.0, 'sell_price': 64500.0}]
+    for _ in range(history):
+        executor.execute(opportunity)
+    return executor, (lambda: executor.execute(opportunity)), calls
+
+
+def bench_suite(detector_exchanges=(2, 5, 10), executor_history=(1_000, 10_000, 100_000),
+                backtest_candles=(10_000, 100_000, 1_000_000)):
+    # Offline hot-path suite on synthetic data: {case: {scale: metrics}}
+    print("Benchmark suite (ops/s, p50/p99 latency, peak traced memory)")
+    results = {'find_opportunity': {}, 'execute': {}, 'save_state': {}, 'backtest': {}}
+
+    def report(case, scale, stats):
+        results[case][str(scale)] = stats
+        print(f"  {case:>16} {scale:>9,}: {stats['ops_per_sec']:12,.0f} ops/s  p50 {stats['p50_us']:9.1f} us  "
+              f"p99 {stats['p99_us']:9.1f} us  peak {stats['peak_mb']:8.2f} MB")
+
+    for n in detector_exchanges:
+        fn, calls = _suite_detector(n)
+        report('find_opportunity', n, measure(fn, calls))
+
+    # The executor logs every trade at INFO; keep those lines out of the terminal and the measurement
+    with tempfile.TemporaryDirectory() as tmp, log_pipeline.quiet('executor'):
+        for history in executor_history:
+            executor, fn, calls = _suite_executor(tmp, history)
+            stats = measure(fn, calls)
+            save_stats = measure(executor._save_state, 200, warmup=2, memory_calls=20)
+            executor.close()
+            report('execute', history, stats)
+            report('save_state', history, save_stats)
+
+    for n in backtest_candles:
+        merged = synthetic_merged(n)
+        repeats = max(3, 300_000 // n)
+        report('backtest', n, measure(lambda: run_backtest(merged, min_spread_pct=0.3, fee_pct=0.1,
+                                                           trade_amount_usd=10000),
+                                      repeats, warmup=1, memory_calls=1))
+    return results
+
+
+def compare(current, baseline, thresholds):
+    # Regressions beyond thresholds (% worse than baseline) as readable lines
+    failures = []
+    for case, scales in current.items():
+        for scale, stats in scales.items():
+            base = baseline.get(case, {}).get(scale)
+            if not base:
+                continue
+            for metric, limit in thresholds.items():
+                if not base.get(metric):
+                    continue
+                if metric == 'peak_mb' and max(base[metric], stats[metric]) < 0.1:
+                    continue  # allocator noise, not a real footprint
+                change = (stats[metric] - base[metric]) / base[metric] * 100
+                worse = -change if metric == 'ops_per_sec' else change
+                if worse > limit:
+                    failures.append(f"{case} @ {scale}: {metric} {base[metric]:.4g} -> {stats[metric]:.4g} "
+                                    f"({worse:+.1f}% worse, limit {limit}%)")
+    return failures
+
+
+def save_results(results, results_dir):
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    with open(path, 'w') as f:
+        json.dump({
+            'meta': {'created': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(),
+                     'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+                     'cpus': os.cpu_count()},
+            'results': results
+        }, f, indent=2, default=str)
+    return path
+
+
+BENCHMARKS = {
+    'aggregator': bench_aggregator,
+    'scanner': bench_scanner,
+    'backtest': bench_backtest,
+    'persistence': bench_persistence,
+    'trade_store': bench_trade_store,
+    'analytics': bench_analytics,
+    'notifier': bench_notifier,
+    'depth': bench_depth,
+    'sweep': bench_sweep,
+    'metrics': bench_metrics,
+    'replay': bench_replay,
+    'spread_history': bench_spread_history,
+    'cycles': bench_cycles,
+    'startup': bench_startup,
+    'costs': bench_costs,
+    'alignment': bench_alignment,
+    'chunked': bench_chunked,
+    'polling': bench_polling,
+    'logging': bench_logging,
+    'suite': bench_suite
+}
+
+
+if __name__ == "__main__":
+    # python benchmarks.py [names...] [--update-baseline]; results are saved as JSON and
+    # the suite is compared with the baseline (exit code 1 on a regression)
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    update_baseline = '--update-baseline' in sys.argv
+    names = args or list(BENCHMARKS)
+    bench_config = config_loader.load_config().get('benchmarks', {})
+    results = {name: BENCHMARKS[name]() for name in names}
+    path = save_results(results, bench_config.get('results_dir', 'data/benchmarks'))
+    print(f"Results saved to {path}")
+
+    if 'suite' in results:
+        baseline_path = bench_config.get('baseline', 'data/benchmarks/baseline.json')
+        if update_baseline or not os.path.exists(baseline_path):
+            os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(results['suite'], f, indent=2)
+            print(f"Baseline written to {baseline_path}")
+        else:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            failures = compare(results['suite'], baseline, bench_config.get(
+                'max_regression_pct', {'ops_per_sec': 25, 'p99_us': 50, 'peak_mb': 25}))
+            for line in failures:
+                print(f"REGRESSION {line}")
+            if failures:
+                sys.exit(1)
+            print(f"No regressions against {baseline_path}")
@@ -1,6 +1,18 @@
+import copy
 import os
 import yaml
 
+# Parsed settings are cached per file and re-read only when the file changes,
+# so every component (and every Streamlit rerun) can call load_config() cheaply.
+# Callers get their own copy and may modify it freely.
+_cache = {}  # abs path -> (mtime_ns, parsed config)
+
+
+def _parse(abs_path):
+    with open(abs_path, "r") as f:
+        return yaml.safe_load(f)
+
+
 def load_config(config_path="config/settings.yaml"):
     abs_path = os.path.join(os.path.dirname(__file__), "..", config_path)
     abs_path = os.path.abspath(abs_path)
@@ -8,5 +20,8 @@ def load_config(config_path="config/settings.yaml"):
     if not os.path.exists(abs_path):
         raise FileNotFoundError(f"Config file not found: {abs_path}")
 
-    with open(abs_path, "r") as f:
-        return yaml.safe_load(f)
+    mtime = os.stat(abs_path).st_mtime_ns
+    cached = _cache.get(abs_path)
+    if cached is None or cached[0] != mtime:
+        cached = _cache[abs_path] = (mtime, _parse(abs_path))
+    return copy.deepcopy(cached[1])
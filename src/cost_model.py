@@ -0,0 +1,233 @@
+import math
+import numpy as np
+from config_loader import load_config
+from slippage import optimal_size, simulate_fill
+
+# Trading cost model shared by the detector, executor and backtester.
+# Per exchange/symbol it precomputes the fee tier (maker/taker by 30-day
+# volume), exchange precision (lot size, tick size), minimums (amount,
+# notional) and an amortized withdrawal cost for rebalancing. trade_costs()
+# is plain arithmetic, so it takes scalars or NumPy arrays alike. With zero
+# steps, minimums and transfer cost it is exactly the flat-fee math the
+# executor has always used.
+
+
+class VenueCosts:
+    __slots__ = ('taker', 'maker', 'amount_step', 'price_tick', 'min_amount', 'min_notional', 'transfer_fee')
+
+    def __init__(self, taker, maker=None, amount_step=0.0, price_tick=0.0, min_amount=0.0, min_notional=0.0,
+                 transfer_fee=0.0):
+        self.taker = taker               # fraction, e.g. 0.001
+        self.maker = taker if maker is None else maker
+        self.amount_step = amount_step   # lot size in base units (0 = no rounding)
+        self.price_tick = price_tick
+        self.min_amount = min_amount
+        self.min_notional = min_notional
+        self.transfer_fee = transfer_fee  # base units per trade (withdrawal fee / rebalance interval)
+
+    def __repr__(self):
+        return "VenueCosts(" + ", ".join(f"{k}={getattr(self, k)}" for k in self.__slots__) + ")"
+
+
+def _is_zero(x):
+    return np.isscalar(x) and x == 0
+
+
+def _floor_to(x, step):
+    if _is_zero(step):
+        return x
+    if np.isscalar(step) and np.isscalar(x):
+        # Scalar fast path for the live detector/executor
+        return math.floor(x / step + 1e-9) * step
+    step = np.asarray(step, dtype=float)
+    safe = np.where(step > 0, step, 1.0)
+    # Small epsilon so 0.3 / 0.1 does not floor to 2
+    return np.where(step > 0, np.floor(x / safe + 1e-9) * safe, x)
+
+
+def _ceil_to(x, step):
+    if _is_zero(step):
+        return x
+    if np.isscalar(step) and np.isscalar(x):
+        return math.ceil(x / step - 1e-9) * step
+    step = np.asarray(step, dtype=float)
+    safe = np.where(step > 0, step, 1.0)
+    return np.where(step > 0, np.ceil(x / safe - 1e-9) * safe, x)
+
+
+def _legs(buy_price, sell_price, amount_usd, buy, sell):
+    # Buy on one venue, sell the base (after the buy fee) on the other.
+    # buy / sell: VenueCosts, or objects with the same attributes holding arrays.
+    buy_price = _ceil_to(buy_price, buy.price_tick)
+    sell_price = _floor_to(sell_price, sell.price_tick)
+
+    btc_bought = _floor_to(amount_usd / buy_price, buy.amount_step)
+    cost = amount_usd if _is_zero(buy.amount_step) else btc_bought * buy_price
+    btc_fee = btc_bought * buy.taker
+    btc_after_fee = btc_bought - btc_fee
+
+    btc_sold = _floor_to(btc_after_fee, sell.amount_step)  # rounding dust stays in inventory
+    usd_gained = btc_sold * sell_price
+    usd_fee = usd_gained * sell.taker
+    usd_after_fee = usd_gained - usd_fee
+
+    transfer_usd = buy.transfer_fee * sell_price
+    profit = usd_after_fee - cost - transfer_usd
+    fees = (btc_fee * buy_price) + usd_fee + transfer_usd
+    viable = ((btc_bought > 0) & (btc_bought >= buy.min_amount) & (btc_sold >= sell.min_amount)
+              & (cost >= buy.min_notional) & (usd_gained >= sell.min_notional))
+    return profit, fees, cost, viable, btc_after_fee, btc_sold, usd_after_fee
+
+
+def trade_costs(buy_price, sell_price, amount_usd, buy, sell):
+    # Returns (profit_usd, fees_usd, cost_usd, viable)
+    return _legs(buy_price, sell_price, amount_usd, buy, sell)[:4]
+
+
+class VenueArrays:
+    # Per-row VenueCosts for vectorized calls: row i uses first if pick[i] else second.
+    # Parameters both venues share stay scalars (so zero steps keep the flat fast path).
+    def __init__(self, pick, first, second):
+        for name in VenueCosts.__slots__:
+            a, b = getattr(first, name), getattr(second, name)
+            setattr(self, name, a if a == b else np.where(pick, a, b))
+
+
+def _tier(tiers, volume):
+    # tiers: [[from 30d volume USD, maker %, taker %], ...]
+    maker = taker = None
+    for floor, maker_pct, taker_pct in sorted(tiers):
+        if volume >= floor:
+            maker, taker = maker_pct / 100, taker_pct / 100
+    return maker, taker
+
+
+class CostModel:
+    def __init__(self, fee_pct=0.1, default=None, exchanges=None, rebalance_every=0, metadata=None):
+        self.fee_pct = fee_pct
+        self.default = default or {}
+        self.exchanges = exchanges or {}
+        self.rebalance_every = rebalance_every
+        self.metadata = metadata or (lambda exchange, symbol: None)
+        self._venues = {}
+
+    @classmethod
+    def flat(cls, fee_pct):
+        # No precision, minimums or transfer costs: the original flat-fee model
+        return cls(fee_pct)
+
+    @classmethod
+    def from_config(cls, config_path="config/settings.yaml", use_metadata=True):
+        config = load_config(config_path)
+        cost_config = config.get('costs', {})
+        metadata = None
+        if use_metadata:
+            from exchange_registry import cached_market_info
+            metadata = cached_market_info
+        return cls(
+            fee_pct=config['trade']['fee_percentage'],
+            default=cost_config.get('default', {}),
+            exchanges=cost_config.get('exchanges', {}),
+            rebalance_every=cost_config.get('rebalance_every_trades', 0),
+            metadata=metadata
+        )
+
+    def venue(self, exchange, symbol=None):
+        # Precomputed once per exchange/symbol: defaults < exchange metadata < explicit config
+        key = (exchange, symbol)
+        costs = self._venues.get(key)
+        if costs is not None:
+            return costs
+
+        fee = self.fee_pct / 100
+        params = {
+            'taker': fee,
+            'maker': fee,
+            'amount_step': self.default.get('amount_step', 0.0),
+            'price_tick': self.default.get('price_tick', 0.0),
+            'min_amount': self.default.get('min_amount', 0.0),
+            'min_notional': self.default.get('min_notional_usd', 0.0)
+        }
+
+        # Metadata precision is already in step sizes (exchange_registry converts ccxt digit counts)
+        info = self.metadata(exchange, symbol) if symbol else None
+        if info:
+            precision, limits = info.get('precision') or {}, info.get('limits') or {}
+            for key_name, value in (('taker', info.get('taker')), ('maker', info.get('maker')),
+                                    ('amount_step', precision.get('amount')),
+                                    ('price_tick', precision.get('price')),
+                                    ('min_amount', (limits.get('amount') or {}).get('min')),
+                                    ('min_notional', (limits.get('cost') or {}).get('min'))):
+                if value is not None:
+                    params[key_name] = value
+
+        ex_config = self.exchanges.get(exchange, {})
+        if ex_config.get('tiers'):
+            maker, taker = _tier(ex_config['tiers'], ex_config.get('volume_30d_usd', 0))
+            if taker is not None:
+                params['maker'], params['taker'] = maker, taker
+        for key_name, config_name in (('amount_step', 'amount_step'), ('price_tick', 'price_tick'),
+                                      ('min_amount', 'min_amount'), ('min_notional', 'min_notional_usd')):
+            if config_name in ex_config:
+                params[key_name] = ex_config[config_name]
+
+        transfer_fee = 0.0
+        if symbol and self.rebalance_every:
+            base = symbol.split('/')[0]
+            transfer_fee = (ex_config.get('withdrawal_fee') or {}).get(base, 0.0) / self.rebalance_every
+
+        costs = self._venues[key] = VenueCosts(transfer_fee=transfer_fee, **params)
+        return costs
+
+    def evaluate(self, buy_ex, sell_ex, buy_price, sell_price, amount_usd, symbol=None):
+        return trade_costs(buy_price, sell_price, amount_usd, self.venue(buy_ex, symbol), self.venue(sell_ex, symbol))
+
+    def legs(self, buy_ex, sell_ex, buy_price, sell_price, amount_usd, symbol=None):
+        # evaluate() plus the inventory movements: base received on the buy venue,
+        # base sold on the sell venue and quote received there (cost is the quote spent)
+        profit, fees, cost, viable, base_bought, base_sold, proceeds = _legs(
+            buy_price, sell_price, amount_usd, self.venue(buy_ex, symbol), self.venue(sell_ex, symbol))
+        return {'profit': profit, 'fees': fees, 'cost': cost, 'viable': viable,
+                'base_bought': base_bought, 'base_sold': base_sold, 'proceeds': proceeds}
+
+    def depth_size(self, buy_ex, sell_ex, asks, bids, max_usd, symbol=None):
+        # (amount_usd, gross profit) where profit after walking both books at the venues' taker fees peaks
+        buy, sell = self.venue(buy_ex, symbol), self.venue(sell_ex, symbol)
+        return optimal_size(asks, bids, buy.taker * 100, max_usd, sell.taker * 100)
+
+    def depth_legs(self, buy_ex, sell_ex, asks, bids, amount_usd, symbol=None):
+        # legs() for a fill that walks L2 depth: the size is rounded down to the buy venue's lot
+        # size first, then the VWAPs of both legs go through the same fee/precision/minimum/
+        # transfer math as a top-of-book trade. None when the books are empty.
+        buy, sell = self.venue(buy_ex, symbol), self.venue(sell_ex, symbol)
+        fill = simulate_fill(asks, bids, amount_usd, buy.taker * 100, sell.taker * 100)
+        if fill is None:
+            return None
+        qty = _floor_to(fill['qty'], buy.amount_step)
+        if qty < fill['qty']:
+            fill = simulate_fill(asks, bids, amount_usd, buy.taker * 100, sell.taker * 100, qty=qty)
+            if fill is None:
+                return None
+        result = self.legs(buy_ex, sell_ex, fill['buy_vwap'], fill['sell_vwap'], fill['cost_usd'], symbol)
+        result['fill'] = fill
+        return result
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    model = CostModel.from_config()
+    for exchange, symbol in (('coinbase', 'BTC/USD'), ('binance', 'BTC/USDT')):
+        print(exchange, symbol, model.venue(exchange, symbol))
+    profit, fees, cost, viable = model.evaluate('coinbase', 'binance', 64000.0, 64500.0, 10000.0, 'BTC/USD')
+    print(f"profit ${profit:.2f}, fees ${fees:.2f}, cost ${cost:.2f}, viable {viable}")
+    flat = CostModel.flat(0.1)
+    prices = np.array([64000.0, 64100.0, 64200.0])
+    print(flat.evaluate('coinbase', 'binance', prices, prices * 1.004, 10000.0))
+
+    # One deep level per side: walking the books must give the top-of-book numbers
+    asks, bids = (np.array([64000.0]), np.array([5.0])), (np.array([64300.0]), np.array([5.0]))
+    depth = model.depth_legs('coinbase', 'binance', asks, bids, 10000.0, 'BTC/USD')
+    top = model.legs('coinbase', 'binance', 64000.0, 64300.0, 10000.0, 'BTC/USD')
+    assert abs(depth['profit'] - top['profit']) < 1e-6 and depth['viable'] == top['viable']
+    print(f"depth = top of book: profit ${float(depth['profit']):.2f}")
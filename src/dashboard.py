@@ -2,56 +2,60 @@ import pandas as pd
 import streamlit as st
 import time
 from datetime import datetime, timezone
-from aggregator import PriceAggregator
-from detector import ArbitrageDetector
-from executor import TradeExecutor
-from notifier import Notifier
+from engine_channel import EngineChannel
+from trade_store import TradeStore
+from spread_history import ChartFeed, from_config
+from config_loader import load_config
 
 
-spread_history = []  # Stores spread % over time
-
 # Set Streamlit page config
 st.set_page_config(page_title = "Crypto Arbitrage Bot", layout = "wide")
 st.title("Crypto Arbitrage Bot Dashboard")
 
-# Initialize components
-aggregator = PriceAggregator()
-detector = ArbitrageDetector()
-executor = TradeExecutor()
-notifier = Notifier()
-
+# Subscribe to the headless engine (python engine.py)
+config = load_config()
+engine_config = config.get('engine', {})
+refresh_interval = engine_config.get('dashboard_refresh', config['poll_interval'])
+channel = EngineChannel(engine_config.get('channel_path', 'state/engine.db'), readonly=True)
+history = TradeStore()
+last_trade_id = 0
+last_spread_id = None
+spread_history = from_config(config)  # Bounded spread % history (raw/1m/1h ring buffers)
+chart = ChartFeed(spread_history)
+
+prices_slot = st.empty()
+st.subheader("📉 Exchange Spread (%)")
+chart_slot = st.empty()  # drawn once, then new points are appended
+chart_slot.info("Waiting for more data to show spread chart...")
 placeholder = st.empty()
 
 while True:
-    with placeholder.container():
-
-        # Fetch prices
-        prices = aggregator.fetch_prices()
-
-        if 'coinbase' in prices and 'binance' in prices:
-            cb_price = prices['coinbase']
-            bn_price = prices['binance']
-            spread_pct = ((bn_price - cb_price) / cb_price) * 100
-            spread_history.append({
-                "timestamp": datetime.now(),
-                "spread_pct": spread_pct
-            })
-
+    snapshot = channel.latest_snapshot()
+    if snapshot is None:
+        prices_slot.info("Waiting for the trading engine. Start it with: python engine.py")
+        time.sleep(refresh_interval)
+        continue
+
+    if last_spread_id is None:
+        last_spread_id = max(0, channel.last_spread_id() - spread_history.raw_capacity)
+    for spread_id, ts, pair, spread_pct in channel.spreads_since(last_spread_id):
+        spread_history.append(pair, ts, spread_pct)
+        last_spread_id = spread_id
+    for trade_id, trade in channel.trades_since(last_trade_id):
+        history.append(trade)
+        last_trade_id = trade_id
+
+    prices = snapshot['prices']
+
+    with prices_slot.container():
         st.subheader("Live prices")
         st.write(prices)
 
-        st.subheader("📉 Binance vs Coinbase Spread (%)")
-
-        if len(spread_history) > 1:
-            df = pd.DataFrame(spread_history)
-            df.set_index("timestamp", inplace=True)
-            st.line_chart(df["spread_pct"])
-        else:
-            st.info("Waiting for more data to show spread chart...")
+    chart.update(chart_slot)
 
+    with placeholder.container():
 
-        # Detect arbitrage
-        opportunities = detector.find_opportunity(prices)
+        opportunities = snapshot['opportunities']
 
         st.subheader("Detected opportunities")
         if opportunities:
@@ -60,50 +64,19 @@ while True:
                            f"${opp['buy_price']} -> {opp['sell_price']}"
                            f"Spread: {opp['spread_pct']}% | "
                            f"Est. Profit: $ {opp['estimated_profit_usd']}")
-            top = opportunities[0]
-            message = (
-                f"🚀 Arbitrage Opportunity Detected!\n"
-                f"Buy from: {top['buy_from']} at ${top['buy_price']}\n"
-                f"Sell to: {top['sell_to']} at ${top['sell_price']}\n"
-                f"Spread: {top['spread_pct']}%\n"
-                f"Est. Profit: ${top['estimated_profit_usd']}"
-
-            )
-            notifier.send_telegram(message=message)
-                
+            st.subheader("Last Trade Executed")
+            st.json(snapshot['last_trade'])
         else:
             st.info("No profitable opportunities at the moment")
 
-        
-        # Simulate the execution
-
-        if opportunities:
-            trade_result = executor.execute(opportunities)
-            if trade_result:
-                trade_msg = (
-                    f"✅ Trade Executed!\n"
-                    f"Bought from: {trade_result['buy_from']} at ${trade_result['buy_price']}\n"
-                    f"Sold to: {trade_result['sell_to']} at ${trade_result['sell_price']}\n"
-                    f"Profit: ${trade_result['profit_usd']}\n"
-                    f"New Balance: ${trade_result['balance_usd']}"
-                )
-                notifier.send_telegram(trade_msg)
-            st.subheader("Last Trade Executed")
-            st.json(trade_result)
-        # Filter trades executed today
+        # Today's profit from the trade store's running daily aggregate
         today = datetime.now(timezone.utc).date()
-        todays_trades = [
-            trade for trade in executor.get_history()
-            if datetime.fromisoformat(trade['timestamp']).date() == today
-        ]
-
-        # Calculate today's profit
-        todays_profit = sum(trade['profit_usd'] for trade in todays_trades)
+        todays_profit = history.day_pnl(today)
 
 
         # Show balance
         st.subheader("Virtual USD balance")
-        st.metric(label="Current Balance", value = f"${executor.get_balance()}")
+        st.metric(label="Current Balance", value = f"${snapshot['balance_usd']}")
 
         # Today's P&L
         st.subheader("📅 Today's P&L")
@@ -112,11 +85,22 @@ while True:
         # Trade history
 
         st.subheader("Trade History")
-        history = executor.get_history()
         if history:
-            st.dataframe(history[::-1])  # Latest first
+            st.caption(f"{len(history)} trades, {history.wins} profitable, "
+                       f"P&L ${history.total_pnl:.2f}, fees ${history.total_fees:.2f}")
+            st.dataframe(history.tail(500))  # Latest first
         else:
             st.write("No trades yet")
 
-    # Pause before next update
-    time.sleep(aggregator.poll_interval)
+        # Engine latency
+        st.subheader("Engine latency")
+        engine_metrics = channel.latest_snapshot('metrics')
+        if engine_metrics and engine_metrics['stages']:
+            st.dataframe(pd.DataFrame(engine_metrics['stages']))
+            if engine_metrics['counters']:
+                st.dataframe(pd.DataFrame(engine_metrics['counters']))
+        else:
+            st.info("No metrics yet")
+
+    # Pause before next refresh
+    time.sleep(refresh_interval)
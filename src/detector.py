@@ -1,4 +1,5 @@
 from config_loader import load_config
+from cost_model import CostModel
 
 class ArbitrageDetector:
     def __init__(self, config_path = "config/settings.yaml"):
@@ -6,8 +7,11 @@ class ArbitrageDetector:
         self.min_spread_pct = self.config['arbitrage']['min_spread_percentage']
         self.trade_amount_usd = self.config['trade']['amount_usd']
         self.fee_pct = self.config['trade']['fee_percentage']
+        self.symbol = self.config.get('symbols', ['BTC/USD'])[0]
+        # Fee tiers, precision, minimums and transfer costs; shared with the executor
+        self.costs = CostModel.from_config(config_path)
 
-    def find_opportunity(self, prices:dict):
+    def find_opportunity(self, prices:dict, symbol=None):
         if len(prices) < 2:
             return None  # Need atleast 2 exchanges to compare
         
@@ -29,18 +33,62 @@ class ArbitrageDetector:
                     (ex_a,ex_b,price_a,price_b),
                     (ex_b,ex_a,price_b,price_a)
                 ]:
-                    spread_pct = ((sell_price - buy_price)/buy_price)*100
-                    if spread_pct >=self.min_spread_pct:
-                        est_profit = (sell_price - buy_price) * (1 - self.fee_pct / 100) * (self.trade_amount_usd / buy_price)
-                        opportunities.append({
-                            'buy_from': buy_ex,
-                            'sell_to':sell_ex,
-                            'buy_price':buy_price,
-                            'sell_price':sell_price,
-                            'spread_pct':round(spread_pct,2),
-                            'estimated_profit_usd':round(est_profit,2)
-                        })
+                    opp = self._evaluate(buy_ex, sell_ex, buy_price, sell_price, symbol)
+                    if opp:
+                        opportunities.append(opp)
         return opportunities if opportunities else None
+
+    def find_book_opportunity(self, tops: dict, books=None, symbol=None):
+        # tops: {exchange: (best_bid, best_ask)}; buy at the ask, sell at the bid.
+        # books: optional {exchange: OrderBook} to size each trade by L2 depth.
+        if len(tops) < 2:
+            return None
+
+        opportunities = []
+        for buy_ex, (_, ask) in tops.items():
+            for sell_ex, (bid, _) in tops.items():
+                if buy_ex == sell_ex or ask is None or bid is None:
+                    continue
+                opp = self._evaluate(buy_ex, sell_ex, ask, bid, symbol)
+                if opp and books and buy_ex in books and sell_ex in books:
+                    opp = self._size_by_depth(opp, books[buy_ex], books[sell_ex], opp['symbol'])
+                if opp:
+                    opportunities.append(opp)
+        return opportunities if opportunities else None
+
+    def _size_by_depth(self, opp, buy_book, sell_book, symbol):
+        # Trade size where profit after walking both books peaks, then costed like the executor books it
+        asks, bids = buy_book.depth('ask'), sell_book.depth('bid')
+        amount_usd, _ = self.costs.depth_size(opp['buy_from'], opp['sell_to'], asks, bids,
+                                              self.trade_amount_usd, symbol)
+        if amount_usd <= 0:
+            return None
+        result = self.costs.depth_legs(opp['buy_from'], opp['sell_to'], asks, bids, amount_usd, symbol)
+        if result is None or not result['viable'] or result['profit'] <= 0:
+            return None
+        opp['amount_usd'] = round(float(result['cost']), 2)
+        opp['estimated_profit_usd'] = round(float(result['profit']), 2)
+        return opp
+
+    def _evaluate(self, buy_ex, sell_ex, buy_price, sell_price, symbol=None):
+        spread_pct = ((sell_price - buy_price)/buy_price)*100
+        if spread_pct < self.min_spread_pct:
+            return None
+        # Same cost model the executor books the trade with
+        symbol = symbol or self.symbol
+        est_profit, _, _, viable = self.costs.evaluate(buy_ex, sell_ex, buy_price, sell_price,
+                                                       self.trade_amount_usd, symbol)
+        if not viable or est_profit <= 0:
+            return None
+        return {
+            'buy_from': buy_ex,
+            'sell_to':sell_ex,
+            'symbol': symbol,
+            'buy_price':buy_price,
+            'sell_price':sell_price,
+            'spread_pct':round(spread_pct,2),
+            'estimated_profit_usd':round(float(est_profit),2)
+        }
     
 
 # For standalone test
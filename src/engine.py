@@ -0,0 +1,291 @@
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+import alignment
+import logger
+from aggregator import PriceAggregator
+from analytics_store import AnalyticsStore
+from detector import ArbitrageDetector
+from cycles import CycleDetector
+from executor import TradeExecutor
+from inventory import Inventory
+from notifier import Notifier
+from opportunity_tracker import CLOSE, OPEN, UPDATE, OpportunityTracker
+from scanner import OpportunityScanner
+from scheduler import PollScheduler
+from engine_channel import EngineChannel
+from config_loader import load_config
+from metrics import metrics
+from tick_log import TickRecorder, session_path
+
+# Headless trading engine: aggregator -> detector -> executor -> notifier,
+# independent of any UI. State is published to an EngineChannel that the
+# Streamlit dashboard reads.
+
+
+def opportunity_message(top):
+    return (
+        f"🚀 *Arbitrage Opportunity Detected!*\n"
+        f"Buy from: *{top['buy_from']}* at `${top['buy_price']}`\n"
+        f"Sell to: *{top['sell_to']}* at `${top['sell_price']}`\n"
+        f"Spread: *{top['spread_pct']}%*\n"
+        f"Est. Profit: *${top['estimated_profit_usd']}*"
+    )
+
+
+def trade_message(trade_result):
+    return (
+        f"✅ *Trade Executed!*\n"
+        f"Bought from: *{trade_result['buy_from']}* at `${trade_result['buy_price']}`\n"
+        f"Sold to: *{trade_result['sell_to']}* at `${trade_result['sell_price']}`\n"
+        f"Profit: *${trade_result['profit_usd']}*\n"
+        f"New Balance: *${trade_result['balance_usd']}*"
+    )
+
+
+class TradingEngine:
+    def __init__(self, config=None, channel=None):
+        self.config = config or load_config()
+        persistence = self.config.get('persistence', {})
+        engine_config = self.config.get('engine', {})
+
+        self.aggregator = PriceAggregator()
+        self.detector = ArbitrageDetector()
+        self.executor = TradeExecutor(
+            fee_pct=self.config['trade']['fee_percentage'],
+            trade_amount_usd=self.config['trade']['amount_usd'],
+            fsync_every=persistence.get('fsync_every', 100),
+            snapshot_every=persistence.get('snapshot_every', 1000),
+            cost_model=self.detector.costs,
+            inventory=Inventory.from_config() if self.config.get('inventory', {}).get('enabled') else None
+        )
+        self.notifier = Notifier()
+        # Spread rows are kept as long as a dashboard's raw ring buffer holds them
+        self.channel = channel or EngineChannel(
+            engine_config.get('channel_path', 'state/engine.db'),
+            spread_retention=self.config.get('spread_history', {}).get('raw_capacity', 3600))
+        self.symbols = self.config.get('symbols', ['BTC/USD'])
+        self.symbol = self.symbols[0]  # charted and used by stream mode
+        # Only quotes close enough in time are compared; stablecoin quotes in USD at the
+        # latest polled rate quote (e.g. coinbase USDT/USD), which must be as fresh as the rest
+        exchanges = [name for name, ex_config in self.config['exchanges'].items() if ex_config.get('enabled')]
+        self.aligners = {symbol: alignment.from_config(self.config, exchanges) for symbol in self.symbols}
+        self.aligner = self.aligners[self.symbol]
+        self.prices = {}
+        # Which symbols to poll when: adaptive to spreads/volatility within each exchange's rate limit.
+        # Rate quotes are only requested for due symbols that need them, from the same budgets.
+        self.scheduler = PollScheduler.from_config()
+        # Alerts and trades only when a route opens; the detector reports down to the
+        # close threshold so an open route is held until its spread really fades
+        self.tracker = OpportunityTracker.from_config()
+        self.detector.min_spread_pct = self.tracker.close_spread_pct
+        # Polled symbols are scanned together (symbols x exchanges arrays) with the detector's cost model
+        self.scanner = OpportunityScanner(self.symbols, exchanges, cost_model=self.detector.costs)
+        self.scanner.min_spread_pct = self.tracker.close_spread_pct
+        self.ticks = 0
+        # Trades, route open/close events and sampled quotes for dashboard queries, written in batches
+        analytics_enabled = self.config.get('analytics', {}).get('enabled')
+        self.analytics = AnalyticsStore.from_config() if analytics_enabled else None
+        self._backfill_trades()
+
+        # Latency/counter metrics: Prometheus endpoint + summary published for dashboards
+        metrics_config = self.config.get('metrics', {})
+        metrics.configure(metrics_config)
+
+        # Optional tick log of every received quote / book top, for replay (tick_log.py)
+        self.recorder = None
+        recorder_config = self.config.get('recorder', {})
+        if recorder_config.get('enabled'):
+            self.recorder = TickRecorder(session_path(recorder_config.get('dir', 'data/ticks')))
+            self.aggregator.recorder = self.recorder
+
+        # Multi-leg cycle search over every streamed market (stream mode)
+        self.cycle_detector = CycleDetector.from_config() if self.config.get('cycles', {}).get('enabled') else None
+        self.last_cycles = []
+        self.metrics_publish_interval = metrics_config.get('publish_interval', 5.0)
+        self._metrics_published = 0.0
+
+    def _backfill_trades(self):
+        # Make sure subscribers can see trades made before the channel existed.
+        # The journal is only read in full when one of them is behind.
+        total = self.executor.trade_count()
+        published = self.channel.trade_count()
+        stored = self.analytics.trade_count() if self.analytics is not None else total
+        if published >= total and stored >= total:
+            return
+        history = self.executor.get_history()
+        for i in range(published, len(history)):
+            self.channel.publish_trade(history[i].to_dict())
+        self.channel.commit()
+        if self.analytics is not None:
+            for i in range(stored, len(history)):
+                self.analytics.add_trade(history[i].to_dict(), symbol=self.symbol)
+            self.analytics.flush()
+
+    def process(self, prices, opportunities, books=None, symbol=None):
+        # One detection result -> execution, notification and publication
+        self._finish_tick(self._execute(prices, opportunities, books, symbol))
+
+    def _execute(self, prices, opportunities, books=None, symbol=None):
+        # Execution and notification for one symbol; the trade made, if any
+        now = time.time()
+        symbol = symbol or self.symbol
+        self.prices[symbol] = prices
+        if symbol == self.symbol and 'coinbase' in prices and 'binance' in prices:
+            cb_price = prices['coinbase']
+            bn_price = prices['binance']
+            self.channel.publish_spread(now, 'binance-coinbase', ((bn_price - cb_price) / cb_price) * 100)
+
+        trade_result = None
+        if opportunities:
+            metrics.inc('opportunities', amount=len(opportunities))
+        for event in self.tracker.update(opportunities, now, symbol):
+            if event['event'] == CLOSE:
+                metrics.inc('routes_closed', event['buy_from'])
+            if event['event'] != UPDATE and self.analytics is not None:
+                self.analytics.add_opportunity(event)
+            if event['event'] != OPEN:
+                continue
+            metrics.inc('routes_opened', event['buy_from'])
+            opportunity = event['opportunity']
+            with metrics.span('notify'):
+                self.notifier.send_telegram(opportunity_message(opportunity))
+            with metrics.span('execute'):
+                result = self.executor.execute([opportunity], books)
+            if result:
+                trade_result = result
+                metrics.inc('trades')
+                with metrics.span('notify'):
+                    self.notifier.send_telegram(trade_message(result))
+                self.channel.publish_trade(result)
+                if self.analytics is not None:
+                    self.analytics.add_trade(result, symbol=symbol)
+        return trade_result
+
+    def _finish_tick(self, trade_result):
+        # One snapshot and one channel commit per tick, however many symbols it covered
+        with metrics.span('publish'):
+            self._publish(self.prices.get(self.symbol, {}), self.tracker.open_opportunities(), trade_result)
+        self.ticks += 1
+
+    def _publish(self, prices, opportunities, trade_result):
+        self.channel.publish_snapshot({
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'prices': prices,
+            'opportunities': opportunities or [],
+            'last_trade': trade_result,
+            'balance_usd': self.executor.get_balance(),
+            'total_fees_usd': self.executor.get_total_fees(),
+            'ticks': self.ticks,
+            'cycles': self.last_cycles,
+            'inventory': self.executor.inventory.snapshot() if self.executor.inventory else None,
+            'alignment': {'skew_s': round(self.aligner.skew(), 3), 'quotes': self.aligner.stats()},
+            'missed_inventory': self.executor.missed_inventory,
+            'routes': self.tracker.snapshot(),
+            'route_stats': self.tracker.stats(),
+            'polling': self.scheduler.stats()
+        })
+        if metrics.enabled and time.monotonic() - self._metrics_published >= self.metrics_publish_interval:
+            self.channel.publish_snapshot(dict(metrics.summary(), logging=logger.stats()), key='metrics')
+            self._metrics_published = time.monotonic()
+        self.channel.commit()
+        if self.analytics is not None:
+            self.analytics.maybe_flush()
+
+    def tick(self):
+        # Poll the symbols the scheduler says are due (all of them with a fixed interval)
+        # plus the stablecoin rate quotes those symbols need
+        symbols, rate_pairs = self.scheduler.plan()
+        if not symbols:
+            return
+        with metrics.span('tick'):
+            with metrics.span('fetch_all'):
+                if self.aggregator.mode == 'async':
+                    quotes = self.aggregator.fetch_quotes_concurrent(symbols, extra=rate_pairs)
+                else:
+                    quotes = self.aggregator.fetch_quotes(symbols, extra=rate_pairs)
+            for quote in quotes:
+                if (quote['exchange'], quote['symbol']) in self.aligner.rate_sources:
+                    for aligner in self.aligners.values():
+                        aligner.update_rate(quote)
+                if quote['symbol'] not in self.aligners:
+                    continue
+                self.aligners[quote['symbol']].update(quote)
+                if self.analytics is not None:
+                    self.analytics.add_quote(quote.get('recv_ts', time.time()), quote['exchange'],
+                                             quote['symbol'], quote.get('last'))
+            metrics.inc('polls', amount=len(symbols))
+            prices = {symbol: self.aligners[symbol].prices() for symbol in symbols}
+            with metrics.span('detect'):
+                found = self.scanner.scan_prices(prices)
+            trade_result = None
+            for symbol in symbols:
+                self.scheduler.observe(symbol, prices[symbol])
+                trade_result = self._execute(prices[symbol], found.get(symbol), symbol=symbol) or trade_result
+            self._finish_tick(trade_result)
+
+    def run(self):
+        while True:
+            self.tick()
+            # Until the next symbol is due, or the request budget allows a due one
+            time.sleep(self.scheduler.sleep_time())
+
+    def run_stream(self):
+        # Detection on every order book update instead of on a timer
+        from feed import build_feed
+
+        def on_update(exchange, symbol, book):
+            if self.cycle_detector is not None:
+                with metrics.span('cycles'):
+                    found = self.cycle_detector.update(exchange, symbol, book.best_bid, book.best_ask)
+                if found:
+                    metrics.inc('cycles', amount=len(found))
+                    self.last_cycles = found[:5]
+            if symbol != self.symbol:
+                return
+            # Books that stopped updating are not compared against fresh ones
+            books = {ex: feed.books[(ex, symbol)] for ex in feed.tops(symbol)}
+            newest = max((b.update_ts or 0 for b in books.values()), default=0)
+            books = {ex: b for ex, b in books.items()
+                     if b.update_ts and newest - b.update_ts <= self.aligner.max_staleness}
+            tops = {ex: b.top() for ex, b in books.items()}
+            prices = {ex: (bid + ask) / 2 for ex, (bid, ask) in tops.items()}
+            if self.recorder is not None:
+                bid_size = book.bids.get(book.best_bid)
+                ask_size = book.asks.get(book.best_ask)
+                self.recorder.record_top(exchange, symbol, book.best_bid, book.best_ask, bid_size, ask_size)
+            if self.analytics is not None and exchange in prices:
+                self.analytics.add_quote(time.time(), exchange, symbol, prices[exchange])
+            metrics.inc('book_updates', exchange)
+            with metrics.span('tick'):
+                with metrics.span('detect'):
+                    opportunities = self.detector.find_book_opportunity(tops, books)
+                self.process(prices, opportunities, books)
+
+        feed = build_feed(self.config, on_update=on_update)
+        asyncio.run(feed.run())
+
+    def close(self):
+        self.executor.close()
+        self.notifier.close()
+        self.aggregator.close()
+        self.channel.close()
+        if self.analytics is not None:
+            self.analytics.close()
+        metrics.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+if __name__ == "__main__":
+    engine = TradingEngine()
+    try:
+        if '--stream' in sys.argv[1:]:
+            engine.run_stream()
+        else:
+            engine.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
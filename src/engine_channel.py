@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import time
+
+# Local channel between the headless engine (single writer) and dashboards
+# (read-only subscribers). SQLite in WAL mode lets readers poll while the
+# engine writes; subscribers track the last row id they have seen. Only the
+# latest spread_retention spread rows are kept (what a dashboard's raw ring
+# buffer holds), so the table doesn't grow with the engine's uptime.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot (
+    key TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spreads (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    pair TEXT NOT NULL,
+    spread_pct REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class EngineChannel:
+    def __init__(self, path="state/engine.db", readonly=False, spread_retention=3600):
+        self.path = path
+        self.readonly = readonly
+        self.spread_retention = spread_retention  # rows; 0 = keep everything
+        self._conn = None
+        self._last_spread_id = 0
+        self._pruned_spread_id = 0
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        if self.readonly:
+            if not os.path.exists(self.path):
+                return None
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    # ---- Publisher (engine) ----
+
+    def publish_snapshot(self, snapshot, key='latest'):
+        self._connect().execute(
+            "INSERT INTO snapshot (key, ts, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET ts = excluded.ts, data = excluded.data",
+            (key, time.time(), json.dumps(snapshot, default=str))
+        )
+
+    def publish_spread(self, ts, pair, spread_pct):
+        cursor = self._connect().execute(
+            "INSERT INTO spreads (ts, pair, spread_pct) VALUES (?, ?, ?)", (ts, pair, spread_pct)
+        )
+        self._last_spread_id = cursor.lastrowid
+
+    def publish_trade(self, trade):
+        self._connect().execute("INSERT INTO trades (data) VALUES (?)", (json.dumps(trade),))
+
+    def trade_count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def commit(self):
+        # One transaction per engine tick, dropping spread rows past the retention
+        if self._conn is not None:
+            if self.spread_retention and self._last_spread_id > self._pruned_spread_id:
+                self._conn.execute("DELETE FROM spreads WHERE id <= ?",
+                                   (self._last_spread_id - self.spread_retention,))
+                self._pruned_spread_id = self._last_spread_id
+            self._conn.commit()
+
+    # ---- Subscriber (dashboard) ----
+
+    def latest_snapshot(self, key='latest'):
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute("SELECT ts, data FROM snapshot WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        snapshot = json.loads(row[1])
+        snapshot['published_ts'] = row[0]
+        return snapshot
+
+    def last_spread_id(self):
+        conn = self._connect()
+        if conn is None:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM spreads").fetchone()[0]
+
+    def spreads_since(self, last_id=0):
+        conn = self._connect()
+        if conn is None:
+            return []
+        return conn.execute(
+            "SELECT id, ts, pair, spread_pct FROM spreads WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+
+    def trades_since(self, last_id=0):
+        # [(id, trade_dict)] for trades the subscriber has not seen yet
+        conn = self._connect()
+        if conn is None:
+            return []
+        rows = conn.execute("SELECT id, data FROM trades WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        return [(row_id, json.loads(data)) for row_id, data in rows]
+
+    def close(self):
+        if self._conn is not None:
+            if not self.readonly:
+                self._conn.commit()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+from config_loader import load_config
+from logger import setup_logger
+
+# Process-wide ccxt clients. Sync clients are built once and shared; every
+# client starts with its load_markets() metadata (precision, fees, limits)
+# restored from a local JSON cache when that is younger than the TTL, so
+# startup does not pay for the exchange-info download again.
+
+log = setup_logger('exchange_registry')
+
+# Config name -> ccxt exchange id
+EXCHANGE_IDS = {
+    'coinbase': 'coinbase',
+    'binance': 'binanceus'
+}
+
+_clients = {}        # ccxt id -> shared sync client
+_market_cache = None
+_cached_markets = {}  # ccxt id -> markets read from the disk cache
+_rate_limits = {}     # ccxt id -> rateLimit (ms between requests)
+_precision_modes = {}  # ccxt id -> precisionMode (how market precision values are counted)
+
+
+def exchange_id(name):
+    return EXCHANGE_IDS.get(name, name)
+
+
+class MarketCache:
+    def __init__(self, root="data/cache/markets", ttl=86400):
+        self.root = root
+        self.ttl = ttl
+
+    def path(self, ex_id):
+        return os.path.join(self.root, f"{ex_id}.json")
+
+    def load(self, ex_id, ttl=None):
+        # Cached {'markets', 'currencies'} if still fresh, else None
+        path = self.path(ex_id)
+        try:
+            if time.time() - os.path.getmtime(path) > (self.ttl if ttl is None else ttl):
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, ex_id, markets, currencies):
+        path = self.path(ex_id)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'markets': markets, 'currencies': currencies}, f, default=str)
+        os.replace(tmp_path, path)
+
+
+def market_cache():
+    global _market_cache
+    if _market_cache is None:
+        cache_config = load_config().get('exchange_cache', {})
+        _market_cache = MarketCache(
+            cache_config.get('dir', 'data/cache/markets'),
+            cache_config.get('ttl_hours', 24) * 3600
+        )
+    return _market_cache
+
+
+def _apply_cached(exchange):
+    cached = market_cache().load(exchange.id)
+    if cached is None:
+        return False
+    exchange.set_markets(cached['markets'], cached.get('currencies'))
+    return True
+
+
+def load_markets(exchange, reload=False):
+    # Sync client: markets from the cache when fresh, otherwise downloaded and cached
+    if not reload and (exchange.markets or _apply_cached(exchange)):
+        return exchange.markets
+    try:
+        exchange.load_markets(reload=reload)
+        market_cache().save(exchange.id, exchange.markets, exchange.currencies)
+    except Exception as e:
+        log.warning("Error loading markets for %s: %s", exchange.id, e)
+    return exchange.markets
+
+
+async def load_markets_async(exchange, reload=False):
+    if not reload and (exchange.markets or _apply_cached(exchange)):
+        return exchange.markets
+    try:
+        await exchange.load_markets(reload=reload)
+        market_cache().save(exchange.id, exchange.markets, exchange.currencies)
+    except Exception as e:
+        log.warning("Error loading markets for %s: %s", exchange.id, e)
+    return exchange.markets
+
+
+def create_exchange(name, async_mode=False):
+    # A new client (the caller owns and closes async ones) with cached markets applied
+    module = ccxt_async if async_mode else ccxt
+    exchange = getattr(module, exchange_id(name))()
+    _apply_cached(exchange)
+    return exchange
+
+
+def get_exchange(name):
+    # Shared sync client with markets loaded
+    ex_id = exchange_id(name)
+    exchange = _clients.get(ex_id)
+    if exchange is None:
+        exchange = _clients[ex_id] = getattr(ccxt, ex_id)()
+        load_markets(exchange)
+    return exchange
+
+
+def rate_limit_ms(name):
+    # ccxt's documented minimum delay between requests; no network involved
+    ex_id = exchange_id(name)
+    if ex_id not in _rate_limits:
+        client = _clients.get(ex_id) or getattr(ccxt, ex_id)()
+        _rate_limits[ex_id] = client.rateLimit
+    return _rate_limits[ex_id]
+
+
+def precision_mode(name):
+    # DECIMAL_PLACES, SIGNIFICANT_DIGITS or TICK_SIZE; set by the client's describe(), no network
+    ex_id = exchange_id(name)
+    if ex_id not in _precision_modes:
+        client = _clients.get(ex_id) or getattr(ccxt, ex_id)()
+        _precision_modes[ex_id] = client.precisionMode
+    return _precision_modes[ex_id]
+
+
+def _precision_steps(precision, mode):
+    # Market precision as step sizes. Under DECIMAL_PLACES ccxt gives digit counts (8 -> 1e-8);
+    # SIGNIFICANT_DIGITS has no fixed step, so those values are left out.
+    if mode == ccxt.TICK_SIZE:
+        return dict(precision)
+    if mode == ccxt.DECIMAL_PLACES:
+        return {key: 10.0 ** -value if value is not None else None for key, value in precision.items()}
+    return {}
+
+
+def _market_fields(market, mode=ccxt.TICK_SIZE):
+    if market is None:
+        return None
+    return {
+        'precision': _precision_steps(market.get('precision') or {}, mode),
+        'limits': market.get('limits', {}),
+        'taker': market.get('taker'),
+        'maker': market.get('maker')
+    }
+
+
+def cached_market_info(name, symbol):
+    # Precision, limits and fees of one market, or None when unknown. Never touches the
+    # network: a live shared client or the disk cache (any age)
+    ex_id = exchange_id(name)
+    if ex_id in _clients and _clients[ex_id].markets:
+        market = _clients[ex_id].markets.get(symbol)
+    else:
+        if ex_id not in _cached_markets:
+            cached = market_cache().load(ex_id, ttl=float('inf'))
+            _cached_markets[ex_id] = cached['markets'] if cached else {}
+        market = _cached_markets[ex_id].get(symbol)
+    # Only a known market needs the client's precision mode (unknown names have no ccxt class)
+    return _market_fields(market, precision_mode(name)) if market is not None else None
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    for name in EXCHANGE_IDS:
+        start = time.perf_counter()
+        exchange = get_exchange(name)
+        print(f"{name}: {len(exchange.markets or {})} markets in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,24 +1,38 @@
 import time
-import json
-import os
 from datetime import datetime, timezone
+from trade_journal import TradeJournal
+from trade_store import TradeStore
+from cost_model import CostModel
+from metrics import metrics
+from logger import setup_logger
+
+log = setup_logger('executor')
+
 
 class TradeExecutor:
-    def __init__(self, initial_usd=10000, fee_pct=0.1, trade_amount_usd=1000):
+    def __init__(self, initial_usd=10000, fee_pct=0.1, trade_amount_usd=1000, state_file="state/trade_state.json",
+                 fsync_every=100, snapshot_every=1000, cost_model=None, inventory=None):
         self.fee_pct = fee_pct  # percent fee per trade side
+        self.costs = cost_model or CostModel.flat(fee_pct)
+        # Optional per-venue holdings (inventory.py): trades are sized to and gated on them
+        self.inventory = inventory
+        self.missed_inventory = 0
         self.trade_amount_usd = trade_amount_usd
-        self.state_file = "state/trade_state.json"
+        self.state_file = state_file
+        self.journal = TradeJournal(state_file, fsync_every=fsync_every, snapshot_every=snapshot_every)
+        self._history = None  # TradeStore, read from the journal on first get_history()
 
-        # Load from file or set defaults
-        if os.path.exists(self.state_file):
+        # Load from snapshot + journal or set defaults
+        if self.journal.exists():
             self._load_state()
         else:
             self.usd_balance = initial_usd
             self.total_fees = 0.0
-            self.trade_history = []
+            self._history = TradeStore()
             self._save_state()
 
-    def execute(self, opportunity: dict):
+    def execute(self, opportunity: dict, books=None):
+        # books: optional {exchange: OrderBook}; when given, both legs walk L2 depth
         if not opportunity:
             return None
 
@@ -27,26 +41,49 @@ class TradeExecutor:
         # Check required fields
         required_keys = ['buy_from', 'sell_to', 'buy_price', 'sell_price']
         if not all(k in trade for k in required_keys):
-            print(f"[SKIP] Incomplete trade object: {trade}")
+            log.info("[SKIP] Incomplete trade object", extra={'fields': {'trade': trade}})
             return None
 
         amount_usd = min(self.usd_balance, self.trade_amount_usd)  # respect config cap
         buy_price = trade['buy_price']
         sell_price = trade['sell_price']
+        symbol = trade.get('symbol') or 'BTC/USD'
+        fill = None
+
+        wanted_usd = amount_usd
+        if self.inventory is not None:
+            self.inventory.step(time.time())
+            amount_usd = min(amount_usd, self.inventory.fundable_usd(trade['buy_from'], trade['sell_to'],
+                                                                     symbol, buy_price))
+            if amount_usd <= 0:
+                return self._miss(trade) if self._viable_at(trade, symbol, wanted_usd) else None
+
+        if books and trade['buy_from'] in books and trade['sell_to'] in books:
+            # Size chosen by the detector at the depth where net profit peaks
+            amount_usd = min(amount_usd, trade.get('amount_usd', amount_usd))
+            result = self.costs.depth_legs(trade['buy_from'], trade['sell_to'], books[trade['buy_from']].depth('ask'),
+                                           books[trade['sell_to']].depth('bid'), amount_usd, symbol)
+            if result is None:
+                log.info("[SKIP] No depth to fill", extra={'fields': {'trade': trade}})
+                return None
+            fill = result['fill']
+            buy_price = fill['buy_vwap']
+            sell_price = fill['sell_vwap']
+        else:
+            # Fees, exchange precision/minimums and transfer cost from the shared cost model
+            result = self.costs.legs(trade['buy_from'], trade['sell_to'], buy_price, sell_price, amount_usd, symbol)
 
-        # Simulate trade with detailed fee tracking
-        btc_bought = amount_usd / buy_price
-        btc_fee = btc_bought * (self.fee_pct / 100)
-        btc_after_fee = btc_bought - btc_fee
-
-        usd_gained = btc_after_fee * sell_price
-        usd_fee = usd_gained * (self.fee_pct / 100)
-        usd_after_fee = usd_gained - usd_fee
+        if not result['viable'] or result['profit'] <= 0:
+            if fill is None and amount_usd < wanted_usd and self._viable_at(trade, symbol, wanted_usd):
+                return self._miss(trade)
+            log.info("[SKIP] Not viable after costs", extra={'fields': {'trade': trade}})
+            return None
+        profit, total_trade_fee, amount_usd = float(result['profit']), float(result['fees']), float(result['cost'])
+        legs = (float(result['base_bought']), float(result['base_sold']), amount_usd, float(result['proceeds']))
 
-        profit = usd_after_fee - amount_usd
+        if self.inventory is not None:
+            self.inventory.apply(trade['buy_from'], trade['sell_to'], symbol, *legs)
 
-        # Track total fees (converted BTC fee to USD for tracking)
-        total_trade_fee = (btc_fee * buy_price) + usd_fee
         self.total_fees += total_trade_fee
 
         self.usd_balance += profit
@@ -62,37 +99,54 @@ class TradeExecutor:
             'balance_usd': round(self.usd_balance, 2),
             'fees_paid_usd': round(total_trade_fee, 4)
         }
-
-        self.trade_history.append(trade_record)
-        self._save_state()
-        print(f"[TRADE EXECUTED] {trade_record}")
+        if fill is not None:
+            trade_record['fill_ratio'] = round(fill['fill_ratio'], 4)
+            trade_record['slippage_usd'] = round(fill['slippage_usd'], 2)
+
+        if self._history is not None:
+            self._history.append(trade_record)
+        with metrics.span('persist'):
+            self.journal.append(trade_record, self.usd_balance, self.total_fees)
+        log.info("[TRADE EXECUTED]", extra={'fields': trade_record})
         return trade_record
 
+    def _viable_at(self, trade, symbol, amount_usd):
+        profit, _, _, viable = self.costs.evaluate(trade['buy_from'], trade['sell_to'], trade['buy_price'],
+                                                   trade['sell_price'], amount_usd, symbol)
+        return bool(viable) and profit > 0
+
+    def _miss(self, trade):
+        # Profitable at the configured size, but the holdings on the two venues can't fund it
+        self.missed_inventory += 1
+        metrics.inc('missed_inventory', trade['buy_from'])
+        log.info("[SKIP] Insufficient inventory", extra={'fields': {'trade': trade}})
+        return None
+
     def get_balance(self):
         return round(self.usd_balance, 2)
 
     def get_history(self):
-        return self.trade_history
+        if self._history is None:
+            self._history = TradeStore.from_records(self.journal.history())
+        return self._history
+
+    def trade_count(self):
+        return self.journal.seq
 
     def get_total_fees(self):
         return round(self.total_fees, 2)
 
     def _save_state(self):
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-        state = {
-            'usd_balance': self.usd_balance,
-            'total_fees': self.total_fees,
-            'trade_history': self.trade_history
-        }
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f, indent=2)
+        self.journal.snapshot(self.usd_balance, self.total_fees)
 
     def _load_state(self):
-        with open(self.state_file, 'r') as f:
-            state = json.load(f)
-            self.usd_balance = state.get('usd_balance', 10000)
-            self.total_fees = state.get('total_fees', 0.0)
-            self.trade_history = state.get('trade_history', [])
+        state = self.journal.load()
+        self.usd_balance = state.get('usd_balance', 10000)
+        self.total_fees = state.get('total_fees', 0.0)
+
+    def close(self):
+        self._save_state()
+        self.journal.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,400 @@
+import asyncio
+import bisect
+import json
+import time
+import aiohttp
+import numpy as np
+from config_loader import load_config
+from exchange_registry import create_exchange
+from logger import setup_logger
+
+# Push-based order book feed. Each exchange adapter turns its WebSocket
+# messages into level updates on a local OrderBook; every applied update
+# fires on_update so detection runs per book change instead of per poll.
+
+log = setup_logger('feed')
+
+
+class SequenceGap(Exception):
+    def __init__(self, symbol, expected, got):
+        super().__init__(f"{symbol}: expected seq {expected}, got {got}")
+        self.symbol = symbol
+
+
+class OrderBook:
+    # Price levels in dicts plus sorted price lists (bisect), so the best
+    # level is O(1) and walking depth needs no sort on each update
+    def __init__(self, exchange, symbol):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.bids = {}
+        self.asks = {}
+        self._bid_prices = []  # ascending; best bid is last
+        self._ask_prices = []  # ascending; best ask is first
+        self.seq = None
+        self.synced = False
+        self.update_ts = None
+
+    @property
+    def best_bid(self):
+        return self._bid_prices[-1] if self._bid_prices else None
+
+    @property
+    def best_ask(self):
+        return self._ask_prices[0] if self._ask_prices else None
+
+    def apply_snapshot(self, bids, asks, seq=None):
+        self.bids = {float(p): float(q) for p, q, *_ in bids if float(q) > 0}
+        self.asks = {float(p): float(q) for p, q, *_ in asks if float(q) > 0}
+        self._bid_prices = sorted(self.bids)
+        self._ask_prices = sorted(self.asks)
+        self.seq = seq
+        self.synced = True
+        self.update_ts = time.time()
+
+    def apply(self, side, price, size):
+        price = float(price)
+        size = float(size)
+        if side == 'bid':
+            levels, prices = self.bids, self._bid_prices
+        else:
+            levels, prices = self.asks, self._ask_prices
+        if size > 0:
+            if price not in levels:
+                bisect.insort(prices, price)
+            levels[price] = size
+        elif levels.pop(price, None) is not None:
+            del prices[bisect.bisect_left(prices, price)]
+        self.update_ts = time.time()
+
+    def top(self):
+        return self.best_bid, self.best_ask
+
+    def depth(self, side, levels=None):
+        # (prices, sizes) in the order a taker walks them: asks up, bids down
+        if side == 'ask':
+            prices = self._ask_prices[:levels] if levels else self._ask_prices
+            book = self.asks
+        else:
+            prices = self._bid_prices[::-1][:levels] if levels else self._bid_prices[::-1]
+            book = self.bids
+        return np.array(prices, dtype=float), np.array([book[p] for p in prices], dtype=float)
+
+
+# ---- Exchange adapters ----
+
+class CoinbaseAdapter:
+    # Advanced Trade level2 channel. sequence_num counts every message on the
+    # connection, so a gap means we lost data and must resubscribe for a fresh snapshot.
+    name = 'coinbase'
+    resync_by_reconnect = True
+
+    def __init__(self, url='wss://advanced-trade-ws.coinbase.com'):
+        self.url = url
+        self.last_seq = None
+
+    def connect_url(self, symbols):
+        return self.url
+
+    def subscribe_messages(self, symbols):
+        self.last_seq = None
+        return [{
+            'type': 'subscribe',
+            'product_ids': [s.replace('/', '-') for s in symbols],
+            'channel': 'level2'
+        }]
+
+    async def on_connect(self, feed, symbols):
+        pass
+
+    def handle(self, msg, books):
+        seq = msg.get('sequence_num')
+        if seq is not None:
+            if self.last_seq is not None and seq != self.last_seq + 1:
+                raise SequenceGap('*', self.last_seq + 1, seq)
+            self.last_seq = seq
+
+        if msg.get('channel') != 'l2_data':
+            return []
+
+        updated = set()
+        for event in msg.get('events', []):
+            symbol = event['product_id'].replace('-', '/')
+            book = books.get((self.name, symbol))
+            if book is None:
+                continue
+            updates = event.get('updates', [])
+            if event.get('type') == 'snapshot':
+                bids = [(u['price_level'], u['new_quantity']) for u in updates if u['side'] == 'bid']
+                asks = [(u['price_level'], u['new_quantity']) for u in updates if u['side'] == 'offer']
+                book.apply_snapshot(bids, asks, seq)
+            else:
+                for u in updates:
+                    book.apply('bid' if u['side'] == 'bid' else 'ask', u['price_level'], u['new_quantity'])
+                book.seq = seq
+            updated.add(symbol)
+        return updated
+
+
+class BinanceAdapter:
+    # Diff depth stream. Each event carries [U, u] update ids; the book is
+    # seeded from a REST snapshot and every event must continue from the last u.
+    name = 'binance'
+    resync_by_reconnect = False
+
+    def __init__(self, url='wss://stream.binance.us:9443', snapshot_fetcher=None, depth_limit=100):
+        self.url = url
+        self.snapshot_fetcher = snapshot_fetcher
+        self.depth_limit = depth_limit
+        self._symbol_map = {}
+
+    def _stream_symbol(self, symbol):
+        stream = symbol.replace('/', '').lower()
+        self._symbol_map[stream.upper()] = symbol
+        return stream
+
+    def connect_url(self, symbols):
+        streams = '/'.join(f"{self._stream_symbol(s)}@depth@100ms" for s in symbols)
+        return f"{self.url}/stream?streams={streams}"
+
+    def subscribe_messages(self, symbols):
+        return []
+
+    async def on_connect(self, feed, symbols):
+        for symbol in symbols:
+            await self.resync(symbol, feed.books)
+
+    async def resync(self, symbol, books):
+        book = books[(self.name, symbol)]
+        book.synced = False
+        if self.snapshot_fetcher is None:
+            exchange = create_exchange(self.name, async_mode=True)
+            try:
+                snapshot = await exchange.fetch_order_book(symbol, self.depth_limit)
+            finally:
+                await exchange.close()
+        else:
+            snapshot = await self.snapshot_fetcher(symbol)
+        book.apply_snapshot(snapshot['bids'], snapshot['asks'], snapshot['nonce'])
+
+    def handle(self, msg, books):
+        data = msg.get('data', msg)
+        if data.get('e') != 'depthUpdate':
+            return []
+
+        symbol = self._symbol_map.get(data['s'])
+        book = books.get((self.name, symbol))
+        if book is None or not book.synced:
+            return []
+
+        first_id, last_id = data['U'], data['u']
+        if last_id <= book.seq:
+            return []  # already covered by the snapshot
+        if first_id > book.seq + 1:
+            raise SequenceGap(symbol, book.seq + 1, first_id)
+
+        for price, qty in data['b']:
+            book.apply('bid', price, qty)
+        for price, qty in data['a']:
+            book.apply('ask', price, qty)
+        book.seq = last_id
+        return {symbol}
+
+
+ADAPTERS = {
+    'coinbase': CoinbaseAdapter,
+    'binance': BinanceAdapter
+}
+
+
+# ---- Transports ----
+
+class WebSocketTransport:
+    def __init__(self, heartbeat=30):
+        self.heartbeat = heartbeat
+        self._session = None
+        self._ws = None
+
+    async def connect(self, url):
+        self._session = aiohttp.ClientSession()
+        self._ws = await self._session.ws_connect(url, heartbeat=self.heartbeat)
+
+    async def send(self, msg):
+        await self._ws.send_json(msg)
+
+    async def recv(self):
+        # Returns None once the connection is closed
+        msg = await self._ws.receive()
+        if msg.type == aiohttp.WSMsgType.TEXT:
+            return json.loads(msg.data)
+        return None
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._session is not None:
+            await self._session.close()
+
+
+class ReplayTransport:
+    # In-process transport that plays back recorded messages (one JSON object per line)
+    def __init__(self, messages=None, path=None, delay=0.0):
+        if path is not None:
+            with open(path, 'r') as f:
+                messages = [json.loads(line) for line in f if line.strip()]
+        self.messages = messages or []
+        self.delay = delay
+        self.sent = []
+        self._pos = 0
+
+    async def connect(self, url):
+        self._pos = 0
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+    async def recv(self):
+        if self._pos >= len(self.messages):
+            return None
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        msg = self.messages[self._pos]
+        self._pos += 1
+        return msg
+
+    async def close(self):
+        pass
+
+
+# ---- Feed ----
+
+class OrderBookFeed:
+    def __init__(self, adapters, symbols, transport_factory=WebSocketTransport, on_update=None,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, max_reconnects=None):
+        self.adapters = adapters
+        self.symbols = symbols
+        self.transport_factory = transport_factory
+        self.on_update = on_update
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.books = {
+            (adapter.name, symbol): OrderBook(adapter.name, symbol)
+            for adapter in adapters for symbol in symbols
+        }
+        self.running = False
+        self.updates = 0
+        self.reconnects = 0
+        self.resyncs = 0
+        self.callback_errors = 0
+
+    def tops(self, symbol):
+        # {exchange: (bid, ask)} for every synced book of this symbol
+        return {
+            exchange: book.top()
+            for (exchange, sym), book in self.books.items()
+            if sym == symbol and book.synced and None not in book.top()
+        }
+
+    async def _run_adapter(self, adapter):
+        delay = self.reconnect_delay
+        attempts = 0
+        while self.running:
+            transport = self.transport_factory()
+            try:
+                await transport.connect(adapter.connect_url(self.symbols))
+                for msg in adapter.subscribe_messages(self.symbols):
+                    await transport.send(msg)
+                await adapter.on_connect(self, self.symbols)
+                delay = self.reconnect_delay
+
+                while self.running:
+                    msg = await transport.recv()
+                    if msg is None:
+                        break
+                    try:
+                        updated = adapter.handle(msg, self.books)
+                    except SequenceGap as gap:
+                        log.warning("Sequence gap on %s: %s", adapter.name, gap)
+                        self.resyncs += 1
+                        if adapter.resync_by_reconnect:
+                            break
+                        await adapter.resync(gap.symbol, self.books)
+                        continue
+                    if updated:
+                        # The connection delivered data: only consecutive failed
+                        # connections count towards max_reconnects
+                        attempts = 0
+                    for symbol in updated:
+                        self.updates += 1
+                        if self.on_update:
+                            self._notify(adapter.name, symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Feed error on %s: %s", adapter.name, e)
+            finally:
+                await transport.close()
+
+            for (exchange, _), book in self.books.items():
+                if exchange == adapter.name:
+                    book.synced = False
+
+            if not self.running:
+                break
+            if self.max_reconnects is not None and attempts >= self.max_reconnects:
+                break
+            attempts += 1
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _notify(self, exchange, symbol):
+        # A failing callback is the caller's bug, not a broken connection: log it and keep the book
+        try:
+            self.on_update(exchange, symbol, self.books[(exchange, symbol)])
+        except Exception:
+            self.callback_errors += 1
+            log.exception("on_update failed for %s %s", exchange, symbol)
+
+    async def run(self):
+        self.running = True
+        try:
+            await asyncio.gather(*(self._run_adapter(a) for a in self.adapters))
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
+
+
+def build_feed(config=None, on_update=None, **kwargs):
+    config = config or load_config()
+    adapters = [
+        ADAPTERS[name]() for name, ex_config in config['exchanges'].items()
+        if ex_config.get('enabled') and name in ADAPTERS
+    ]
+    symbols = config.get('symbols', ['BTC/USD'])
+    feed_config = config.get('feed', {})
+    kwargs.setdefault('reconnect_delay', feed_config.get('reconnect_delay', 1.0))
+    kwargs.setdefault('max_reconnect_delay', feed_config.get('max_reconnect_delay', 30.0))
+    return OrderBookFeed(adapters, symbols, on_update=on_update, **kwargs)
+
+
+# Run the detector on every book update
+
+if __name__ == "__main__":
+    from detector import ArbitrageDetector
+    from executor import TradeExecutor
+
+    config = load_config()
+    detector = ArbitrageDetector()
+    executor = TradeExecutor(trade_amount_usd=config['trade']['amount_usd'])
+
+    def on_update(exchange, symbol, book):
+        opportunities = detector.find_book_opportunity(feed.tops(symbol))
+        if opportunities:
+            executor.execute(opportunities)
+
+    feed = build_feed(config, on_update=on_update)
+    asyncio.run(feed.run())
@@ -0,0 +1,160 @@
+import heapq
+from config_loader import load_config
+
+# Per-exchange, per-asset holdings for cross-venue arbitrage. A trade buys the
+# base on one venue with quote held there and sells base already held on the
+# other, so both legs need inventory in place. Transfers between venues take
+# time and cost a withdrawal fee; a rebalancer moves an asset back toward an
+# even split when a venue's share falls below a watermark.
+
+# Stablecoin quotes are pooled with USD (BTC/USD on one venue, BTC/USDT on another)
+CASH_ASSETS = ('USD', 'USDT', 'USDC')
+
+
+def asset_key(asset):
+    return 'USD' if asset in CASH_ASSETS else asset
+
+
+class Inventory:
+    def __init__(self, balances=None, transfers=None, low_watermark=0.25, check_every=300):
+        self.balances = {}
+        for exchange, assets in (balances or {}).items():
+            for asset, amount in assets.items():
+                self.deposit(exchange, asset, amount)
+        self.transfers = {asset_key(a): params for a, params in (transfers or {}).items()}
+        self.low_watermark = low_watermark  # rebalance when a venue holds less than this share
+        self.check_every = check_every      # seconds between rebalance checks
+        self.pending = []                   # heap of (arrival ts, seq, exchange, asset, amount)
+        self._seq = 0
+        self._last_check = None
+        self.transfer_count = 0
+        self.transfer_fees = {}             # asset -> amount lost to withdrawal fees
+
+    @classmethod
+    def from_config(cls, config_path="config/settings.yaml"):
+        inventory_config = load_config(config_path).get('inventory', {})
+        rebalance = inventory_config.get('rebalance', {})
+        return cls(
+            balances=inventory_config.get('initial', {}),
+            transfers=inventory_config.get('transfer', {}),
+            low_watermark=rebalance.get('low_watermark', 0.25),
+            check_every=rebalance.get('check_every_s', 300)
+        )
+
+    # ---- Holdings ----
+
+    def deposit(self, exchange, asset, amount):
+        assets = self.balances.setdefault(exchange, {})
+        asset = asset_key(asset)
+        assets[asset] = assets.get(asset, 0.0) + float(amount)
+
+    def available(self, exchange, asset):
+        return self.balances.get(exchange, {}).get(asset_key(asset), 0.0)
+
+    def in_transit(self, asset, exchange=None):
+        asset = asset_key(asset)
+        return sum(amount for _, _, ex, a, amount in self.pending
+                   if a == asset and (exchange is None or ex == exchange))
+
+    def total(self, asset):
+        asset = asset_key(asset)
+        return sum(assets.get(asset, 0.0) for assets in self.balances.values()) + self.in_transit(asset)
+
+    def value(self, prices):
+        # USD value of everything held or in transit; prices: {asset: USD price}
+        prices = dict(prices, USD=1.0)
+        assets = {a for holdings in self.balances.values() for a in holdings}
+        return sum(self.total(a) * prices.get(a, 0.0) for a in assets)
+
+    def snapshot(self):
+        return {'balances': {ex: dict(assets) for ex, assets in self.balances.items()},
+                'in_transit': [{'arrival': ts, 'exchange': ex, 'asset': a, 'amount': amount}
+                               for ts, _, ex, a, amount in sorted(self.pending)]}
+
+    # ---- Trades ----
+
+    def fundable_usd(self, buy_ex, sell_ex, symbol, buy_price):
+        # Largest trade (quote spent) the current holdings allow: quote on the buy venue,
+        # base on the sell venue to deliver what is bought
+        base, quote = symbol.split('/')
+        return max(0.0, min(self.available(buy_ex, quote), self.available(sell_ex, base) * buy_price))
+
+    def apply(self, buy_ex, sell_ex, symbol, base_bought, base_sold, cost, proceeds):
+        base, quote = symbol.split('/')
+        self.deposit(buy_ex, quote, -cost)
+        self.deposit(buy_ex, base, base_bought)
+        self.deposit(sell_ex, base, -base_sold)
+        self.deposit(sell_ex, quote, proceeds)
+
+    # ---- Transfers and rebalancing ----
+
+    def transfer(self, asset, src, dst, amount, now):
+        # Withdraw now, credit (amount - fee) on arrival; False if not worth sending
+        asset = asset_key(asset)
+        params = self.transfers.get(asset, {})
+        fee = params.get('fee', 0.0)
+        amount = min(amount, self.available(src, asset))
+        if amount <= fee:
+            return False
+        self.deposit(src, asset, -amount)
+        self._seq += 1
+        heapq.heappush(self.pending, (now + params.get('latency_s', 0.0), self._seq, dst, asset, amount - fee))
+        self.transfer_count += 1
+        self.transfer_fees[asset] = self.transfer_fees.get(asset, 0.0) + fee
+        return True
+
+    def settle(self, now):
+        # Credit transfers that have arrived
+        while self.pending and self.pending[0][0] <= now:
+            _, _, exchange, asset, amount = heapq.heappop(self.pending)
+            self.deposit(exchange, asset, amount)
+
+    def rebalance(self, now):
+        # At most every check_every seconds: top up venues whose share of an asset
+        # (held + inbound) is below the watermark, from the venue holding the most
+        if self._last_check is not None and now - self._last_check < self.check_every:
+            return []
+        self._last_check = now
+        moves = []
+        exchanges = list(self.balances)
+        if len(exchanges) < 2:
+            return moves
+        assets = {a for holdings in self.balances.values() for a in holdings}
+        for asset in sorted(assets):
+            total = self.total(asset)
+            if total <= 0:
+                continue
+            target = total / len(exchanges)
+            for dst in exchanges:
+                level = self.available(dst, asset) + self.in_transit(asset, dst)
+                if level >= self.low_watermark * total:
+                    continue
+                src = max(exchanges, key=lambda ex: self.available(ex, asset))
+                amount = min(target - level, self.available(src, asset) - target)
+                if src != dst and amount > 0 and self.transfer(asset, src, dst, amount, now):
+                    moves.append((asset, src, dst, amount))
+        return moves
+
+    def step(self, now):
+        self.settle(now)
+        return self.rebalance(now)
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    inventory = Inventory(
+        balances={'coinbase': {'USD': 5000, 'BTC': 0.08}, 'binance': {'USDT': 5000, 'BTC': 0.08}},
+        transfers={'BTC': {'latency_s': 1800, 'fee': 0.0001}, 'USD': {'latency_s': 3600, 'fee': 5.0}}
+    )
+    # Keep buying on coinbase / selling on binance until inventory runs out
+    now, trades = 0.0, 0
+    while inventory.fundable_usd('coinbase', 'binance', 'BTC/USD', 64000) >= 1000:
+        inventory.apply('coinbase', 'binance', 'BTC/USD', 1000 / 64000 * 0.999, 1000 / 64000 * 0.999,
+                        1000, 1000 / 64000 * 0.999 * 64400 * 0.999)
+        trades += 1
+    print(f"{trades} trades before inventory ran out: {inventory.balances}")
+    print("rebalance:", inventory.step(now))
+    inventory.step(now + 3600)
+    print(f"after transfers arrive: {inventory.balances}")
+    print(f"value ${inventory.value({'BTC': 64000}):,.2f}, fees {inventory.transfer_fees}")
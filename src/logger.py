@@ -1,46 +1,209 @@
+import atexit
+import contextlib
+import json
 import logging
 import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config_loader import load_config
 
-def setup_logger(name=__name__,config_path="config/settings.yaml" ):
-    config = load_config(config_path)
-    log_config = config.get('logging',{})
-    log_level = getattr(logging,log_config.get('level','INFO').upper(),logging.INFO)
-    log_file = log_config.get('file','data/logs/arb_bot.log')
+# Non-blocking logging. Every module logger ("arb.<name>") hands records to a
+# bounded in-memory queue; a background thread formats them and does the disk
+# and terminal I/O: JSON lines in a size-rotated file, plain lines on stderr.
+# A full queue drops records (counted) instead of stalling the caller, and
+# repeated warnings/errors are rate-limited per message. Structured data goes
+# in extra={'fields': {...}}; arguments are formatted by the writer thread, so
+# they must not be mutated after the call.
 
-    # Ensure log directory exists
+ROOT = 'arb'
+TEXT_FORMAT = '[%(asctime)s][%(levelname)s] %(message)s'
 
-    os.makedirs(os.path.dirname(log_file),exist_ok=True)
+_handler = None   # the shared NonBlockingQueueHandler
+_listener = None
 
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(log_level)
 
-    # Prevent duplicate handlers
-    if not logger.handlers:
-        # Console handler
-        ch = logging.StreamHandler()
-        ch.setLevel(log_level)
-        ch_formatter = logging.Formatter('[%(asctime)s][%(levelname)s] %(message)s')
-        ch.setFormatter(ch_formatter)
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
 
-        # File handler
-        fh = logging.FileHandler(log_file)
-        fh.setLevel(log_level)
-        fh.setFormatter(ch_formatter)
 
-        # Add both handlers
-        logger.addHandler(ch)
-        logger.addHandler(fh)
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += " " + json.dumps(fields, default=str)
+        if getattr(record, 'suppressed', 0):
+            line += f" (+{record.suppressed} similar suppressed)"
+        return line
 
 
-    return logger
+class RateLimitFilter(logging.Filter):
+    # Identical warnings/errors: `burst` per window pass, later ones are counted and the
+    # first one of the next window carries how many were suppressed
+    def __init__(self, window_s=60.0, burst=5, level=logging.WARNING, max_keys=1000):
+        super().__init__()
+        self.window_s = window_s
+        self.burst = burst
+        self.level = level
+        self.max_keys = max_keys
+        self.suppressed = 0
+        self._seen = {}  # (logger, level, message) -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = record.created
+        with self._lock:
+            state = self._seen.get(key)
+            if state is None or now - state[0] >= self.window_s:
+                if state is None and len(self._seen) >= self.max_keys:
+                    self._seen = {k: s for k, s in self._seen.items() if now - s[0] < self.window_s}
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                self._seen[key] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only what can't cross threads is resolved here; the message is formatted by the writer
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def create_pipeline(log_file, level=logging.INFO, max_bytes=10_000_000, backup_count=5, console=True,
+                    queue_size=10_000, window_s=60.0, burst=5):
+    # (queue handler for loggers, started background listener)
+    handlers = []
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(TextFormatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    handler.setLevel(level)
+    handler.addFilter(RateLimitFilter(window_s, burst))
+    listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return handler, listener
+
+
+def setup_logger(name=__name__, config_path="config/settings.yaml"):
+    # Logger "arb.<name>"; the shared pipeline is built from the logging section on first use
+    global _handler, _listener
+    root = logging.getLogger(ROOT)
+    if _handler is None:
+        log_config = load_config(config_path).get('logging', {})
+        log_level = getattr(logging, log_config.get('level', 'INFO').upper(), logging.INFO)
+        limit = log_config.get('rate_limit', {})
+        _handler, _listener = create_pipeline(
+            log_config.get('file', 'data/logs/arb_bot.log'),
+            level=log_level,
+            max_bytes=log_config.get('max_bytes', 10_000_000),
+            backup_count=log_config.get('backup_count', 5),
+            console=log_config.get('console', True),
+            queue_size=log_config.get('queue_size', 10_000),
+            window_s=limit.get('window_s', 60.0),
+            burst=limit.get('burst', 5)
+        )
+        root.setLevel(log_level)
+        root.addHandler(_handler)
+        root.propagate = False
+        atexit.register(shutdown)
+    return root if name == ROOT else logging.getLogger(f"{ROOT}.{name}")
+
+
+@contextlib.contextmanager
+def quiet(name, level=logging.WARNING):
+    # Raise one module logger's level for a block, e.g. the executor's per-trade
+    # lines while benchmarks and parity checks run it thousands of times
+    logger = setup_logger(name)
+    previous = logger.level
+    logger.setLevel(level)
+    try:
+        yield logger
+    finally:
+        logger.setLevel(previous)
+
+
+def stats():
+    if _handler is None:
+        return {'queued': 0, 'dropped': 0, 'suppressed': 0}
+    limiter = _handler.filters[0]
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped, 'suppressed': limiter.suppressed}
+
+
+def shutdown():
+    # Write out whatever is still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _restart_in_child():
+    # A forked worker inherits the queue but not the writer thread
+    global _listener
+    if _listener is not None:
+        _handler.queue = queue.Queue(_handler.queue.maxsize)
+        _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
+
 
 # Example usage
 
 if __name__ == "__main__":
     logger = setup_logger("arb-bot")
     logger.info("Logger initialized successfully")
+    logger.info("trade executed", extra={'fields': {'buy_from': 'coinbase', 'sell_to': 'binance', 'profit_usd': 4.2}})
     logger.debug("This is a debug message")
-    logger.error("This is an error")
-
+    for _ in range(20):
+        logger.error("Error fetching %s from %s: %s", 'BTC/USD', 'binance', 'timeout')
+    shutdown()
+    print(stats())
@@ -4,10 +4,10 @@ import time
 import io
 import uuid
 from datetime import datetime, timezone
-from aggregator import PriceAggregator
-from detector import ArbitrageDetector
-from executor import TradeExecutor
-from notifier import Notifier
+from analytics_store import AnalyticsStore
+from engine_channel import EngineChannel
+from trade_store import TradeStore
+from spread_history import RESOLUTIONS, ChartFeed, from_config
 from config_loader import load_config
 
 
@@ -17,130 +17,142 @@ st.title("📈 Crypto Arbitrage Bot Dashboard")
 
 # Load settings
 config = load_config()
-trade_amount = config['trade']['amount_usd']
-
-# Initialize components
-aggregator = PriceAggregator()
-detector = ArbitrageDetector()
-executor = TradeExecutor(trade_amount_usd=trade_amount)
-notifier = Notifier()
-
-# For charting
-spread_history = []
-
-placeholder = st.empty()
+engine_config = config.get('engine', {})
+refresh_interval = engine_config.get('dashboard_refresh', config['poll_interval'])
+
+# Read-only view of the headless engine (python engine.py)
+channel = EngineChannel(engine_config.get('channel_path', 'state/engine.db'), readonly=True)
+history = TradeStore()
+# Trade queries run against the engine's analytics store when it is enabled;
+# otherwise the dashboard keeps every trade it has seen in memory
+analytics = AnalyticsStore.from_config(readonly=True) if config.get('analytics', {}).get('enabled') else None
+last_trade_id = 0
+last_spread_id = None
+
+# For charting: bounded ring buffers (raw, 1m, 1h) per exchange pair
+spread_history = from_config(config)
+chart = ChartFeed(spread_history)
 
 # Filter date inputs outside loop to avoid key conflict
 start_date = st.sidebar.date_input("Start Date", key="unique_filter_start_date")
 end_date = st.sidebar.date_input("End Date", key="unique_filter_end_date")
+resolution = st.sidebar.selectbox("Spread chart resolution", list(RESOLUTIONS), key="spread_resolution")
 
-while True:
-    with placeholder.container():
-        # Fetch prices
-        prices = aggregator.fetch_prices()
-
-        # Track spread between Coinbase and Binance
-        if 'coinbase' in prices and 'binance' in prices:
-            cb_price = prices['coinbase']
-            bn_price = prices['binance']
-            spread_pct = ((bn_price - cb_price) / cb_price) * 100
-            spread_history.append({
-                "timestamp": datetime.now(),
-                "spread_pct": spread_pct
-            })
+# The chart has its own slot: drawn once, then only new points are appended
+prices_slot = st.empty()
+st.subheader("📉 Exchange Spread (%)")
+chart_slot = st.empty()
+chart_slot.info("Waiting for more data to show spread chart...")
+placeholder = st.empty()
 
+while True:
+    snapshot = channel.latest_snapshot()
+    if snapshot is None:
+        prices_slot.info("Waiting for the trading engine. Start it with: python engine.py")
+        time.sleep(refresh_interval)
+        continue
+
+    # Pull only what the engine published since the last refresh; a new dashboard
+    # starts with what fits in the raw ring buffer
+    if last_spread_id is None:
+        last_spread_id = max(0, channel.last_spread_id() - spread_history.raw_capacity)
+    for spread_id, ts, pair, spread_pct in channel.spreads_since(last_spread_id):
+        spread_history.append(pair, ts, spread_pct)
+        last_spread_id = spread_id
+    if analytics is None:
+        for trade_id, trade in channel.trades_since(last_trade_id):
+            history.append(trade)
+            last_trade_id = trade_id
+
+    prices = snapshot['prices']
+    opportunities = snapshot['opportunities']
+
+    with prices_slot.container():
         st.subheader("🚱 Live Prices")
         st.write(prices)
+        st.caption(f"Engine snapshot at {snapshot['ts']}")
 
-        # Spread chart
-        st.subheader("📉 Binance vs Coinbase Spread (%)")
-        if len(spread_history) > 1:
-            df = pd.DataFrame(spread_history)
-            df.set_index("timestamp", inplace=True)
-            st.line_chart(df["spread_pct"])
-        else:
-            st.info("Waiting for more data to show spread chart...")
-
-        # Detect arbitrage
-        opportunities = detector.find_opportunity(prices)
+    # Spread chart
+    chart.update(chart_slot, resolution)
 
+    with placeholder.container():
         st.subheader("🚨 Detected Opportunities")
         if opportunities:
+            open_for = {(r['buy_from'], r['sell_to']): r['open_s'] for r in snapshot.get('routes', [])}
             for opp in opportunities:
                 st.success(f"{opp['buy_from']} → {opp['sell_to']}: "
                            f"${opp['buy_price']} → ${opp['sell_price']} | "
                            f"Spread: {opp['spread_pct']}% | "
-                           f"Est. Profit: ${opp['estimated_profit_usd']}")
-
-            # Notify top opportunity
-            top = opportunities[0]
-            msg = (
-                f"🚀 *Arbitrage Opportunity Detected!*\n"
-                f"Buy from: *{top['buy_from']}* at `${top['buy_price']}`\n"
-                f"Sell to: *{top['sell_to']}* at `${top['sell_price']}`\n"
-                f"Spread: *{top['spread_pct']}%*\n"
-                f"Est. Profit: *${top['estimated_profit_usd']}*"
-            )
-            notifier.send_telegram(msg)
-
-            # Simulate trade
-            trade_result = executor.execute(opportunities)
-
-            # Notify trade execution
-            if trade_result:
-                trade_msg = (
-                    f"✅ *Trade Executed!*\n"
-                    f"Bought from: *{trade_result['buy_from']}* at `${trade_result['buy_price']}`\n"
-                    f"Sold to: *{trade_result['sell_to']}* at `${trade_result['sell_price']}`\n"
-                    f"Profit: *${trade_result['profit_usd']}*\n"
-                    f"New Balance: *${trade_result['balance_usd']}*"
-                )
-                notifier.send_telegram(trade_msg)
+                           f"Est. Profit: ${opp['estimated_profit_usd']}"
+                           + (f" | Open {open_for[(opp['buy_from'], opp['sell_to'])]}s"
+                              if (opp['buy_from'], opp['sell_to']) in open_for else ""))
 
             st.subheader("✅ Last Trade Executed")
-            st.json(trade_result)
+            st.json(snapshot['last_trade'])
 
         else:
             st.info("No profitable opportunities at the moment.")
+        if snapshot.get('route_stats'):
+            stats = snapshot['route_stats']
+            st.caption(f"Routes opened {stats['opened']}, closed {stats['closed']}, "
+                       f"re-opens held back by cooldown {stats['suppressed']}")
+
+        # Multi-leg cycles (stream mode with the cycles section enabled)
+        if snapshot.get('cycles'):
+            st.subheader("🔺 Multi-leg Cycles")
+            for cycle in snapshot['cycles']:
+                st.success(" → ".join(f"{ex}:{asset}" for ex, asset in cycle['path']) +
+                           f" | Profit: {cycle['profit_pct']}%")
 
         # Show current balance
         st.subheader("💰 Virtual USD Balance")
-        st.metric(label="Current Balance", value=f"${executor.get_balance()}")
-
-        # Show today's P&L
-        history = executor.get_history()
-        todays_profit = 0.0
-        if history:
-            today = datetime.now(timezone.utc).date()
-            todays_trades = [
-                trade for trade in history
-                if datetime.fromisoformat(trade['timestamp']).date() == today
-            ]
-            todays_profit = sum(trade['profit_usd'] for trade in todays_trades)
+        st.metric(label="Current Balance", value=f"${snapshot['balance_usd']}")
+
+        # Show today's P&L (a daily rollup row in the analytics store, else the trade store's running aggregate)
+        today = datetime.now(timezone.utc).date()
+        todays_profit = analytics.day_pnl(today) if analytics else history.day_pnl(today)
 
         st.subheader("📅 Today's P&L")
         st.metric(label="Profit / Loss", value=f"${round(todays_profit, 2)}")
 
         # Show trade history
         st.subheader("📜 Trade History")
-        if history:
-            st.dataframe(history[::-1])
+        recent = analytics.trades(limit=500, newest_first=True) if analytics else history.tail(500)
+        if len(recent):
+            st.dataframe(recent)
         else:
             st.write("No trades yet.")
 
         # Filter and download trade history
         st.subheader("📅 Filter & Download Trade History")
-        filtered_trades = []
-        if history:
-            for trade in history:
-                trade_date = datetime.fromisoformat(trade['timestamp']).date()
-                if start_date <= trade_date <= end_date:
-                    filtered_trades.append(trade)
-
-            if filtered_trades:
-                st.dataframe(filtered_trades[::-1])
-
-                df_filtered = pd.DataFrame(filtered_trades)
+        if analytics is not None:
+            # Indexed range query: the latest 1000 rows are shown, the export streams the whole range
+            count = analytics.trade_count(start_date, end_date)
+            if count:
+                st.caption(f"{count} trades in range")
+                st.dataframe(analytics.trades(start_date, end_date, limit=1000, newest_first=True))
+                st.dataframe(analytics.pnl_by_route(start_date, end_date))
+                st.download_button(
+                    label="Download Filtered Trade History",
+                    data=analytics.export_csv(start_date, end_date),
+                    file_name="filtered_trade_history.csv",
+                    mime="text/csv",
+                    key=f"filtered_trade_history_download_{uuid.uuid4()}"
+                )
+            else:
+                st.info("No trades found in the selected range.")
+        elif history:
+            filtered_idx = history.range_indices(start_date, end_date)
+
+            if len(filtered_idx):
+                # Totals from the store's per-day running sums; only the latest 1000 rows are shown
+                stats = history.range_stats(start_date, end_date)
+                st.caption(f"{stats['trades']} trades in range, {stats['wins']} profitable, "
+                           f"P&L ${stats['pnl']:.2f}, fees ${stats['fees']:.2f}")
+                st.dataframe(history.to_dataframe(filtered_idx[-1000:], reverse=True))
+
+                # The export is the one place the whole range is materialized
+                df_filtered = history.to_dataframe(filtered_idx)
                 csv_buffer = io.StringIO()
                 df_filtered.to_csv(csv_buffer, index=False)
 
@@ -156,5 +168,19 @@ while True:
         else:
             st.warning("No trade history available.")
 
-    # Pause before next update
-    time.sleep(aggregator.poll_interval)
+        # Engine latency per stage / exchange and error counters
+        st.subheader("⏱️ Engine Latency")
+        engine_metrics = channel.latest_snapshot('metrics')
+        if engine_metrics and engine_metrics['stages']:
+            st.dataframe(pd.DataFrame(engine_metrics['stages']))
+            if engine_metrics['counters']:
+                st.dataframe(pd.DataFrame(engine_metrics['counters']))
+            if engine_metrics.get('logging'):
+                log_stats = engine_metrics['logging']
+                st.caption(f"Log records dropped (queue full): {log_stats['dropped']}, "
+                           f"repeated warnings suppressed: {log_stats['suppressed']}")
+        else:
+            st.info("No metrics yet (enable the metrics section in settings.yaml).")
+
+    # Pause before next refresh
+    time.sleep(refresh_interval)
@@ -0,0 +1,226 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Hot-path instrumentation: monotonic-clock spans recorded into HDR-style
+# log-linear histograms (fixed relative error, O(1) record), plus counters.
+# Exported in Prometheus text format on a local HTTP endpoint. When disabled,
+# span() hands back a shared no-op context manager and inc() returns at once.
+
+SUB_BITS = 4                 # 16 sub-buckets per power of two -> <= 6.25% bucket width
+SUB_COUNT = 1 << SUB_BITS
+MAX_BITS = 36                # values in microseconds, up to ~19 hours
+N_BUCKETS = (MAX_BITS - SUB_BITS) * SUB_COUNT + SUB_COUNT
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+PREFIX = "arb"
+
+
+def bucket_index(value_us):
+    if value_us < 2 * SUB_COUNT:
+        return value_us
+    shift = value_us.bit_length() - SUB_BITS - 1
+    index = shift * SUB_COUNT + (value_us >> shift)
+    return index if index < N_BUCKETS else N_BUCKETS - 1
+
+
+def bucket_bounds(index):
+    # [low, high) in microseconds
+    if index < 2 * SUB_COUNT:
+        return index, index + 1
+    shift = index // SUB_COUNT - 1
+    mantissa = index % SUB_COUNT + SUB_COUNT
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total_us', 'max_us')
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, value_us):
+        self.counts[bucket_index(value_us)] += 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def quantiles(self, qs=QUANTILES):
+        # Upper bound of the bucket holding each quantile (capped at the observed max)
+        if not self.count:
+            return {q: 0.0 for q in qs}
+        targets = sorted((max(1, int(q * self.count + 0.5)), q) for q in qs)
+        result, seen, t = {}, 0, 0
+        for index, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            while t < len(targets) and seen >= targets[t][0]:
+                result[targets[t][1]] = min(bucket_bounds(index)[1] - 1, self.max_us)
+                t += 1
+            if t == len(targets):
+                break
+        return result
+
+
+class _Span:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.key, (time.perf_counter_ns() - self.start) // 1000)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}   # (stage, exchange) -> Histogram
+        self.counters = {}     # (name, exchange) -> int
+        self._server = None
+
+    def configure(self, metrics_config):
+        # metrics_config: the `metrics` section of settings.yaml
+        self.enabled = metrics_config.get('enabled', False)
+        if self.enabled and metrics_config.get('port'):
+            self.serve(metrics_config.get('host', '127.0.0.1'), metrics_config['port'])
+
+    # ---- Hot path ----
+
+    def span(self, stage, exchange=None):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, (stage, exchange))
+
+    def record(self, key, value_us):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.record(value_us)
+
+    def observe(self, stage, seconds, exchange=None):
+        if self.enabled:
+            self.record((stage, exchange), int(seconds * 1e6))
+
+    def inc(self, name, exchange=None, amount=1):
+        if self.enabled:
+            key = (name, exchange)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    # ---- Export ----
+
+    def summary(self):
+        # Plain dict for the dashboard: latency percentiles in ms and counter values
+        stages = []
+        for (stage, exchange), histogram in sorted(self.histograms.items(), key=lambda kv: (kv[0][0], kv[0][1] or '')):
+            qs = histogram.quantiles()
+            stages.append({
+                'stage': stage,
+                'exchange': exchange or '',
+                'count': histogram.count,
+                'mean_ms': round(histogram.total_us / histogram.count / 1000, 3) if histogram.count else 0.0,
+                'p50_ms': qs[0.5] / 1000,
+                'p90_ms': qs[0.9] / 1000,
+                'p99_ms': qs[0.99] / 1000,
+                'max_ms': histogram.max_us / 1000
+            })
+        counters = [
+            {'counter': name, 'exchange': exchange or '', 'value': value}
+            for (name, exchange), value in sorted(self.counters.items(), key=lambda kv: (kv[0][0], kv[0][1] or ''))
+        ]
+        return {'stages': stages, 'counters': counters}
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = [
+            f"# HELP {PREFIX}_latency_seconds Latency per pipeline stage / exchange",
+            f"# TYPE {PREFIX}_latency_seconds summary"
+        ]
+        for (stage, exchange), histogram in list(self.histograms.items()):
+            labels = f'stage="{stage}"' + (f',exchange="{exchange}"' if exchange else '')
+            for q, value_us in histogram.quantiles().items():
+                lines.append(f'{PREFIX}_latency_seconds{{{labels},quantile="{q}"}} {value_us / 1e6:.6f}')
+            lines.append(f"{PREFIX}_latency_seconds_sum{{{labels}}} {histogram.total_us / 1e6:.6f}")
+            lines.append(f"{PREFIX}_latency_seconds_count{{{labels}}} {histogram.count}")
+
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            for (counter, exchange), value in list(self.counters.items()):
+                if counter != name:
+                    continue
+                labels = f'{{exchange="{exchange}"}}' if exchange else ''
+                lines.append(f"{PREFIX}_{name}_total{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host="127.0.0.1", port=9108):
+        if self._server is not None:
+            return self._server.server_address
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                data = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+
+
+# Process-wide registry; disabled until configure() turns it on
+metrics = Metrics()
+
+
+if __name__ == "__main__":
+    import random
+    metrics.enabled = True
+    for _ in range(10000):
+        metrics.observe('fetch', random.lognormvariate(-3, 0.5), exchange='coinbase')
+    with metrics.span('detect'):
+        time.sleep(0.001)
+    metrics.inc('fetch_errors', exchange='binance')
+    print(metrics.render())
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from aiohttp import web
+
+# Local stand-ins for ccxt exchanges. They return ccxt-shaped tickers after a
+# configurable network delay so benchmarks and replays run offline.
+
+
+class MockExchange:
+    def __init__(self, id='mock', base_price=65000.0, latency=0.05, jitter=0.0, spread_bps=1.0, seed=None):
+        self.id = id
+        self.price = base_price
+        self.latency = latency
+        self.jitter = jitter
+        self.spread_bps = spread_bps
+        self.rateLimit = 100
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def _delay(self):
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _ticker(self, symbol):
+        # Random walk so consecutive calls see moving prices
+        self.calls += 1
+        self.price *= 1 + self._rng.gauss(0, 0.0005)
+        half_spread = self.price * self.spread_bps / 20000
+        return {
+            'symbol': symbol,
+            'timestamp': int(time.time() * 1000),
+            'bid': round(self.price - half_spread, 2),
+            'ask': round(self.price + half_spread, 2),
+            'bidVolume': round(self._rng.uniform(0.1, 5.0), 4),
+            'askVolume': round(self._rng.uniform(0.1, 5.0), 4),
+            'last': round(self.price, 2)
+        }
+
+    def fetch_ticker(self, symbol):
+        time.sleep(self._delay())
+        return self._ticker(symbol)
+
+    def fetch_ohlcv(self, symbol, timeframe='5m', since=None, limit=1000):
+        # Deterministic candles on a fixed grid, capped at the current time
+        self.calls += 1
+        tf_ms = {'1m': 60000, '5m': 300000, '1h': 3600000}[timeframe]
+        now = int(time.time() * 1000)
+        start = -(-since // tf_ms) * tf_ms
+        candles = []
+        for ts in range(start, min(start + limit * tf_ms, now), tf_ms):
+            price = self.price * (1 + 0.01 * ((ts // tf_ms) % 7 - 3) / 3)
+            candles.append([ts, price, price * 1.001, price * 0.999, price, 1.0])
+        return candles
+
+
+class AsyncMockExchange(MockExchange):
+    async def fetch_ticker(self, symbol):
+        await asyncio.sleep(self._delay())
+        return self._ticker(symbol)
+
+    async def close(self):
+        pass
+
+
+def make_mock_exchanges(latencies, async_mode=False, seed=0):
+    # latencies: {name: seconds}
+    cls = AsyncMockExchange if async_mode else MockExchange
+    return {
+        name: cls(id=name, latency=latency, seed=seed + i)
+        for i, (name, latency) in enumerate(latencies.items())
+    }
+
+
+class ReplayServer:
+    # Local WebSocket server that sends recorded feed messages to every client,
+    # so OrderBookFeed can be run against real sockets without an exchange.
+    # sessions: one message list per successive connection (the last one repeats);
+    # the server closes the socket after each, like a dropped connection.
+    def __init__(self, messages=None, path=None, host='127.0.0.1', port=0, delay=0.0, sessions=None):
+        if path is not None:
+            with open(path, 'r') as f:
+                messages = [json.loads(line) for line in f if line.strip()]
+        self.sessions = sessions or [messages or []]
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.connections = 0
+        self._runner = None
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        messages = self.sessions[min(self.connections, len(self.sessions) - 1)]
+        self.connections += 1
+        for msg in messages:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            await ws.send_json(msg)
+        await ws.close()
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"ws://{self.host}:{self.port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class MockTelegramServer:
+    # Local HTTP stand-in for the Telegram Bot API sendMessage endpoint.
+    # Answers the first `throttle_first` requests with 429 + retry_after.
+    def __init__(self, latency=0.0, throttle_first=0, retry_after=1):
+        self.latency = latency
+        self.throttle_first = throttle_first
+        self.retry_after = retry_after
+        self.messages = []
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                time.sleep(server.latency)
+                server.requests += 1
+                if server.requests <= server.throttle_first:
+                    reply = {'ok': False, 'error_code': 429, 'parameters': {'retry_after': server.retry_after}}
+                    status = 429
+                else:
+                    server.messages.append(body['text'])
+                    reply = {'ok': True}
+                    status = 200
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# For standalone testing: OrderBookFeed over real sockets, with sequence gaps and dropped connections
+
+def _coinbase_l2(seq, kind, updates):
+    return {'channel': 'l2_data', 'sequence_num': seq, 'events': [{
+        'type': kind, 'product_id': 'BTC-USD',
+        'updates': [{'side': side, 'price_level': str(price), 'new_quantity': str(qty)} for side, price, qty in updates]
+    }]}
+
+
+def _binance_depth(first_id, last_id, bids=(), asks=()):
+    return {'stream': 'btcusd@depth@100ms', 'data': {'e': 'depthUpdate', 's': 'BTCUSD', 'U': first_id, 'u': last_id,
+                                                     'b': [list(level) for level in bids],
+                                                     'a': [list(level) for level in asks]}}
+
+
+async def _replay_check():
+    from feed import BinanceAdapter, CoinbaseAdapter, OrderBookFeed
+
+    # Coinbase: a sequence gap forces a reconnect (fresh snapshot), then the server drops the socket
+    # and every later connection closes without data, so the feed gives up after max_reconnects of those
+    snapshot = _coinbase_l2(0, 'snapshot', [('bid', 100.0, 1), ('offer', 101.0, 1)])
+    server = ReplayServer(sessions=[
+        [snapshot, _coinbase_l2(1, 'update', [('bid', 100.5, 2)]), _coinbase_l2(3, 'update', [('bid', 100.7, 1)])],
+        [snapshot, _coinbase_l2(1, 'update', [('offer', 100.9, 3)])],
+        []
+    ])
+    url = await server.start()
+    calls = []
+
+    def on_update(exchange, symbol, book):
+        calls.append(book.top())
+        if len(calls) == 1:
+            raise RuntimeError("callback bug")
+
+    feed = OrderBookFeed([CoinbaseAdapter(url)], ['BTC/USD'], on_update=on_update,
+                         reconnect_delay=0.01, max_reconnects=2)
+    await feed.run()
+    await server.stop()
+    assert feed.callback_errors == 1, "a callback error must not drop the connection"
+    # Connections that delivered data reset the attempt count: 2 with data + 2 empty ones
+    assert feed.resyncs == 1 and feed.reconnects == 3 and server.connections == 4
+    assert calls == [(100.0, 101.0), (100.5, 101.0), (100.0, 101.0), (100.0, 100.9)], calls
+    print(f"coinbase: {server.connections} connections, {feed.resyncs} gap resync by reconnect, "
+          f"{feed.callback_errors} callback error kept the connection -> OK")
+
+    # Binance: a gap in update ids is repaired with a REST snapshot on the same connection
+    snapshots = [{'bids': [[100.0, 1]], 'asks': [[101.0, 1]], 'nonce': 10},
+                 {'bids': [[99.0, 1]], 'asks': [[101.0, 2]], 'nonce': 20},
+                 {'bids': [[98.0, 1]], 'asks': [[99.5, 1]], 'nonce': 30}]
+    fetched = []
+
+    async def fetch_snapshot(symbol):
+        fetched.append(symbol)
+        return snapshots[min(len(fetched), len(snapshots)) - 1]
+
+    server = ReplayServer(sessions=[
+        [_binance_depth(9, 10, bids=[(50.0, 1)]),              # covered by the snapshot: ignored
+         _binance_depth(11, 11, bids=[(100.2, 1)]),
+         _binance_depth(15, 16, bids=[(100.4, 1)]),            # gap: 12..14 missing
+         _binance_depth(21, 22, asks=[(100.8, 1)])],
+        [_binance_depth(31, 31, bids=[(98.5, 1)])],
+        []
+    ])
+    url = await server.start()
+    tops = []
+    feed = OrderBookFeed([BinanceAdapter(url, snapshot_fetcher=fetch_snapshot)], ['BTC/USD'],
+                         on_update=lambda exchange, symbol, book: tops.append(book.top()),
+                         reconnect_delay=0.01, max_reconnects=1)
+    await feed.run()
+    await server.stop()
+    assert feed.resyncs == 1 and feed.reconnects == 2 and server.connections == 3 and len(fetched) == 4
+    assert tops == [(100.2, 101.0), (99.0, 100.8), (98.5, 99.5)], tops
+    print(f"binance: {len(fetched)} REST snapshots ({feed.resyncs} for the gap), "
+          f"{feed.reconnects} reconnect after the dropped socket -> OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(_replay_check())
@@ -1,32 +1,163 @@
+import queue
+import threading
+import time
 import requests
 from config_loader import load_config
+from logger import setup_logger
+
+# Telegram messages are queued and sent from a background thread, so the
+# trading loop only pays for an enqueue. Bursts are joined into one message
+# and sends are paced to Telegram's rate limit.
+
+TELEGRAM_MAX_LEN = 4096
+log = setup_logger('notifier')
+
 
 class Notifier:
-    def __init__(self,config_path = "config/settings.yaml"):
+    def __init__(self,config_path = "config/settings.yaml", start=True):
         self.config = load_config(config_path)
         tg_config = self.config.get('notifier',{}).get('telegram',{})
         self.enabled = tg_config.get('enabled', False)
         self.bot_token = tg_config.get('bot_token')
         self.chat_id = tg_config.get('chat_id')
+        self.api_url = tg_config.get('api_url', 'https://api.telegram.org')
+        self.timeout = tg_config.get('timeout', 5)
+        self.min_interval = 1.0 / tg_config.get('rate_limit_per_sec', 1.0)
+        self.batch_window = tg_config.get('batch_window', 0.5)
+        self.max_retries = tg_config.get('max_retries', 3)
+
+        self._queue = queue.Queue(maxsize=tg_config.get('queue_size', 100))
+        self._session = requests.Session()  # keeps the HTTPS connection alive between sends
+        self._last_send = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.dropped = 0  # lifetime total, for stats
+        self._pending_dropped = 0  # drops not yet reported in a message
+        self._drop_lock = threading.Lock()
+        self.failed = 0
+
+        if start and self._configured():
+            self.start()
+
+    def _configured(self):
+        return self.enabled and self.bot_token and self.chat_id
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+            self._thread.start()
 
     def send_telegram(self, message:str):
-        if not self.enabled or not self.bot_token or not self.chat_id:
+        # Hot path: never blocks. On overflow the message is dropped and counted.
+        if not self._configured():
             return
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # Callers run on any thread; the notifier thread reads and resets the pending count
+            with self._drop_lock:
+                self.dropped += 1
+                self._pending_dropped += 1
+
+    def _collect_batch(self):
+        # Wait for one message, then gather whatever else arrives within the batch window
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _coalesce(self, batch):
+        # Join a burst into as few messages as fit Telegram's length limit
+        with self._drop_lock:
+            pending, self._pending_dropped = self._pending_dropped, 0
+        if pending:
+            batch.append(f"_({pending} notifications dropped, queue full)_")
+        messages, current = [], ""
+        for text in batch:
+            candidate = f"{current}\n\n{text}" if current else text
+            if len(candidate) > TELEGRAM_MAX_LEN and current:
+                messages.append(current)
+                current = text[:TELEGRAM_MAX_LEN]
+            else:
+                current = candidate[:TELEGRAM_MAX_LEN]
+        if current:
+            messages.append(current)
+        return messages
+
+    def _post(self, message):
+        url = f"{self.api_url}/bot{self.bot_token}/sendMessage"
         payload = {
             'chat_id': self.chat_id,
             'text':message,
             'parse_mode':'Markdown'
         }
 
-        try:
-            response = requests.post(url=url,json=payload)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"Telegram notification failed: {e}")
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            # Pace sends to the configured rate
+            wait = self._last_send + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_send = time.monotonic()
+
+            try:
+                response = self._session.post(url=url, json=payload, timeout=self.timeout)
+                if response.status_code == 429:
+                    # Telegram says how long to wait in parameters.retry_after
+                    retry_after = response.json().get('parameters', {}).get('retry_after', backoff)
+                    time.sleep(retry_after)
+                    backoff *= 2
+                    continue
+                response.raise_for_status()
+                self.sent += 1
+                return True
+            except requests.exceptions.RequestException as e:
+                if attempt == self.max_retries:
+                    log.warning("Telegram notification failed: %s", e)
+                    break
+                time.sleep(backoff)
+                backoff *= 2
+        self.failed += 1
+        return False
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            count = len(batch)
+            for message in self._coalesce(batch):
+                self._post(message)
+            for _ in range(count):
+                self._queue.task_done()
+
+    def flush(self, timeout=10.0):
+        # Wait until everything queued so far has been handed to the API
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def close(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._session.close()
 
 # Example test
 
 if __name__ == '__main__':
     notifier = Notifier()
-    notifier.send_telegram("Test message from your Crypto Arbitrage Bot :)")
\ No newline at end of file
+    notifier.send_telegram("Test message from your Crypto Arbitrage Bot :)")
+    notifier.close()
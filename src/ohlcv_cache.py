@@ -0,0 +1,192 @@
+import json
+import os
+import time
+import ccxt
+import numpy as np
+import pandas as pd
+from logger import setup_logger
+
+# On-disk OHLCV cache. Each exchange/symbol/timeframe partition is one flat
+# file of fixed-size records sorted by timestamp, so new candles are plain
+# appends and reads are a zero-copy np.memmap.
+
+log = setup_logger('ohlcv_cache')
+
+OHLCV_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+
+def fetch_ohlcv_range(exchange, symbol, timeframe, since, end_time, strict=False):
+    # Page through fetch_ohlcv in batches of 1000 from since (ms) up to end_time (ms).
+    # An error ends the range early (what was fetched is returned) or, with strict, is raised.
+    all_data = []
+    while since < end_time:
+        try:
+            batch = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=1000)
+            if not batch:
+                break
+
+            all_data += [c for c in batch if c[0] < end_time]
+            since = batch[-1][0] + 1  # move past the last timestamp
+
+            # Be nice to the API
+            time.sleep(exchange.rateLimit / 1000)
+
+        except Exception as e:
+            if strict:
+                raise
+            log.warning("Error fetching %s batch from %s: %s", symbol, exchange.id, e)
+            break
+    return all_data
+
+
+class OHLCVCache:
+    def __init__(self, root="data/cache/ohlcv"):
+        self.root = root
+
+    def path(self, exchange_id, symbol, timeframe):
+        return os.path.join(self.root, exchange_id, symbol.replace('/', '-'), f"{timeframe}.bin")
+
+    def _covered_from(self, exchange_id, symbol, timeframe):
+        # Earliest timestamp already requested, so history that starts later
+        # than asked for is not re-requested on every run
+        meta_path = self.path(exchange_id, symbol, timeframe) + ".json"
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r') as f:
+            return json.load(f).get('covered_from')
+
+    def _set_covered_from(self, exchange_id, symbol, timeframe, since):
+        meta_path = self.path(exchange_id, symbol, timeframe) + ".json"
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        with open(meta_path, 'w') as f:
+            json.dump({'covered_from': since}, f)
+
+    def load(self, exchange_id, symbol, timeframe):
+        path = self.path(exchange_id, symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=OHLCV_DTYPE)
+        size = os.path.getsize(path)
+        count = size // OHLCV_DTYPE.itemsize
+        if count * OHLCV_DTYPE.itemsize != size:
+            # A crash mid-append left a partial record; drop it
+            with open(path, 'r+b') as f:
+                f.truncate(count * OHLCV_DTYPE.itemsize)
+        if count == 0:
+            return np.empty(0, dtype=OHLCV_DTYPE)
+        return np.memmap(path, dtype=OHLCV_DTYPE, mode='r', shape=(count,))
+
+    def _to_records(self, candles):
+        records = np.array([tuple(c[:6]) for c in candles], dtype=OHLCV_DTYPE)
+        records = np.sort(records, order='timestamp')
+        keep = np.ones(len(records), dtype=bool)
+        keep[1:] = records['timestamp'][1:] != records['timestamp'][:-1]
+        return records[keep]
+
+    def append(self, exchange_id, symbol, timeframe, candles):
+        if not candles:
+            return
+        path = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            f.write(self._to_records(candles).tobytes())
+
+    def prepend(self, exchange_id, symbol, timeframe, candles):
+        # Older history goes in front, so rewrite the partition and swap it in
+        if not candles:
+            return
+        existing = np.array(self.load(exchange_id, symbol, timeframe))
+        records = self._to_records(candles)
+        if len(existing):
+            records = records[records['timestamp'] < existing['timestamp'][0]]
+        path = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(records.tobytes())
+            f.write(existing.tobytes())
+        os.replace(tmp_path, path)
+
+    def get(self, exchange, symbol, timeframe, since, end_time, offline=False):
+        # Returns cached candles in [since, end_time), fetching only the missing head/tail
+        exchange_id = exchange if isinstance(exchange, str) else exchange.id
+        tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        # Never cache the candle that is still forming
+        closed_end = min(end_time, int(time.time() * 1000) // tf_ms * tf_ms)
+
+        data = self.load(exchange_id, symbol, timeframe)
+        if not offline:
+            covered_from = self._covered_from(exchange_id, symbol, timeframe)
+            if len(data) == 0:
+                self.append(exchange_id, symbol, timeframe,
+                            fetch_ohlcv_range(exchange, symbol, timeframe, since, closed_end))
+                self._set_covered_from(exchange_id, symbol, timeframe, since)
+            else:
+                first, last = int(data['timestamp'][0]), int(data['timestamp'][-1])
+                if since < min(first, covered_from or first):
+                    # Older history is only stored (and marked covered) when the whole range came
+                    # back: a fetch that stopped early would leave a hole in front of `first` that
+                    # is never requested again. Tail fetches continue from the last candle anyway.
+                    try:
+                        head = fetch_ohlcv_range(exchange, symbol, timeframe, since, first, strict=True)
+                    except Exception as e:
+                        log.warning("Error fetching %s history before %s from %s, retrying next run: %s",
+                                    symbol, first, exchange_id, e)
+                    else:
+                        self.prepend(exchange_id, symbol, timeframe, head)
+                        self._set_covered_from(exchange_id, symbol, timeframe, since)
+                if last + tf_ms < closed_end:
+                    self.append(exchange_id, symbol, timeframe,
+                                fetch_ohlcv_range(exchange, symbol, timeframe, last + tf_ms, closed_end))
+            data = self.load(exchange_id, symbol, timeframe)
+
+        ts = data['timestamp']
+        lo, hi = np.searchsorted(ts, [since, end_time])
+        return data[lo:hi]
+
+
+def to_dataframe(records):
+    df = pd.DataFrame({name: records[name] for name in OHLCV_DTYPE.names[1:]})
+    df.index = pd.to_datetime(records['timestamp'], unit="ms")
+    df.index.name = "timestamp"
+    return df
+
+
+# For standalone testing: a history fetch that fails part-way must not leave a gap marked as covered
+
+if __name__ == "__main__":
+    import tempfile
+    from mock_exchange import MockExchange
+
+    class FlakyExchange(MockExchange):
+        def __init__(self, fail_on_call, **kwargs):
+            super().__init__(**kwargs)
+            self.rateLimit = 0
+            self.fail_on_call = fail_on_call
+
+        def fetch_ohlcv(self, symbol, timeframe='5m', since=None, limit=1000):
+            if self.calls + 1 == self.fail_on_call:
+                self.calls += 1
+                raise ccxt.NetworkError("connection reset")
+            return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+    day_ms = 86_400_000
+    now = int(time.time() * 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = OHLCVCache(tmp)
+        recent = cache.get(FlakyExchange(0, id='mock'), 'BTC/USD', '5m', now - 3 * day_ms, now)
+        # 10 days back needs 3 pages of older candles; the second one fails
+        cache.get(FlakyExchange(2, id='mock'), 'BTC/USD', '5m', now - 10 * day_ms, now)
+        after_failure = cache.load('mock', 'BTC/USD', '5m')
+        assert after_failure['timestamp'][0] == recent['timestamp'][0], "partial history must not be prepended"
+        full = cache.get(FlakyExchange(0, id='mock'), 'BTC/USD', '5m', now - 10 * day_ms, now)
+        gaps = np.diff(full['timestamp'])
+        assert len(full) > 2800 and (gaps == 300_000).all(), "history must be contiguous"
+        print(f"{len(recent)} cached candles; failed history fetch left them untouched; "
+              f"retry filled {len(full) - len(after_failure)} older candles, no gaps -> OK")
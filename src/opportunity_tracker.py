@@ -0,0 +1,160 @@
+import time
+from config_loader import load_config
+
+# Lifecycle of arbitrage opportunities per route (buy venue, sell venue, symbol).
+# A spread that persists over many ticks is one opportunity: it opens once,
+# updates while it lasts and closes when it is gone, so alerts and trades only
+# happen on the open transition. Hysteresis: a route opens at open_spread_pct
+# but only closes once its spread falls below close_spread_pct (or it is no
+# longer reported). A closed route cannot reopen during its cooldown, which
+# stops flapping around the threshold from re-trading the same dislocation.
+
+OPEN = 'open'
+UPDATE = 'update'
+CLOSE = 'close'
+
+
+class Route:
+    __slots__ = ('key', 'is_open', 'opened_at', 'closed_at', 'ticks', 'spread_pct', 'peak_spread_pct',
+                 'opportunity')
+
+    def __init__(self, key):
+        self.key = key
+        self.is_open = False
+        self.opened_at = None
+        self.closed_at = None
+        self.ticks = 0
+        self.spread_pct = 0.0
+        self.peak_spread_pct = 0.0
+        self.opportunity = None
+
+
+class OpportunityTracker:
+    def __init__(self, open_spread_pct=0.3, close_spread_pct=0.2, cooldown_s=30.0):
+        self.open_spread_pct = open_spread_pct
+        self.close_spread_pct = min(close_spread_pct, open_spread_pct)
+        self.cooldown_s = cooldown_s
+        self.routes = {}    # (buy, sell, symbol) -> Route
+        self._open = {}     # symbol -> {route key}, to close routes that stop being reported
+        self.opened = 0
+        self.closed = 0
+        self.suppressed = 0  # reopen attempts blocked by the cooldown
+
+    @classmethod
+    def from_config(cls, config_path="config/settings.yaml"):
+        config = load_config(config_path)
+        tracker_config = config.get('opportunities', {})
+        open_spread = config['arbitrage']['min_spread_percentage']
+        return cls(
+            open_spread_pct=open_spread,
+            close_spread_pct=tracker_config.get('close_spread_pct', open_spread),
+            cooldown_s=tracker_config.get('cooldown_s', 30.0)
+        )
+
+    def _event(self, kind, route, now, reason=None):
+        buy_from, sell_to, symbol = route.key
+        event = {
+            'event': kind,
+            'buy_from': buy_from,
+            'sell_to': sell_to,
+            'symbol': symbol,
+            'ts': now,
+            'spread_pct': route.spread_pct,
+            'peak_spread_pct': route.peak_spread_pct,
+            'ticks': route.ticks,
+            'duration_s': round(now - route.opened_at, 3),
+            'opportunity': route.opportunity
+        }
+        if reason:
+            event['reason'] = reason
+        return event
+
+    def _close(self, route, now, reason):
+        route.is_open = False
+        route.closed_at = now
+        self._open.get(route.key[2], set()).discard(route.key)
+        self.closed += 1
+        return self._event(CLOSE, route, now, reason)
+
+    def update(self, opportunities, now=None, symbol=None):
+        # One detection result for `symbol` (None = every symbol) -> list of transition events.
+        # Open routes of that symbol that are not in this result are closed.
+        now = time.time() if now is None else now
+        events = []
+        seen = set()
+        for opp in opportunities or []:
+            key = (opp['buy_from'], opp['sell_to'], opp.get('symbol') or symbol)
+            seen.add(key)
+            spread = opp['spread_pct']
+            route = self.routes.get(key)
+            if route is not None and route.is_open:
+                if spread < self.close_spread_pct:
+                    events.append(self._close(route, now, 'spread'))
+                    continue
+                changed = spread != route.spread_pct
+                route.ticks += 1
+                route.spread_pct = spread
+                route.peak_spread_pct = max(route.peak_spread_pct, spread)
+                route.opportunity = opp
+                if changed:
+                    events.append(self._event(UPDATE, route, now))
+                continue
+
+            if spread < self.open_spread_pct:
+                continue
+            if route is None:
+                route = self.routes[key] = Route(key)
+            elif route.closed_at is not None and now - route.closed_at < self.cooldown_s:
+                self.suppressed += 1
+                continue
+            route.is_open = True
+            route.opened_at = now
+            route.ticks = 1
+            route.spread_pct = route.peak_spread_pct = spread
+            route.opportunity = opp
+            self._open.setdefault(key[2], set()).add(key)
+            self.opened += 1
+            events.append(self._event(OPEN, route, now))
+
+        symbols = [symbol] if symbol is not None else list(self._open)
+        for sym in symbols:
+            for key in list(self._open.get(sym, ())):
+                if key not in seen:
+                    events.append(self._close(self.routes[key], now, 'gone'))
+        return events
+
+    def get(self, buy_from, sell_to, symbol):
+        return self.routes.get((buy_from, sell_to, symbol))
+
+    def has_open(self, symbol=None):
+        if symbol is None:
+            return any(self._open.values())
+        return bool(self._open.get(symbol))
+
+    def open_opportunities(self):
+        return [self.routes[key].opportunity for keys in self._open.values() for key in keys]
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        return [{
+            'buy_from': key[0], 'sell_to': key[1], 'symbol': key[2],
+            'spread_pct': self.routes[key].spread_pct, 'peak_spread_pct': self.routes[key].peak_spread_pct,
+            'ticks': self.routes[key].ticks, 'open_s': round(now - self.routes[key].opened_at, 1)
+        } for keys in self._open.values() for key in keys]
+
+    def stats(self):
+        return {'open': sum(len(keys) for keys in self._open.values()), 'opened': self.opened,
+                'closed': self.closed, 'suppressed': self.suppressed}
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    tracker = OpportunityTracker(open_spread_pct=0.3, close_spread_pct=0.2, cooldown_s=30)
+    spreads = [0.1, 0.35, 0.4, 0.4, 0.25, 0.15, 0.32, 0.33, 0.1, 0.5]
+    for i, spread in enumerate(spreads):
+        opp = {'buy_from': 'coinbase', 'sell_to': 'binance', 'symbol': 'BTC/USD', 'spread_pct': spread}
+        for event in tracker.update([opp], now=i * 10.0, symbol='BTC/USD'):
+            print(f"t={i * 10:>3}s spread {spread}: {event['event']}"
+                  + (f" ({event['reason']}, open {event['duration_s']}s)" if event['event'] == CLOSE else ""))
+    print(tracker.stats())
@@ -0,0 +1,131 @@
+import numpy as np
+from config_loader import load_config
+from cost_model import CostModel
+
+# Multi-symbol, N-exchange scanner. Prices are held as (symbols x exchanges)
+# bid/ask matrices and every buy-here/sell-there spread is computed at once
+# as a (symbols x buy_exchange x sell_exchange) array. Net spreads use each
+# venue's taker fee; the few hits above the threshold are then costed by the
+# shared CostModel (precision, minimums, transfer cost), as the detector does.
+
+
+class OpportunityScanner:
+    def __init__(self, symbols, exchanges, config_path="config/settings.yaml", cost_model=None):
+        self.config = load_config(config_path)
+        self.min_spread_pct = self.config['arbitrage']['min_spread_percentage']
+        self.trade_amount_usd = self.config['trade']['amount_usd']
+        self.costs = cost_model or CostModel.from_config(config_path)
+        self.symbols = list(symbols)
+        self.exchanges = list(exchanges)
+        self._symbol_idx = {s: i for i, s in enumerate(self.symbols)}
+        self._exchange_idx = {e: i for i, e in enumerate(self.exchanges)}
+        # (symbols x exchanges) taker fees, fractions
+        self.taker = np.array([[self.costs.venue(e, s).taker for e in self.exchanges] for s in self.symbols],
+                              dtype=float).reshape(len(self.symbols), len(self.exchanges))
+
+    def empty_matrix(self):
+        shape = (len(self.symbols), len(self.exchanges))
+        return np.full(shape, np.nan), np.full(shape, np.nan)
+
+    def matrix_from_quotes(self, quotes):
+        # quotes as returned by PriceAggregator.fetch_quotes; missing quotes stay NaN
+        bids, asks = self.empty_matrix()
+        for q in quotes:
+            s = self._symbol_idx.get(q['symbol'])
+            e = self._exchange_idx.get(q['exchange'])
+            if s is None or e is None:
+                continue
+            bids[s, e] = q['bid'] if q.get('bid') is not None else q['last']
+            asks[s, e] = q['ask'] if q.get('ask') is not None else q['last']
+        return bids, asks
+
+    def matrix_from_prices(self, prices):
+        # {symbol: {exchange: price}} (e.g. the aligned mid prices) -> bids = asks
+        bids, _ = self.empty_matrix()
+        for symbol, by_exchange in prices.items():
+            s = self._symbol_idx.get(symbol)
+            if s is None:
+                continue
+            for exchange, price in by_exchange.items():
+                e = self._exchange_idx.get(exchange)
+                if e is not None and price is not None:
+                    bids[s, e] = price
+        return bids, bids.copy()
+
+    def spreads(self, bids, asks):
+        # gross[s, i, j]: buy at exchange i's ask, sell at exchange j's bid
+        buy = asks[:, :, None]
+        sell = bids[:, None, :]
+        gross = (sell - buy) / buy * 100
+        fee_factor = (1 - self.taker[:, :, None]) * (1 - self.taker[:, None, :])
+        net = (sell * fee_factor / buy - 1) * 100
+        return gross, net
+
+    def scan(self, bids, asks, top_k=None):
+        bids = np.asarray(bids, dtype=float)
+        asks = np.asarray(asks, dtype=float)
+        gross, net = self.spreads(bids, asks)
+
+        n_ex = len(self.exchanges)
+        same_venue = np.eye(n_ex, dtype=bool)[None, :, :]
+        with np.errstate(invalid='ignore'):
+            mask = (gross >= self.min_spread_pct) & ~same_venue
+        if not mask.any():
+            return None
+
+        s_idx, buy_idx, sell_idx = np.nonzero(mask)
+        net_hits = net[s_idx, buy_idx, sell_idx]
+        order = np.argsort(-net_hits, kind='stable')
+
+        opportunities = []
+        for k in order:
+            s, i, j = s_idx[k], buy_idx[k], sell_idx[k]
+            symbol, buy_ex, sell_ex = self.symbols[s], self.exchanges[i], self.exchanges[j]
+            buy_price, sell_price = float(asks[s, i]), float(bids[s, j])
+            # Same cost model the executor books the trade with
+            profit, _, _, viable = self.costs.evaluate(buy_ex, sell_ex, buy_price, sell_price,
+                                                       self.trade_amount_usd, symbol)
+            if not viable or profit <= 0:
+                continue
+            opportunities.append({
+                'symbol': symbol,
+                'buy_from': buy_ex,
+                'sell_to': sell_ex,
+                'buy_price': buy_price,
+                'sell_price': sell_price,
+                'spread_pct': round(float(gross[s, i, j]), 2),
+                'net_spread_pct': round(float(net_hits[k]), 4),
+                'estimated_profit_usd': round(float(profit), 2)
+            })
+            if top_k is not None and len(opportunities) >= top_k:
+                break
+        return opportunities or None
+
+    def scan_prices(self, prices):
+        # {symbol: {exchange: price}} -> {symbol: opportunities} for the symbols that have any
+        found = {}
+        for opp in self.scan(*self.matrix_from_prices(prices)) or []:
+            found.setdefault(opp['symbol'], []).append(opp)
+        return found
+
+
+# For standalone test
+
+if __name__ == "__main__":
+    scanner = OpportunityScanner(['BTC/USD', 'ETH/USD'], ['coinbase', 'binance', 'kraken'])
+    bids = [[64490, 64790, 64600], [3100, 3095, 3112]]
+    asks = [[64510, 64810, 64620], [3102, 3097, 3114]]
+    for opp in scanner.scan(bids, asks) or []:
+        print(opp)
+
+    # Same opportunities as the per-symbol detector the engine used before
+    from detector import ArbitrageDetector
+    detector = ArbitrageDetector()
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        prices = {'BTC/USD': dict(zip(scanner.exchanges, 64000 * (1 + rng.normal(0, 0.004, 3))))}
+        expected = detector.find_opportunity(prices['BTC/USD'], 'BTC/USD') or []
+        got = scanner.scan_prices(prices).get('BTC/USD', [])
+        key = lambda o: (o['buy_from'], o['sell_to'], o['estimated_profit_usd'])
+        assert sorted(map(key, got)) == sorted(map(key, expected))
+    print("scan_prices matches the detector -> OK")
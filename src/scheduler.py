@@ -0,0 +1,254 @@
+import math
+import time
+from alignment import quote_currency, rate_sources
+from config_loader import load_config
+from exchange_registry import rate_limit_ms
+
+# Adaptive polling. Instead of one fixed poll_interval, each symbol is polled
+# as often as its chance of an opportunity warrants, within every exchange's
+# request budget. The cross-venue spread is treated as a random walk: with
+# gap = threshold - spread and sigma its observed volatility per sqrt(second),
+# P(spread reaches the threshold within t) = erfc(gap / (sigma * sqrt(2t))).
+# A symbol's interval is the t at which that probability reaches
+# target_probability, clamped to [min_interval, max_interval], so polling
+# speeds up near the threshold or when spreads get volatile and backs off in
+# quiet markets. Requests come from per-exchange token buckets refilled at a
+# share of ccxt's rateLimit; when the budget is short, due symbols are served
+# in order of that crossing probability (their expected opportunity value).
+# A symbol quoted in a stablecoin also needs that currency's rate quote in the
+# same poll (e.g. coinbase USDT/USD); the rate request is charged to its
+# exchange's bucket with the symbol and fetched once per poll round.
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate          # requests per second
+        self.capacity = capacity  # requests that can be banked for a burst
+        self.tokens = capacity
+        self.updated = None
+
+    def _refill(self, now):
+        if self.updated is not None and now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        if self.updated is None or now > self.updated:
+            self.updated = now
+
+    def available(self, now):
+        self._refill(now)
+        return self.tokens
+
+    def take(self, now, cost=1.0):
+        self._refill(now)
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def wait_time(self, now, cost=1.0):
+        # Seconds until `cost` requests are available
+        self._refill(now)
+        return 0.0 if self.tokens >= cost else (cost - self.tokens) / self.rate
+
+
+def inverse_erfc(p):
+    # z with erfc(z) = p, by bisection
+    lo, hi = 0.0, 10.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if math.erfc(mid) > p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def best_spread_pct(prices):
+    # Widest gross spread between any two venues, in percent of the cheaper price
+    if len(prices) < 2:
+        return None
+    low, high = min(prices.values()), max(prices.values())
+    return (high - low) / low * 100 if low > 0 else None
+
+
+class SymbolState:
+    __slots__ = ('spread_pct', 'variance', 'observed', 'last_poll', 'next_poll', 'interval', 'polls')
+
+    def __init__(self, interval):
+        self.spread_pct = None
+        self.variance = None  # of the spread, in pct^2 per second
+        self.observed = None
+        self.last_poll = None
+        self.next_poll = float('-inf')
+        self.interval = interval
+        self.polls = 0
+
+
+class PollScheduler:
+    def __init__(self, symbols, threshold_pct, budgets=None, min_interval=1.0, max_interval=30.0,
+                 initial_interval=None, target_probability=0.05, vol_halflife=20, rate_sources=None):
+        self.threshold_pct = threshold_pct
+        self.budgets = budgets or {}  # exchange -> TokenBucket; each poll of a symbol costs one request per exchange
+        self.rate_sources = dict(rate_sources or {})  # (exchange, symbol) -> quote currency it prices
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.target_probability = target_probability
+        self._z = inverse_erfc(target_probability)
+        self._alpha = 1 - 0.5 ** (1 / vol_halflife)  # EWMA weight per observation
+        start = min_interval if initial_interval is None else initial_interval
+        self.symbols = {symbol: SymbolState(start) for symbol in symbols}
+        self.deferred = 0  # due polls pushed back for lack of request budget
+
+    @classmethod
+    def fixed(cls, symbols, interval, threshold_pct=0.0, rate_sources=None):
+        # Every symbol every `interval` seconds, no budget: the original polling loop
+        return cls(symbols, threshold_pct, min_interval=interval, max_interval=interval, rate_sources=rate_sources)
+
+    @classmethod
+    def from_config(cls, config_path="config/settings.yaml"):
+        config = load_config(config_path)
+        polling = config.get('polling', {})
+        symbols = config.get('symbols', ['BTC/USD'])
+        threshold = config['arbitrage']['min_spread_percentage']
+        exchanges = [name for name, ex_config in config['exchanges'].items() if ex_config.get('enabled')]
+        sources = rate_sources(config, exchanges)
+        if not polling.get('adaptive', False):
+            return cls.fixed(symbols, config['poll_interval'], threshold, rate_sources=sources)
+        budgets = {}
+        for name in exchanges:
+            rate = config['exchanges'][name].get('requests_per_s') or \
+                polling.get('budget_fraction', 0.5) * 1000 / rate_limit_ms(name)
+            budgets[name] = TokenBucket(rate, polling.get('burst', 5))
+        return cls(
+            symbols,
+            threshold,
+            budgets=budgets,
+            min_interval=polling.get('min_interval_s', 1.0),
+            max_interval=polling.get('max_interval_s', 30.0),
+            initial_interval=config['poll_interval'],
+            target_probability=polling.get('target_probability', 0.05),
+            vol_halflife=polling.get('vol_halflife', 20),
+            rate_sources=sources
+        )
+
+    def _interval(self, state):
+        if state.spread_pct is None or state.variance is None:
+            return state.interval
+        gap = self.threshold_pct - state.spread_pct
+        if gap <= 0:
+            return self.min_interval
+        if state.variance <= 0:
+            return self.max_interval
+        # erfc(gap / (sigma * sqrt(2t))) = target  ->  t = (gap / (sigma * z))^2 / 2
+        t = (gap / (math.sqrt(state.variance) * self._z)) ** 2 / 2
+        return min(self.max_interval, max(self.min_interval, t))
+
+    def crossing_probability(self, symbol, now):
+        # Chance the spread has reached the threshold since the symbol was last polled
+        state = self.symbols[symbol]
+        if state.spread_pct is None or state.variance is None or state.last_poll is None:
+            return 1.0
+        gap = self.threshold_pct - state.spread_pct
+        if gap <= 0:
+            return 1.0
+        elapsed = now - state.last_poll
+        if elapsed <= 0 or state.variance <= 0:
+            return 0.0
+        return math.erfc(gap / math.sqrt(2 * state.variance * elapsed))
+
+    def due(self, now=None):
+        # Symbols to poll now, most valuable first, as far as every exchange has budget
+        return self.plan(now)[0]
+
+    def plan(self, now=None):
+        # (symbols, rate pairs) to poll now. The (exchange, symbol) rate pairs are the
+        # rate sources of the due symbols' quote currencies, charged with the first symbol needing them.
+        now = time.monotonic() if now is None else now
+        ready = [symbol for symbol, state in self.symbols.items() if state.next_poll <= now]
+        if len(ready) > 1:
+            ready.sort(key=lambda symbol: self.crossing_probability(symbol, now), reverse=True)
+        polled, rate_pairs = [], []
+        for symbol in ready:
+            currency = quote_currency(symbol)
+            pairs = [pair for pair, source_currency in self.rate_sources.items()
+                     if source_currency == currency and pair not in rate_pairs]
+            cost = {exchange: 1 + sum(1 for name, _ in pairs if name == exchange) for exchange in self.budgets}
+            if any(bucket.available(now) < cost[exchange] for exchange, bucket in self.budgets.items()):
+                self.deferred += len(ready) - len(polled)
+                break
+            for exchange, bucket in self.budgets.items():
+                bucket.take(now, cost[exchange])
+            state = self.symbols[symbol]
+            state.last_poll = now
+            state.next_poll = now + state.interval
+            state.polls += 1
+            polled.append(symbol)
+            rate_pairs += pairs
+        return polled, rate_pairs
+
+    def observe(self, symbol, prices, now=None):
+        # Fresh prices of a polled symbol -> new spread / volatility estimate and interval
+        now = time.monotonic() if now is None else now
+        state = self.symbols[symbol]
+        spread = best_spread_pct(prices)
+        if spread is None:
+            return state.interval
+        if state.spread_pct is not None and now > state.observed:
+            sample = (spread - state.spread_pct) ** 2 / (now - state.observed)
+            state.variance = sample if state.variance is None else state.variance + self._alpha * (sample - state.variance)
+        state.spread_pct = spread
+        state.observed = now
+        state.interval = self._interval(state)
+        if state.last_poll is not None:
+            state.next_poll = state.last_poll + state.interval
+        return state.interval
+
+    def sleep_time(self, now=None):
+        # Until the next symbol is due, or until the budget allows a poll that is already due
+        now = time.monotonic() if now is None else now
+        if not self.symbols:
+            return self.max_interval
+        next_due = min(state.next_poll for state in self.symbols.values())
+        if next_due > now:
+            return next_due - now
+        return max((bucket.wait_time(now) for bucket in self.budgets.values()), default=0.0)
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {
+            'symbols': {symbol: {'interval_s': round(state.interval, 2),
+                                 'spread_pct': None if state.spread_pct is None else round(state.spread_pct, 4),
+                                 'sigma': None if state.variance is None else round(math.sqrt(state.variance), 5),
+                                 'polls': state.polls}
+                        for symbol, state in self.symbols.items()},
+            'budget': {exchange: round(bucket.available(now), 2) for exchange, bucket in self.budgets.items()},
+            'deferred': self.deferred
+        }
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    scheduler = PollScheduler(['BTC/USD', 'ETH/USD'], threshold_pct=0.3,
+                              budgets={'coinbase': TokenBucket(2, 2), 'binance': TokenBucket(2, 2)},
+                              min_interval=0.5, max_interval=30, initial_interval=5)
+    spreads = {'BTC/USD': [0.05, 0.06, 0.05, 0.05, 0.06, 0.05], 'ETH/USD': [0.1, 0.18, 0.15, 0.24, 0.27, 0.31]}
+    now = 0.0
+    for step in range(6):
+        for symbol in scheduler.due(now):
+            spread = spreads[symbol][min(step, 5)]
+            interval = scheduler.observe(symbol, {'coinbase': 100.0, 'binance': 100.0 * (1 + spread / 100)}, now)
+            print(f"t={now:5.1f}s {symbol} spread {spread:.2f}% -> next poll in {interval:.1f}s")
+        now += scheduler.sleep_time(now)
+    print(scheduler.stats(now))
+
+    # A USDT-quoted symbol brings its rate quote along, charged to the rate exchange's bucket
+    scheduler = PollScheduler(['BTC/USD', 'ETH/USD', 'BTC/USDT'], threshold_pct=0.3,
+                              budgets={'coinbase': TokenBucket(1, 4), 'binance': TokenBucket(1, 4)},
+                              rate_sources={('coinbase', 'USDT/USD'): 'USDT'})
+    symbols, rate_pairs = scheduler.plan(0.0)
+    assert rate_pairs == [('coinbase', 'USDT/USD')] and 'BTC/USDT' in symbols, (symbols, rate_pairs)
+    assert scheduler.budgets['coinbase'].tokens == 4 - len(symbols) - 1
+    assert PollScheduler(['BTC/USD'], 0.3, rate_sources=scheduler.rate_sources).plan(0.0) == (['BTC/USD'], [])
+    print(f"polled {symbols} with rate {rate_pairs}, coinbase budget left {scheduler.budgets['coinbase'].tokens}")
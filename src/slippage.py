@@ -0,0 +1,72 @@
+import numpy as np
+
+# Order book fill simulation. A side of the book is (prices, sizes) in the
+# order a taker walks it. Cumulative quantity/notional arrays make the cost of
+# any fill size a piecewise-linear interpolation, so fills and the
+# profit-maximizing size are computed without a Python loop over levels.
+
+
+def cumulative(prices, sizes):
+    qty = np.concatenate(([0.0], np.cumsum(sizes)))
+    notional = np.concatenate(([0.0], np.cumsum(prices * sizes)))
+    return qty, notional
+
+
+def _profit_at(qty, ask_cum, bid_cum, buy_fee, sell_fee):
+    # Same fee model as TradeExecutor: fee taken in BTC on the buy, in USD on the sell
+    a_qty, a_cost = ask_cum
+    b_qty, b_proceeds = bid_cum
+    cost = np.interp(qty, a_qty, a_cost)
+    proceeds = np.interp(qty * (1 - buy_fee), b_qty, b_proceeds)
+    return proceeds * (1 - sell_fee) - cost, cost, proceeds
+
+
+def simulate_fill(asks, bids, amount_usd, fee_pct, sell_fee_pct=None, qty=None):
+    # Buy up to amount_usd walking the asks (or exactly qty base units, e.g. rounded
+    # to a lot size), sell what was bought walking the bids. Size is cut to what both
+    # books can absorb, which makes it a partial fill. sell_fee_pct defaults to fee_pct.
+    buy_fee = fee_pct / 100
+    sell_fee = buy_fee if sell_fee_pct is None else sell_fee_pct / 100
+    ask_cum = cumulative(*asks)
+    bid_cum = cumulative(*bids)
+    max_qty = min(ask_cum[0][-1], bid_cum[0][-1] / (1 - buy_fee))
+    if qty is None:
+        qty = float(np.interp(amount_usd, ask_cum[1], ask_cum[0]))
+    qty = min(qty, max_qty)
+    if qty <= 0:
+        return None
+
+    profit, cost, proceeds = (float(x) for x in _profit_at(qty, ask_cum, bid_cum, buy_fee, sell_fee))
+    sold = qty * (1 - buy_fee)
+    buy_vwap = cost / qty
+    sell_vwap = proceeds / sold
+    top_ask, top_bid = float(asks[0][0]), float(bids[0][0])
+    return {
+        'qty': qty,
+        'cost_usd': cost,
+        'buy_vwap': buy_vwap,
+        'sell_vwap': sell_vwap,
+        'profit_usd': profit,
+        'fees_usd': qty * buy_fee * buy_vwap + proceeds * sell_fee,
+        'fill_ratio': cost / amount_usd if amount_usd else 0.0,
+        'slippage_usd': (buy_vwap - top_ask) * qty + (top_bid - sell_vwap) * sold
+    }
+
+
+def optimal_size(asks, bids, fee_pct, max_usd, sell_fee_pct=None):
+    # Net profit is concave in size and only bends at level boundaries, so the
+    # peak is at one of those breakpoints (or the max_usd cap).
+    buy_fee = fee_pct / 100
+    sell_fee = buy_fee if sell_fee_pct is None else sell_fee_pct / 100
+    ask_cum = cumulative(*asks)
+    bid_cum = cumulative(*bids)
+    max_qty = min(float(np.interp(max_usd, ask_cum[1], ask_cum[0])),
+                  ask_cum[0][-1], bid_cum[0][-1] / (1 - buy_fee))
+    if max_qty <= 0:
+        return 0.0, 0.0
+
+    candidates = np.concatenate((ask_cum[0], bid_cum[0] / (1 - buy_fee), [max_qty]))
+    candidates = candidates[(candidates > 0) & (candidates <= max_qty)]
+    profit, cost, _ = _profit_at(candidates, ask_cum, bid_cum, buy_fee, sell_fee)
+    best = int(np.argmax(profit))
+    return float(cost[best]), float(profit[best])
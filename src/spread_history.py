@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+# Bounded spread history for dashboards. Each exchange pair keeps three
+# fixed-capacity NumPy ring buffers, RRD style: raw samples plus 1 minute and
+# 1 hour rollups (mean/min/max). Memory is fixed at construction, appends are
+# O(1), and readers pull only what was appended since their last cursor.
+
+POINT_DTYPE = np.dtype([
+    ('ts', '<f8'),      # epoch seconds (bucket start for rollups)
+    ('mean', '<f8'),
+    ('min', '<f8'),
+    ('max', '<f8'),
+    ('count', '<u4')
+])
+
+# Resolution -> rollup period in seconds (None = raw samples)
+RESOLUTIONS = {'raw': None, '1m': 60, '1h': 3600}
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=POINT_DTYPE):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.total = 0  # appends ever made; doubles as a reader cursor
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, row):
+        self.data[self.total % self.capacity] = row
+        self.total += 1
+
+    def since(self, cursor=0):
+        # Records appended after `cursor` (oldest first); anything already overwritten is skipped
+        start = max(cursor, self.total - self.capacity)
+        if start >= self.total:
+            return self.data[:0]
+        i, j = start % self.capacity, self.total % self.capacity
+        if i < j:
+            return self.data[i:j].copy()
+        return np.concatenate((self.data[i:], self.data[:j]))
+
+    def view(self):
+        return self.since(0)
+
+
+class _Rollup:
+    # Consolidates samples into fixed-period buckets; a bucket is appended once it closes
+    def __init__(self, period, capacity):
+        self.period = period
+        self.buffer = RingBuffer(capacity)
+        self.bucket = None
+        self.sum = 0.0
+        self.count = 0
+        self.min = 0.0
+        self.max = 0.0
+
+    def add(self, ts, value):
+        bucket = ts - ts % self.period
+        if bucket != self.bucket:
+            if self.count:
+                self.buffer.append((self.bucket, self.sum / self.count, self.min, self.max, self.count))
+            self.bucket, self.sum, self.count, self.min, self.max = bucket, 0.0, 0, value, value
+        self.sum += value
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+
+
+class SpreadHistory:
+    def __init__(self, raw_capacity=3600, minute_capacity=10080, hour_capacity=8760):
+        self.raw_capacity = raw_capacity
+        self.minute_capacity = minute_capacity
+        self.hour_capacity = hour_capacity
+        self._raw = {}       # pair -> RingBuffer
+        self._rollups = {}   # pair -> {resolution: _Rollup}
+
+    def _add_pair(self, pair):
+        self._raw[pair] = RingBuffer(self.raw_capacity)
+        self._rollups[pair] = {
+            '1m': _Rollup(RESOLUTIONS['1m'], self.minute_capacity),
+            '1h': _Rollup(RESOLUTIONS['1h'], self.hour_capacity)
+        }
+
+    @property
+    def pairs(self):
+        return list(self._raw)
+
+    def append(self, pair, ts, spread_pct):
+        if pair not in self._raw:
+            self._add_pair(pair)
+        self._raw[pair].append((ts, spread_pct, spread_pct, spread_pct, 1))
+        for rollup in self._rollups[pair].values():
+            rollup.add(ts, spread_pct)
+
+    def buffer(self, pair, resolution='raw'):
+        if resolution == 'raw':
+            return self._raw[pair]
+        return self._rollups[pair][resolution].buffer
+
+    def since(self, resolution='raw', cursors=None):
+        # Wide frame (timestamp index, one column per pair) of points newer than
+        # the given per-pair cursors, plus the advanced cursors
+        cursors = dict(cursors or {})
+        frames = []
+        for pair in self._raw:
+            buffer = self.buffer(pair, resolution)
+            points = buffer.since(cursors.get(pair, 0))
+            cursors[pair] = buffer.total
+            if len(points):
+                index = pd.to_datetime(points['ts'], unit='s')
+                frames.append(pd.Series(points['mean'], index=index, name=pair))
+        if not frames:
+            return pd.DataFrame(), cursors
+        frame = frames[0].to_frame() if len(frames) == 1 else pd.concat(frames, axis=1).sort_index()
+        return frame, cursors
+
+    def frame(self, resolution='raw'):
+        return self.since(resolution)[0]
+
+    def capacity(self, resolution='raw'):
+        return {'raw': self.raw_capacity, '1m': self.minute_capacity, '1h': self.hour_capacity}[resolution]
+
+    def nbytes(self):
+        total = 0
+        for pair in self._raw:
+            total += self._raw[pair].data.nbytes
+            total += sum(r.buffer.data.nbytes for r in self._rollups[pair].values())
+        return total
+
+
+class ChartFeed:
+    # Keeps a dashboard line chart in step with a SpreadHistory. The full frame is drawn
+    # once (again on a resolution change, a new pair, or once the chart would hold twice
+    # what the ring buffer does); otherwise only new points go out, via add_rows.
+    def __init__(self, history):
+        self.history = history
+        self.chart = None
+        self.resolution = None
+        self.columns = None
+        self.rows = 0
+        self._cursors = {}
+
+    def update(self, slot, resolution='raw'):
+        # slot: a Streamlit placeholder (st.empty()); returns the number of new points
+        if resolution != self.resolution:
+            return self._redraw(slot, resolution)
+        new_points, cursors = self.history.since(resolution, self._cursors)
+        if not len(new_points):
+            return 0
+        if self.chart is None or list(new_points.columns) != self.columns \
+                or self.rows + len(new_points) > 2 * self.history.capacity(resolution):
+            return self._redraw(slot, resolution)
+        self._cursors = cursors
+        self.chart.add_rows(new_points)
+        self.rows += len(new_points)
+        return len(new_points)
+
+    def _redraw(self, slot, resolution):
+        frame, self._cursors = self.history.since(resolution)
+        self.resolution = resolution
+        if not len(frame):
+            self.chart = None
+            return 0
+        self.chart = slot.line_chart(frame)
+        self.columns = list(frame.columns)
+        self.rows = len(frame)
+        return len(frame)
+
+
+def from_config(config):
+    history_config = config.get('spread_history', {})
+    return SpreadHistory(
+        raw_capacity=history_config.get('raw_capacity', 3600),
+        minute_capacity=history_config.get('minute_capacity', 10080),
+        hour_capacity=history_config.get('hour_capacity', 8760)
+    )
+
+
+# For standalone testing
+
+if __name__ == "__main__":
+    history = SpreadHistory(raw_capacity=100, minute_capacity=50, hour_capacity=10)
+    for i in range(10_000):
+        history.append('binance-coinbase', 1_700_000_000 + i * 5, np.sin(i / 50))
+    print(f"raw: {len(history.buffer('binance-coinbase'))} points, "
+          f"1m: {len(history.buffer('binance-coinbase', '1m'))}, "
+          f"1h: {len(history.buffer('binance-coinbase', '1h'))}, {history.nbytes()} bytes")
+    print(history.frame('1h'))
+
+    class _Slot:
+        # Stand-in for a Streamlit placeholder / chart element
+        def __init__(self):
+            self.sent = []
+
+        def line_chart(self, frame):
+            self.sent.append(('draw', len(frame)))
+            return self
+
+        def add_rows(self, frame):
+            self.sent.append(('add', len(frame)))
+
+    slot, feed = _Slot(), ChartFeed(history)
+    feed.update(slot)
+    for i in range(10_000, 10_130):
+        history.append('binance-coinbase', 1_700_000_000 + i * 5, 0.1)
+        feed.update(slot)
+    feed.update(slot, '1m')
+    print(slot.sent[:3], f"... {len(slot.sent)} updates, {sum(n for kind, n in slot.sent if kind == 'draw')} rows redrawn")
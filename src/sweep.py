@@ -0,0 +1,125 @@
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from backtest_engine import simulate, summarize
+from config_loader import load_config
+
+# Parameter sweep: every (market, min_spread, fee, amount) combination is
+# backtested on a process pool. Close prices are placed in shared memory once
+# and workers map them directly instead of receiving pickled DataFrames.
+
+# Worker-side: market name -> (SharedMemory, price_a, price_b)
+_WORKER_MARKETS = {}
+
+
+def _attach(specs):
+    # Process pool initializer: map every market's price block once per worker
+    for name, (shm_name, n) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        prices = np.ndarray((2, n), dtype=np.float64, buffer=shm.buf)
+        _WORKER_MARKETS[name] = (shm, prices[0], prices[1])
+
+
+def _run_combo(combo):
+    market, min_spread_pct, fee_pct, amount_usd, initial_usd = combo
+    _, price_a, price_b = _WORKER_MARKETS[market]
+    result = simulate(price_a, price_b, min_spread_pct, fee_pct, amount_usd, initial_usd)
+    summary = summarize(result, initial_usd)
+    return {
+        'market': market,
+        'min_spread_pct': min_spread_pct,
+        'fee_pct': fee_pct,
+        'amount_usd': amount_usd,
+        **summary
+    }
+
+
+def share_markets(markets):
+    # markets: {name: merged DataFrame with close_coinbase / close_binance}
+    blocks, specs = [], {}
+    for name, merged in markets.items():
+        n = len(merged)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * n * 8))
+        prices = np.ndarray((2, n), dtype=np.float64, buffer=shm.buf)
+        prices[0] = merged['close_coinbase'].to_numpy(dtype=float)
+        prices[1] = merged['close_binance'].to_numpy(dtype=float)
+        blocks.append(shm)
+        specs[name] = (shm.name, n)
+    return blocks, specs
+
+
+def run_sweep(markets, min_spreads, fees, amounts, initial_usd=10000, workers=None):
+    combos = [
+        (market, spread, fee, amount, initial_usd)
+        for market, spread, fee, amount in itertools.product(markets, min_spreads, fees, amounts)
+    ]
+    blocks, specs = share_markets(markets)
+    try:
+        workers = workers or os.cpu_count()
+        chunksize = max(1, len(combos) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs,)) as pool:
+            rows = list(pool.map(_run_combo, combos, chunksize=chunksize))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows)
+    return results.sort_values('total_profit', ascending=False, ignore_index=True)
+
+
+def load_markets(config):
+    # One aligned close series per configured market, read through the OHLCV cache
+    from backtester import fetch_historical_prices, merge_exchanges
+    from ohlcv_cache import OHLCVCache
+    from exchange_registry import get_exchange
+
+    bt_config = config.get('backtest', {})
+    sweep_config = config.get('sweep', {})
+    cache = OHLCVCache(bt_config['cache_dir']) if bt_config.get('cache_dir') else None
+    offline = bt_config.get('offline', False)
+    since_minutes = sweep_config.get('since_minutes', 129600)
+    coinbase = get_exchange('coinbase')
+    binanceus = get_exchange('binance')
+
+    markets = {}
+    for market in sweep_config.get('markets', []):
+        df_cb = fetch_historical_prices(coinbase, market['coinbase'], since_minutes=since_minutes,
+                                        cache=cache, offline=offline)
+        df_bn = fetch_historical_prices(binanceus, market['binance'], since_minutes=since_minutes,
+                                        cache=cache, offline=offline)
+        if df_cb.empty or df_bn.empty:
+            print(f"Skipping {market['name']}: missing data")
+            continue
+        markets[market['name']], _ = merge_exchanges(
+            {'coinbase': df_cb, 'binance': df_bn},
+            {'coinbase': market['coinbase'], 'binance': market['binance']},
+            config, since_minutes, cache=cache, offline=offline)
+    return markets
+
+
+if __name__ == "__main__":
+    config = load_config()
+    sweep_config = config.get('sweep', {})
+    markets = load_markets(config)
+    if not markets:
+        print("No market data to sweep.")
+        sys.exit(1)
+
+    results = run_sweep(
+        markets,
+        min_spreads=sweep_config.get('min_spread_percentage', [config['arbitrage']['min_spread_percentage']]),
+        fees=sweep_config.get('fee_percentage', [config['trade']['fee_percentage']]),
+        amounts=sweep_config.get('amount_usd', [config['trade']['amount_usd']]),
+        initial_usd=config['trade'].get('initial_usd', 10000),
+        workers=sweep_config.get('workers')
+    )
+    print(results.to_string(index=False))
+    results_path = sweep_config.get('results_path', 'data/benchmarks/sweep_results.csv')
+    os.makedirs(os.path.dirname(results_path) or '.', exist_ok=True)
+    results.to_csv(results_path, index=False)
+    print(f"Sweep results saved to {results_path}")
@@ -1,2 +1,2 @@
-from ccxt import binance
-print(binance().fetch_ticker('BTC/USDT'))
\ No newline at end of file
+from exchange_registry import get_exchange
+print(get_exchange('binance').fetch_ticker('BTC/USDT'))
\ No newline at end of file
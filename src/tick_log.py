@@ -0,0 +1,244 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+from detector import ArbitrageDetector
+from executor import TradeExecutor
+from opportunity_tracker import OPEN, OpportunityTracker
+
+# Tick-level record/replay. Every quote is one fixed-size binary record
+# (43 bytes) appended to a log file; exchange and symbol names are stored once
+# in a JSON sidecar and referenced by id. Replay reads the log as a np.memmap
+# and drives ArbitrageDetector/TradeExecutor with the recorded spacing, scaled
+# by a speed factor, or as fast as possible.
+
+TICK_DTYPE = np.dtype([
+    ('ts', '<f8'),        # local receive time, epoch seconds
+    ('exchange', 'u1'),
+    ('symbol', '<u2'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('bid_size', '<f8'),
+    ('ask_size', '<f8')
+])
+
+
+def _names_path(path):
+    return path + ".json"
+
+
+def _value(x):
+    return float('nan') if x is None else float(x)
+
+
+class TickRecorder:
+    def __init__(self, path, flush_every=1000):
+        self.path = path
+        self.flush_every = flush_every
+        self.exchanges = []
+        self.symbols = []
+        self._exchange_ids = {}
+        self._symbol_ids = {}
+        self._buffer = []
+        self.recorded = 0
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        if os.path.exists(_names_path(path)):
+            # Appending to an existing log keeps its ids
+            with open(_names_path(path), 'r') as f:
+                names = json.load(f)
+            self.exchanges, self.symbols = names['exchanges'], names['symbols']
+            self._exchange_ids = {name: i for i, name in enumerate(self.exchanges)}
+            self._symbol_ids = {name: i for i, name in enumerate(self.symbols)}
+        if os.path.exists(path) and os.path.getsize(path) % TICK_DTYPE.itemsize:
+            # A crash mid-write left a partial record; drop it before appending
+            with open(path, 'r+b') as f:
+                f.truncate(os.path.getsize(path) // TICK_DTYPE.itemsize * TICK_DTYPE.itemsize)
+        self._file = open(path, 'ab')
+
+    def _id(self, name, ids, names):
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(names)
+            names.append(name)
+            # Names are written before any record that refers to them
+            with open(_names_path(self.path), 'w') as f:
+                json.dump({'exchanges': self.exchanges, 'symbols': self.symbols}, f)
+        return i
+
+    def record_top(self, exchange, symbol, bid, ask, bid_size=None, ask_size=None, ts=None):
+        self._buffer.append((
+            time.time() if ts is None else ts,
+            self._id(exchange, self._exchange_ids, self.exchanges),
+            self._id(symbol, self._symbol_ids, self.symbols),
+            _value(bid), _value(ask), _value(bid_size), _value(ask_size)
+        ))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def record(self, quote):
+        # quote: aggregator.to_quote() dict
+        self.record_top(quote['exchange'], quote['symbol'], quote['bid'], quote['ask'],
+                        quote.get('bid_size'), quote.get('ask_size'), quote['recv_ts'])
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(np.array(self._buffer, dtype=TICK_DTYPE).tobytes())
+            self._file.flush()
+            self.recorded += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def load_ticks(path):
+    # (records memmap, exchange names, symbol names)
+    with open(_names_path(path), 'r') as f:
+        names = json.load(f)
+    size = os.path.getsize(path)
+    count = size // TICK_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=TICK_DTYPE), names['exchanges'], names['symbols']
+    # A partial trailing record (crash mid-write) is ignored
+    records = np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(count,))
+    return records, names['exchanges'], names['symbols']
+
+
+class TickReplayer:
+    def __init__(self, path, detector=None, executor=None, config_path="config/settings.yaml", tracker=None):
+        self.path = path
+        self.records, self.exchanges, self.symbols = load_ticks(path)
+        self.detector = detector or ArbitrageDetector(config_path)
+        # Same route lifecycle as the engine, driven by the recorded timestamps
+        self.tracker = tracker or OpportunityTracker.from_config(config_path)
+        self.detector.min_spread_pct = min(self.detector.min_spread_pct, self.tracker.close_spread_pct)
+        self._state_dir = None
+        if executor is None:
+            # Fresh executor with throwaway state so replays never touch the live journal;
+            # the directory is removed by close()
+            self._state_dir = tempfile.TemporaryDirectory(prefix="replay-")
+            executor = TradeExecutor(
+                trade_amount_usd=self.detector.trade_amount_usd,
+                fee_pct=self.detector.fee_pct,
+                state_file=os.path.join(self._state_dir.name, "trade_state.json"),
+                cost_model=self.detector.costs
+            )
+        self.executor = executor
+
+    def replay(self, speed=None, limit=None):
+        # speed: None/0 = max speed, 1.0 = recorded (wall-clock) spacing, 10.0 = 10x faster
+        records = self.records[:limit] if limit else self.records
+        n = len(records)
+        # Plain lists are much faster to iterate than numpy scalars
+        ts = records['ts'].tolist()
+        exchange_ids = records['exchange'].tolist()
+        symbol_ids = records['symbol'].tolist()
+        bids = records['bid'].tolist()
+        asks = records['ask'].tolist()
+
+        tops = {symbol: {} for symbol in self.symbols}
+        find = self.detector.find_book_opportunity
+        track = self.tracker.update
+        execute = self.executor.execute
+        start_balance = self.executor.usd_balance
+        opportunities = opened = trades = 0
+        max_lag = 0.0
+
+        start = time.monotonic()
+        t0 = ts[0] if n else 0.0
+        for i in range(n):
+            if speed:
+                # Deterministic schedule: event i is due at its recorded offset / speed
+                wait = (ts[i] - t0) / speed - (time.monotonic() - start)
+                if wait > 0:
+                    time.sleep(wait)
+                elif -wait > max_lag:
+                    max_lag = -wait
+
+            bid, ask = bids[i], asks[i]
+            if bid != bid or ask != ask:  # NaN: side missing from this quote
+                continue
+            symbol = self.symbols[symbol_ids[i]]
+            book_tops = tops[symbol]
+            book_tops[self.exchanges[exchange_ids[i]]] = (bid, ask)
+            opps = find(book_tops, symbol=symbol)
+            if opps:
+                opportunities += len(opps)
+            if opps or self.tracker.has_open(symbol):
+                for event in track(opps, ts[i], symbol):
+                    if event['event'] == OPEN:
+                        opened += 1
+                        if execute([event['opportunity']]):
+                            trades += 1
+        elapsed = time.monotonic() - start
+
+        return {
+            'events': n,
+            'elapsed_sec': elapsed,
+            'events_per_sec': n / elapsed if elapsed > 0 else float('inf'),
+            'recorded_span_sec': ts[-1] - t0 if n else 0.0,
+            'max_lag_ms': max_lag * 1000,
+            'opportunities': opportunities,
+            'routes_opened': opened,
+            'trades': trades,
+            'total_profit': round(self.executor.usd_balance - start_balance, 2),
+            'final_balance': self.executor.get_balance()
+        }
+
+    def close(self):
+        self.executor.close()
+        if self._state_dir is not None:
+            self._state_dir.cleanup()
+            self._state_dir = None
+
+
+def session_path(directory="data/ticks"):
+    return os.path.join(directory, datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S") + ".ticks")
+
+
+USAGE = """usage:
+  python tick_log.py record [seconds]              record aggregator quotes
+  python tick_log.py replay <file> [speed|max]     replay through detector + executor"""
+
+if __name__ == "__main__":
+    from config_loader import load_config
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('record', 'replay') or (command == 'replay' and len(sys.argv) < 3):
+        print(USAGE, file=sys.stderr)
+        sys.exit(2)
+
+    config = load_config()
+    if command == 'record':
+        from aggregator import PriceAggregator
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else float('inf')
+        recorder = TickRecorder(session_path(config.get('recorder', {}).get('dir', 'data/ticks')))
+        aggregator = PriceAggregator()
+        aggregator.recorder = recorder
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < duration:
+                aggregator.fetch_quotes_concurrent()
+                time.sleep(aggregator.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            recorder.close()
+            aggregator.close()
+        print(f"Recorded {recorder.recorded} quotes to {recorder.path}")
+    else:
+        path = sys.argv[2]
+        speed_arg = sys.argv[3] if len(sys.argv) > 3 else 'max'
+        speed = None if speed_arg == 'max' else float(speed_arg)
+        replayer = TickReplayer(path)
+        report = replayer.replay(speed=speed)
+        replayer.close()
+        for key, value in report.items():
+            print(f"{key}: {value}")
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+
+# Append-only trade persistence. Every trade is one JSON line in the journal;
+# the snapshot file only holds the running totals and the journal position
+# they cover, so neither write grows with the size of the history. Startup
+# reads the snapshot and parses only the journal tail after its offset; the
+# full trade list is read on demand (history()). Each line is flushed to the OS as it is written (a killed process loses nothing);
+# fsyncs are batched by count, and a timer fsyncs the tail of a burst within
+# fsync_interval even when no further trade comes in.
+
+
+class TradeJournal:
+    def __init__(self, state_file="state/trade_state.json", journal_file=None,
+                 fsync_every=100, fsync_interval=1.0, snapshot_every=1000):
+        self.state_file = state_file
+        self.journal_file = journal_file or os.path.join(os.path.dirname(state_file), "trade_journal.jsonl")
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self._snapshot_seq = 0
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+        self._fh = None
+        self._lock = threading.Lock()  # the fsync timer runs on its own thread
+        self._timer = None
+
+    def exists(self):
+        return os.path.exists(self.state_file) or os.path.exists(self.journal_file)
+
+    def _open(self):
+        if self._fh is None:
+            dirname = os.path.dirname(self.journal_file)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._fh = open(self.journal_file, 'a', encoding='utf-8')
+        return self._fh
+
+    def load(self):
+        # Returns {'usd_balance', 'total_fees'} or None if nothing is stored
+        if not self.exists():
+            return None
+
+        snapshot = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                snapshot = json.load(f)
+
+        if 'trade_history' in snapshot:
+            return self._migrate(snapshot)
+
+        usd_balance = snapshot.get('usd_balance', 10000)
+        total_fees = snapshot.get('total_fees', 0.0)
+        self._snapshot_seq = snapshot.get('last_seq', 0)
+        offset = snapshot.get('journal_offset', 0)
+
+        self.seq = self._snapshot_seq
+        if os.path.exists(self.journal_file):
+            size = os.path.getsize(self.journal_file)
+            if offset > size:
+                # Journal shorter than the snapshot says: replay it all
+                offset = 0
+            good_bytes = offset
+            with open(self.journal_file, 'rb') as f:
+                # Totals up to the snapshot are in the snapshot; replay only the tail after it
+                f.seek(offset)
+                for raw in f:
+                    try:
+                        entry = json.loads(raw)
+                    except ValueError:
+                        break  # torn final line from a crash mid-write
+                    good_bytes += len(raw)
+                    if entry['seq'] > self._snapshot_seq:
+                        usd_balance = entry['usd_balance']
+                        total_fees = entry['total_fees']
+                        self.seq = entry['seq']
+            if good_bytes < size:
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good_bytes)
+
+        return {'usd_balance': usd_balance, 'total_fees': total_fees}
+
+    def history(self):
+        # Every journaled trade, oldest first. Reads the whole journal, so it is
+        # only called when the full history is actually needed.
+        trades = []
+        if os.path.exists(self.journal_file):
+            with self._lock:
+                if self._fh is not None:
+                    self._fh.flush()
+            with open(self.journal_file, 'rb') as f:
+                for raw in f:
+                    try:
+                        trades.append(json.loads(raw)['trade'])
+                    except ValueError:
+                        break
+        return trades
+
+    def _migrate(self, state):
+        # Old format: the whole history inside trade_state.json. Move it into the journal once.
+        usd_balance = state.get('usd_balance', 10000)
+        total_fees = state.get('total_fees', 0.0)
+        history = state.get('trade_history', [])
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        fh = self._open()
+        running_fees = 0.0
+        for trade in history:
+            self.seq += 1
+            running_fees += trade.get('fees_paid_usd', 0.0)
+            fh.write(json.dumps({'seq': self.seq, 'trade': trade,
+                                 'usd_balance': trade.get('balance_usd', usd_balance),
+                                 'total_fees': running_fees}) + "\n")
+        self.sync()
+        self.snapshot(usd_balance, total_fees)
+        return {'usd_balance': usd_balance, 'total_fees': total_fees}
+
+    def append(self, trade, usd_balance, total_fees):
+        with self._lock:
+            self.seq += 1
+            fh = self._open()
+            fh.write(json.dumps({'seq': self.seq, 'trade': trade,
+                                 'usd_balance': usd_balance, 'total_fees': total_fees}) + "\n")
+            fh.flush()
+            self._pending += 1
+
+            # Batch fsyncs by count or age instead of paying one per trade
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self._sync_pending)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.seq - self._snapshot_seq >= self.snapshot_every:
+            self.snapshot(usd_balance, total_fees)
+
+    def _sync_pending(self):
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                self._sync()
+
+    def _sync(self):
+        if self._fh is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def snapshot(self, usd_balance, total_fees):
+        # Small fixed-size state written atomically: temp file, fsync, rename
+        self.sync()
+        offset = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        state = {
+            'usd_balance': usd_balance,
+            'total_fees': total_fees,
+            'last_seq': self.seq,
+            'journal_offset': offset
+        }
+        dirname = os.path.dirname(self.state_file)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_file)
+        self._snapshot_seq = self.seq
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._fh is not None:
+            self.sync()
+            self._fh.close()
+            self._fh = None
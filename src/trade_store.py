@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+
+# Columnar trade history. Trades live in typed NumPy columns (timestamps as
+# int64 epoch microseconds, venues as small integer codes) instead of a list
+# of dicts, with per-day running aggregates kept up to date on every append.
+
+PRICE_COLUMNS = ['buy_price', 'sell_price', 'amount_usd', 'profit_usd', 'balance_usd', 'fees_paid_usd']
+FILL_COLUMNS = ['fill_ratio', 'slippage_usd']  # depth-walked trades only; NaN otherwise
+FLOAT_COLUMNS = PRICE_COLUMNS + FILL_COLUMNS
+FIELDS = ['timestamp', 'buy_from', 'sell_to'] + FLOAT_COLUMNS
+US_PER_DAY = 86_400_000_000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = EPOCH.toordinal()
+ONE_US = timedelta(microseconds=1)
+
+
+def to_epoch_us(timestamp):
+    # ISO string or datetime (pandas Timestamps included) -> int64 microseconds; naive
+    # times are taken as UTC. Integer arithmetic, so the round trip is exact.
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int((timestamp - EPOCH) // ONE_US)
+
+
+def from_epoch_us(us):
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+class TradeView:
+    # Lightweight read-only view of one stored trade; supports trade['field'] like the old dicts
+    __slots__ = ('_store', '_i')
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    def __getitem__(self, key):
+        return self._store.field(key, self._i)
+
+    def get(self, key, default=None):
+        return self[key] if key in FIELDS else default
+
+    def keys(self):
+        return list(FIELDS)
+
+    def to_dict(self):
+        return {key: self[key] for key in FIELDS}
+
+    def __repr__(self):
+        return f"TradeView({self.to_dict()})"
+
+
+class DayStats:
+    __slots__ = ('pnl', 'fees', 'wins', 'losses', 'count', 'first', 'last')
+
+    def __init__(self, first):
+        self.pnl = 0.0
+        self.fees = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.count = 0
+        self.first = first
+        self.last = first
+
+
+class TradeStore:
+    def __init__(self, capacity=1024):
+        self._n = 0
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._buy = np.empty(capacity, dtype=np.int16)
+        self._sell = np.empty(capacity, dtype=np.int16)
+        self._cols = {name: np.empty(capacity, dtype=np.float64) for name in FLOAT_COLUMNS}
+        self._venues = []
+        self._venue_codes = {}
+        self._days = {}        # day ordinal -> DayStats
+        self._sorted = True    # timestamps appended in order -> binary search on ts
+        self.total_pnl = 0.0
+        self.total_fees = 0.0
+        self.wins = 0
+        self.losses = 0
+
+    @classmethod
+    def from_records(cls, records):
+        store = cls(capacity=max(1024, len(records)))
+        for record in records:
+            store.append(record)
+        return store
+
+    def _venue_code(self, name):
+        code = self._venue_codes.get(name)
+        if code is None:
+            code = len(self._venues)
+            self._venues.append(name)
+            self._venue_codes[name] = code
+        return code
+
+    def _grow(self):
+        capacity = len(self._ts) * 2
+        self._ts = np.resize(self._ts, capacity)
+        self._buy = np.resize(self._buy, capacity)
+        self._sell = np.resize(self._sell, capacity)
+        for name in FLOAT_COLUMNS:
+            self._cols[name] = np.resize(self._cols[name], capacity)
+
+    def append(self, record):
+        if self._n == len(self._ts):
+            self._grow()
+        i = self._n
+        ts = to_epoch_us(record['timestamp'])
+        if i and ts < self._ts[i - 1]:
+            self._sorted = False
+        self._ts[i] = ts
+        self._buy[i] = self._venue_code(record['buy_from'])
+        self._sell[i] = self._venue_code(record['sell_to'])
+        for name in PRICE_COLUMNS:
+            self._cols[name][i] = record[name]
+        for name in FILL_COLUMNS:
+            value = record.get(name)
+            self._cols[name][i] = np.nan if value is None else value
+        self._n += 1
+
+        # Running aggregates
+        profit = record['profit_usd']
+        fees = record['fees_paid_usd']
+        day = ts // US_PER_DAY
+        stats = self._days.get(day)
+        if stats is None:
+            stats = self._days[day] = DayStats(i)
+        stats.pnl += profit
+        stats.fees += fees
+        stats.count += 1
+        stats.last = i
+        self.total_pnl += profit
+        self.total_fees += fees
+        if profit > 0:
+            stats.wins += 1
+            self.wins += 1
+        else:
+            stats.losses += 1
+            self.losses += 1
+
+    def __len__(self):
+        return self._n
+
+    def __bool__(self):
+        return self._n > 0
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return TradeView(self, i)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield TradeView(self, i)
+
+    def field(self, key, i):
+        if key == 'timestamp':
+            return from_epoch_us(int(self._ts[i])).isoformat()
+        if key == 'buy_from':
+            return self._venues[self._buy[i]]
+        if key == 'sell_to':
+            return self._venues[self._sell[i]]
+        value = float(self._cols[key][i])
+        if key in FILL_COLUMNS and np.isnan(value):
+            return None
+        return value
+
+    # ---- Queries ----
+
+    def day_stats(self, day):
+        # O(1): aggregates for a date (UTC)
+        return self._days.get(day.toordinal() - EPOCH_ORDINAL)
+
+    def day_pnl(self, day):
+        stats = self.day_stats(day)
+        return stats.pnl if stats else 0.0
+
+    def range_indices(self, start_date, end_date):
+        # Trades whose UTC date is within [start_date, end_date]; O(log n) while sorted
+        lo_us = (start_date.toordinal() - EPOCH_ORDINAL) * US_PER_DAY
+        hi_us = (end_date.toordinal() - EPOCH_ORDINAL + 1) * US_PER_DAY
+        ts = self._ts[:self._n]
+        if self._sorted:
+            lo, hi = np.searchsorted(ts, [lo_us, hi_us])
+            return np.arange(lo, hi)
+        return np.flatnonzero((ts >= lo_us) & (ts < hi_us))
+
+    def to_dataframe(self, indices=None, reverse=False):
+        if indices is None:
+            indices = np.arange(self._n)
+        if reverse:
+            indices = indices[::-1]
+        venues = np.array(self._venues if self._venues else [''], dtype=object)
+        ts = self._ts[indices]
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(ts, unit='us', utc=True),
+            'buy_from': venues[self._buy[indices]],
+            'sell_to': venues[self._sell[indices]],
+            **{name: self._cols[name][indices] for name in FLOAT_COLUMNS}
+        }, columns=FIELDS)
+        return df
+
+    def tail(self, n, reverse=True):
+        # The last n trades appended (newest first by default), without touching the rest
+        return self.to_dataframe(np.arange(max(0, self._n - n), self._n), reverse=reverse)
+
+    def range_stats(self, start_date, end_date):
+        # {'trades', 'wins', 'pnl', 'fees'} for [start_date, end_date] from the per-day running aggregates
+        lo = start_date.toordinal() - EPOCH_ORDINAL
+        hi = end_date.toordinal() - EPOCH_ORDINAL
+        totals = {'trades': 0, 'wins': 0, 'pnl': 0.0, 'fees': 0.0}
+        for day, stats in self._days.items():
+            if lo <= day <= hi:
+                totals['trades'] += stats.count
+                totals['wins'] += stats.wins
+                totals['pnl'] += stats.pnl
+                totals['fees'] += stats.fees
+        return totals
+
+    def to_records(self):
+        return [view.to_dict() for view in self]
+
+    def nbytes(self):
+        return self._ts.nbytes + self._buy.nbytes + self._sell.nbytes + sum(c.nbytes for c in self._cols.values())
+